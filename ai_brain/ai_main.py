@@ -3,7 +3,9 @@ from ai_brain.gen_json import parse_conversation_and_generate_json
 from ai_brain.placesApiCalled import generate_places_api_calls
 from ai_brain.ranker import PlaceScorer
 from ai_brain.gen_iten import TripItineraryGenerator
+from server.utils.place_store import PlaceDetailsStore
 import json
+import os
 
 my_api_key = ""
 
@@ -25,15 +27,19 @@ def main():
         trip = json.load(file)
     generate_places_api_calls(trip, my_api_key)
 
-    scorer = PlaceScorer(my_api_key, my_api_key)
+    # Point PLACE_DETAILS_CACHE_PATH at the server's file to share one details cache
+    details_store = PlaceDetailsStore(path=os.getenv('PLACE_DETAILS_CACHE_PATH', 'place_details_cache.db'))
+    # Scores are journaled as they complete; rerunning resumes unless a trip detail the prompt uses changed
+    scorer = PlaceScorer(my_api_key, my_api_key, details_store=details_store,
+                         journal_path=os.getenv('SCORE_JOURNAL_PATH', 'score_journal.db'))
     try:
         results = scorer.score_all_places()
         scorer.save_results(results)
     except KeyboardInterrupt:
-        print("\n\nProcess interrupted by user. Partial results may have been saved.")
+        print("\n\nProcess interrupted by user. Scored places are saved in the journal; rerun to resume.")
     except Exception as e:
         print(f"\n\nError during scoring process: {str(e)}")
-        print("Partial results may have been saved.")
+        print("Scored places are saved in the journal; rerun to resume.")
 
     trip_details_path = 'trip_details.json'
     attractions_path = 'scored_attractions.json'
@@ -4,6 +4,10 @@ from datetime import datetime, timedelta
 import google.generativeai as genai
 from typing import Dict, List, Any
 
+import numpy as np
+
+from server.utils.geo import bearings_from, compass_point, distance_matrix
+
 class TripItineraryGenerator:
     def __init__(self, api_key: str):
         """Initialize the generator with Gemini API key."""
@@ -15,6 +19,42 @@ class TripItineraryGenerator:
         with open(filepath, 'r') as f:
             return json.load(f)
     
+    def proximity_notes(self, attractions: List[Dict], restaurants: List[Dict],
+                        lodging: List[Dict], nearest: int = 3) -> Dict[str, Dict[str, Any]]:
+        """Distance hints for routing, keyed by place name.
+        
+        Lodging gets its mean distance to the attractions and each attraction its
+        nearest restaurants with their direction, from one distance matrix over all
+        listed places. Lodging and attractions that placesApiCalled.py located
+        relative to the destination also get that distance and direction.
+        """
+        places = lodging + attractions + restaurants
+        matrix = distance_matrix([p.get('location') for p in places])
+        lodging_idx = np.arange(len(lodging))
+        attraction_idx = np.arange(len(lodging), len(lodging) + len(attractions))
+        restaurant_idx = np.arange(len(lodging) + len(attractions), len(places))
+        
+        notes = {}
+        for place in lodging + attractions:
+            if 'distance_from_destination_m' in place and 'direction_from_destination' in place:
+                notes[place['name']] = {'from_destination': (
+                    f"{place['distance_from_destination_m'] / 1000:.1f} km {place['direction_from_destination']}"
+                )}
+        for i in lodging_idx:
+            row = matrix[i, attraction_idx]
+            if np.isfinite(row).any():
+                notes.setdefault(places[i]['name'], {})['avg_km_to_attractions'] = round(float(np.nanmean(row)) / 1000, 1)
+        for i in attraction_idx:
+            row = matrix[i, restaurant_idx]
+            order = [j for j in np.argsort(row) if np.isfinite(row[j])][:nearest]
+            if order:
+                bearings = bearings_from(places[i].get('location'), [restaurants[j].get('location') for j in order])
+                notes.setdefault(places[i]['name'], {})['nearest_restaurants'] = [
+                    f"{restaurants[j]['name']} ({row[j] / 1000:.1f} km {compass_point(bearing)})"
+                    for j, bearing in zip(order, bearings)
+                ]
+        return notes
+    
     def prepare_context(self, trip_details: Dict, attractions: List[Dict], 
                        restaurants: List[Dict], lodging: List[Dict]) -> str:
         """Prepare context for Gemini API."""
@@ -27,6 +67,10 @@ class TripItineraryGenerator:
         end = datetime.strptime(end_date, '%Y-%m-%d')
         num_days = (end - start).days + 1
         
+        lodging = lodging[:10]
+        restaurants = restaurants[:20]
+        notes = self.proximity_notes(attractions, restaurants, lodging)
+        
         context = f"""
         Create a {num_days}-day itinerary for a trip to {trip_details['destination']} from {start_date} to {end_date}.
         
@@ -44,23 +88,25 @@ class TripItineraryGenerator:
         Available Options (sorted by score, highest first):
         
         LODGING OPTIONS:
-        {json.dumps([{'name': l['name'], 'score': l['score'], 'address': l['address'], 'reasoning': l['reasoning']} 
-                     for l in lodging[:10]], indent=2)}
+        {json.dumps([{'name': l['name'], 'score': l['score'], 'address': l['address'], 'reasoning': l['reasoning'],
+                      **notes.get(l['name'], {})} 
+                     for l in lodging], indent=2)}
         
         ATTRACTIONS:
-        {json.dumps([{'name': a['name'], 'score': a['score'], 'address': a['address'], 'reasoning': a['reasoning']} 
+        {json.dumps([{'name': a['name'], 'score': a['score'], 'address': a['address'], 'reasoning': a['reasoning'],
+                      **notes.get(a['name'], {})} 
                      for a in attractions], indent=2)}
         
         RESTAURANTS:
         {json.dumps([{'name': r['name'], 'score': r['score'], 'address': r['address'], 'reasoning': r['reasoning']} 
-                     for r in restaurants[:20]], indent=2)}
+                     for r in restaurants], indent=2)}
         
         Instructions:
         1. Select ONE lodging option for the entire stay (consider accessibility and location)
         2. Create a day-by-day itinerary with specific times
         3. Include  attractions per day based on the pace
         4. Include breakfast, lunch, and dinner restaurants each day
-        5. Consider travel time between locations and accessibility needs
+        5. Consider travel time between locations and accessibility needs (use from_destination, avg_km_to_attractions and nearest_restaurants)
         6. Prioritize higher-scored options but also consider logical routing
         7. Ensure all selections respect dietary needs (vegetarian) and accessibility requirements
         
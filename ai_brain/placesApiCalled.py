@@ -1,8 +1,19 @@
+import concurrent.futures
 import requests
 import json
 from datetime import datetime
 
-def generate_places_api_calls(trip_data, google_places_api_key):
+from server.utils.geo import bearings_from, compass_point, distances_from, location_of
+from server.utils.rate_limiter import TokenBucket
+
+def _nearby_search(url, params, limiter):
+    """One rate-limited Nearby Search call. Raises requests.exceptions.RequestException on failure."""
+    limiter.acquire()
+    response = requests.get(url, params=params)
+    response.raise_for_status()
+    return response.json()
+
+def generate_places_api_calls(trip_data, google_places_api_key, max_workers=8, requests_per_second=10.0):
     """
     Generates Google Places API calls for lodging, attractions, and nearby restaurants,
     aligning with user's specific needs.
@@ -16,6 +27,8 @@ def generate_places_api_calls(trip_data, google_places_api_key):
             - "interests" (list): List of user's interests.
             - Other fields as per the user's provided format.
         google_places_api_key (str): Your Google Places API key.
+        max_workers (int): Maximum number of Nearby Search calls in flight at once.
+        requests_per_second (float): Rate limit shared by all Nearby Search calls.
 
     Returns:
         dict: A dictionary containing the actual API responses for lodging, attractions,
@@ -103,129 +116,144 @@ def generate_places_api_calls(trip_data, google_places_api_key):
         "restaurants": []
     }
 
-    # Step 2: Find Lodging options around the destination
-    lodging_keywords = ["hotel", "resort", "motel", "accommodation"]
-    if "wheelchair accessible" in user_accessibility_needs:
-        lodging_keywords.append("wheelchair accessible") # Add as keyword for bias
-    lodging_params = {
-        "location": f"{dest_lat},{dest_lng}",
-        "radius": 5000,
-        "type": "lodging",
-        "keyword": " OR ".join(lodging_keywords),
-        "key": google_places_api_key
-    }
-    print("\n--- Calling Nearby Search API for Lodging (with accessibility bias) ---")
-    lodging_url = f"{base_url}nearbysearch/json"
-    try:
-        response = requests.get(lodging_url, params=lodging_params)
-        response.raise_for_status()
-        data = response.json()
-        if data and data.get("results"):
-            for place in data["results"]:
-                # Simple check for accessibility in name/types - for more robust, need Place Details
-                place_name = place.get("name", "").lower()
-                place_types = [t.lower() for t in place.get("types", [])]
-
-                is_accessible_match = True
-                if "wheelchair accessible" in user_accessibility_needs:
-                    # Very basic check: does "wheelchair" appear in name or type?
-                    if "wheelchair" not in place_name and "wheelchair_accessible" not in place_types:
-                        is_accessible_match = False
-
-                if is_accessible_match:
-                    if "geometry" in place and "location" in place["geometry"]:
-                        found_poi_locations.append(place["geometry"]["location"])
-                        results_summary["lodging"].append({
-                            "name": place.get("name"),
-                            "address": place.get("vicinity") or place.get("formatted_address"),
-                            "location": place["geometry"]["location"],
-                            "place_id": place.get("place_id")
-                        })
-            print(f"Found {len(results_summary['lodging'])} lodging options aligning with needs.")
-        else:
-            print("No lodging options found.")
-    except requests.exceptions.RequestException as e:
-        print(f"Error making Lodging Nearby Search API call: {e}")
-        results_summary["lodging_error"] = f"Lodging search failed: {e}"
-
-    # Step 3: Find Attractions around the destination
-    attraction_keywords = ["tourist_attraction", "sightseeing"]
-    attraction_keywords.extend(user_interests) # Add user interests as keywords
-    if "wheelchair accessible" in user_accessibility_needs:
-        attraction_keywords.append("wheelchair accessible") # Add as keyword for bias
-
-    attractions_params = {
-        "location": f"{dest_lat},{dest_lng}",
-        "radius": attractions_radius,
-        "type": "tourist_attraction", # Use one type, keywords cover broader
-        "keyword": " OR ".join(set(attraction_keywords)), # Use set to avoid duplicate keywords
-        "key": google_places_api_key
-    }
-    print("\n--- Calling Nearby Search API for Attractions (with interests and accessibility bias) ---")
-    attractions_url = f"{base_url}nearbysearch/json"
-    try:
-        response = requests.get(attractions_url, params=attractions_params)
-        response.raise_for_status()
-        data = response.json()
-        if data and data.get("results"):
-            for place in data["results"]:
-                # Simple check for accessibility in name/types
-                place_name = place.get("name", "").lower()
-                place_types = [t.lower() for t in place.get("types", [])]
-
-                is_accessible_match = True
-                if "wheelchair accessible" in user_accessibility_needs:
-                    if "wheelchair" not in place_name and "wheelchair_accessible" not in place_types:
-                        is_accessible_match = False
-
-                if is_accessible_match:
-                    if "geometry" in place and "location" in place["geometry"]:
-                        found_poi_locations.append(place["geometry"]["location"])
-                        results_summary["attractions"].append({
-                            "name": place.get("name"),
-                            "address": place.get("vicinity") or place.get("formatted_address"),
-                            "location": place["geometry"]["location"],
-                            "place_id": place.get("place_id")
-                        })
-            print(f"Found {len(results_summary['attractions'])} attractions aligning with needs.")
-        else:
-            print("No attractions found.")
-    except requests.exceptions.RequestException as e:
-        print(f"Error making Attractions Nearby Search API call: {e}")
-        results_summary["attractions_error"] = f"Attractions search failed: {e}"
+    # Lodging and attraction searches run in parallel, then the restaurant
+    # searches around their locations, all on one bounded, rate-limited pool
+    limiter = TokenBucket(requests_per_second)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='places-search') as executor:
+        # Step 2: Find Lodging options around the destination
+        lodging_keywords = ["hotel", "resort", "motel", "accommodation"]
+        if "wheelchair accessible" in user_accessibility_needs:
+            lodging_keywords.append("wheelchair accessible") # Add as keyword for bias
+        lodging_params = {
+            "location": f"{dest_lat},{dest_lng}",
+            "radius": 5000,
+            "type": "lodging",
+            "keyword": " OR ".join(lodging_keywords),
+            "key": google_places_api_key
+        }
+        lodging_url = f"{base_url}nearbysearch/json"
 
+        # Step 3: Find Attractions around the destination
+        attraction_keywords = ["tourist_attraction", "sightseeing"]
+        attraction_keywords.extend(user_interests) # Add user interests as keywords
+        if "wheelchair accessible" in user_accessibility_needs:
+            attraction_keywords.append("wheelchair accessible") # Add as keyword for bias
 
-    # Step 4: Find Restaurants near the found lodging and attractions
-    restaurant_api_calls_made = []
-    processed_locations = set()
-    MAX_RESTAURANTS_PER_LOCATION = 2
+        attractions_params = {
+            "location": f"{dest_lat},{dest_lng}",
+            "radius": attractions_radius,
+            "type": "tourist_attraction", # Use one type, keywords cover broader
+            "keyword": " OR ".join(set(attraction_keywords)), # Use set to avoid duplicate keywords
+            "key": google_places_api_key
+        }
+        attractions_url = f"{base_url}nearbysearch/json"
 
-    print("\n--- Calling Nearby Search API for Restaurants (near found lodging/attractions, with dietary bias) ---")
-    if not found_poi_locations:
-        print("No lodging or attractions found to base restaurant searches on.")
+        print("\n--- Calling Nearby Search API for Lodging (with accessibility bias) and Attractions (with interests and accessibility bias) ---")
+        lodging_future = executor.submit(_nearby_search, lodging_url, lodging_params, limiter)
+        attractions_future = executor.submit(_nearby_search, attractions_url, attractions_params, limiter)
 
-    for loc in found_poi_locations:
-        loc_tuple = (loc["lat"], loc["lng"])
-        if loc_tuple not in processed_locations:
-            processed_locations.add(loc_tuple)
+        # Lodging is processed first so POI order (and so the restaurant searches) stays the same
+        try:
+            data = lodging_future.result()
+            if data and data.get("results"):
+                for place in data["results"]:
+                    # Simple check for accessibility in name/types - for more robust, need Place Details
+                    place_name = place.get("name", "").lower()
+                    place_types = [t.lower() for t in place.get("types", [])]
 
-            restaurant_keywords = ["food", "dine", "cafe", "restaurant"]
-            if user_dietary_needs:
-                restaurant_keywords.append(user_dietary_needs) # Add dietary need as keyword for bias
+                    is_accessible_match = True
+                    if "wheelchair accessible" in user_accessibility_needs:
+                        # Very basic check: does "wheelchair" appear in name or type?
+                        if "wheelchair" not in place_name and "wheelchair_accessible" not in place_types:
+                            is_accessible_match = False
 
+                    if is_accessible_match:
+                        if "geometry" in place and "location" in place["geometry"]:
+                            found_poi_locations.append(place["geometry"]["location"])
+                            results_summary["lodging"].append({
+                                "name": place.get("name"),
+                                "address": place.get("vicinity") or place.get("formatted_address"),
+                                "location": place["geometry"]["location"],
+                                "place_id": place.get("place_id")
+                            })
+                print(f"Found {len(results_summary['lodging'])} lodging options aligning with needs.")
+            else:
+                print("No lodging options found.")
+        except requests.exceptions.RequestException as e:
+            print(f"Error making Lodging Nearby Search API call: {e}")
+            results_summary["lodging_error"] = f"Lodging search failed: {e}"
+
+        try:
+            data = attractions_future.result()
+            if data and data.get("results"):
+                for place in data["results"]:
+                    # Simple check for accessibility in name/types
+                    place_name = place.get("name", "").lower()
+                    place_types = [t.lower() for t in place.get("types", [])]
+
+                    is_accessible_match = True
+                    if "wheelchair accessible" in user_accessibility_needs:
+                        if "wheelchair" not in place_name and "wheelchair_accessible" not in place_types:
+                            is_accessible_match = False
+
+                    if is_accessible_match:
+                        if "geometry" in place and "location" in place["geometry"]:
+                            found_poi_locations.append(place["geometry"]["location"])
+                            results_summary["attractions"].append({
+                                "name": place.get("name"),
+                                "address": place.get("vicinity") or place.get("formatted_address"),
+                                "location": place["geometry"]["location"],
+                                "place_id": place.get("place_id")
+                            })
+                print(f"Found {len(results_summary['attractions'])} attractions aligning with needs.")
+            else:
+                print("No attractions found.")
+        except requests.exceptions.RequestException as e:
+            print(f"Error making Attractions Nearby Search API call: {e}")
+            results_summary["attractions_error"] = f"Attractions search failed: {e}"
+
+        # Distance and direction of each lodging/attraction from the destination, in one pass per list.
+        # Places without a location are left without them
+        destination_location = {"lat": dest_lat, "lng": dest_lng}
+        for key in ("lodging", "attractions"):
+            places = [place for place in results_summary[key] if location_of(place)]
+            locations = [place["location"] for place in places]
+            for place, distance, bearing in zip(places, distances_from(destination_location, locations),
+                                                bearings_from(destination_location, locations)):
+                place["distance_from_destination_m"] = int(distance)
+                place["direction_from_destination"] = compass_point(bearing)
+
+        # Step 4: Find Restaurants near the found lodging and attractions
+        restaurant_api_calls_made = []
+        MAX_RESTAURANTS_PER_LOCATION = 2
+        RESTAURANT_SEARCH_RADIUS = 1500
+
+        print("\n--- Calling Nearby Search API for Restaurants (near found lodging/attractions, with dietary bias) ---")
+        if not found_poi_locations:
+            print("No lodging or attractions found to base restaurant searches on.")
+
+        restaurant_keywords = ["food", "dine", "cafe", "restaurant"]
+        if user_dietary_needs:
+            restaurant_keywords.append(user_dietary_needs) # Add dietary need as keyword for bias
+        restaurant_url = f"{base_url}nearbysearch/json"
+
+        # All searches are queued at once; results are still processed in POI order
+        restaurant_futures = []
+        for loc in found_poi_locations:
             restaurant_params = {
                 "location": f"{loc['lat']},{loc['lng']}",
-                "radius": 1500,
+                "radius": RESTAURANT_SEARCH_RADIUS,
                 "type": "restaurant",
                 "keyword": " OR ".join(set(restaurant_keywords)),
                 "key": google_places_api_key
             }
-            restaurant_url = f"{base_url}nearbysearch/json" 
+            print(f"Searching restaurants near Lat={loc['lat']}, Lng={loc['lng']}")
+            restaurant_futures.append(executor.submit(_nearby_search, restaurant_url, restaurant_params, limiter))
+
+        for loc, future in zip(found_poi_locations, restaurant_futures):
+            loc_tuple = (loc["lat"], loc["lng"])
             try:
-                print(f"Searching restaurants near Lat={loc['lat']}, Lng={loc['lng']}")
-                response = requests.get(restaurant_url, params=restaurant_params)
-                response.raise_for_status()
-                data = response.json()
+                data = future.result()
                 if data and data.get("results"):
                     # Limit the number of restaurants to MAX_RESTAURANTS_PER_LOCATION
                     restaurants_for_this_location = data["results"][:MAX_RESTAURANTS_PER_LOCATION]
@@ -233,7 +261,7 @@ def generate_places_api_calls(trip_data, google_places_api_key):
                         # Basic dietary check (already biased by keyword, but can refine)
                         place_name = place.get("name", "").lower()
                         place_types = [t.lower() for t in place.get("types", [])]
-                        
+                    
                         is_dietary_match = True
                         if user_dietary_needs:
                             # A more robust check might involve parsing reviews or Place Details,
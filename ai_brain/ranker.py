@@ -1,23 +1,132 @@
 import json
 import os
+import queue
+import threading
 import time
-from typing import Dict, List, Any
+from itertools import zip_longest
+from typing import Dict, List, Any, Optional, Tuple
 import requests
 import google.generativeai as genai
 from datetime import datetime
 
+from server.utils.place_store import PlaceDetailsStore
+from server.utils.rate_limiter import TokenBucket
+from ai_brain.score_journal import ScoreJournal, changed_fields, trip_hash
+
 class PlaceScorer:
-    def __init__(self, google_api_key: str, gemini_api_key: str):
-        """Initialize the PlaceScorer with API keys."""
+    # Using correct field names from the official API documentation
+    DETAILS_FIELDS = (
+        'name',
+        'formatted_address',
+        'geometry/location',
+        'rating',
+        'user_ratings_total',
+        'price_level',
+        'types',
+        'opening_hours',
+        'website',
+        'formatted_phone_number',
+        'reviews',
+        'editorial_summary',
+        'wheelchair_accessible_entrance',
+        'serves_vegetarian_food',
+        'serves_vegan_food',
+        'dine_in',
+        'delivery',
+        'takeout',
+        'reservable',
+        'serves_breakfast',
+        'serves_lunch',
+        'serves_dinner',
+        'serves_beer',
+        'serves_wine',
+        'live_music',
+        'good_for_groups'
+    )
+
+    # Details attributes each place type's scoring criteria rely on; name and
+    # address are already in the prompt and everything else is left out of it
+    PROMPT_FIELDS = {
+        'lodging': (
+            'rating', 'user_ratings_total', 'price_level', 'types',
+            'wheelchair_accessible_entrance', 'editorial_summary', 'reviews'
+        ),
+        'restaurant': (
+            'rating', 'user_ratings_total', 'price_level', 'types',
+            'wheelchair_accessible_entrance', 'editorial_summary', 'reviews',
+            'serves_vegetarian_food', 'serves_vegan_food', 'dine_in', 'reservable',
+            'serves_beer', 'serves_wine', 'live_music', 'good_for_groups'
+        ),
+        'attraction': (
+            'rating', 'user_ratings_total', 'price_level', 'types',
+            'wheelchair_accessible_entrance', 'editorial_summary', 'reviews',
+            'live_music', 'good_for_groups'
+        )
+    }
+    # Trip details fields read by the TRIP DETAILS section of the scoring
+    # prompt, shared by all place types. The prompt only sees trip details
+    # through trip_inputs(), so scores depend on these fields and no others:
+    # a change to any of them invalidates the scores of every category.
+    PROMPT_TRIP_FIELDS = (
+        'budget', 'number_of_travelers', 'age_group_of_travelers', 'interests',
+        'how_packed_trip', 'trip_type', 'dates_of_travel'
+    )
+    # Part of every journal key: bump when the prompt format changes, so
+    # scores made with an older prompt or model are not reused
+    PROMPT_VERSION = 2
+    GEMINI_MODEL = 'gemini-2.5-flash'
+    PROMPT_MAX_REVIEWS = 3
+    PROMPT_REVIEW_CHARS = 300
+
+    # Set by placesApiCalled.py on lodging and attractions, carried into the results
+    POSITION_FIELDS = ('distance_from_destination_m', 'direction_from_destination')
+
+    # Result category -> place type used in the scoring prompt
+    CATEGORIES = {
+        'lodging': 'lodging',
+        'restaurants': 'restaurant',
+        'attractions': 'attraction'
+    }
+
+    def __init__(self, google_api_key: str, gemini_api_key: str,
+                 details_store: Optional[PlaceDetailsStore] = None,
+                 details_workers: int = 4, scoring_workers: int = 4,
+                 details_rate: float = 5.0, gemini_rate: float = 2.0,
+                 queue_size: int = 16, journal_path: Optional[str] = None):
+        """Initialize the PlaceScorer with API keys.
+
+        An optional PlaceDetailsStore lets repeated runs (and the server, when
+        pointed at the same SQLite file) reuse place details instead of refetching.
+
+        Places are scored by two stages of worker threads, details fetching and
+        Gemini scoring, connected by queues of at most queue_size places. Each
+        stage is paced by its own token bucket (calls per second).
+
+        With journal_path, every successful score is written to a ScoreJournal
+        as it completes, keyed by the trip details fields the prompt uses and
+        the prompt version. Places already scored with the same inputs are
+        skipped, so an interrupted run resumes where it stopped. Reuse is all
+        or nothing: a change to any prompt field rescores every place in every
+        category, while a change to other trip details rescores none.
+        """
         self.google_api_key = google_api_key
         self.gemini_api_key = gemini_api_key
+        self.details_store = details_store
+        self.details_workers = details_workers
+        self.scoring_workers = scoring_workers
+        self.queue_size = queue_size
+        self.details_limiter = TokenBucket(details_rate)
+        self.gemini_limiter = TokenBucket(gemini_rate)
         
         # Configure Gemini
         genai.configure(api_key=gemini_api_key)
-        self.gemini_model = genai.GenerativeModel('gemini-2.5-flash')
+        self.gemini_model = genai.GenerativeModel(self.GEMINI_MODEL)
         
         # Load data
         self.load_data()
+        self.journal = ScoreJournal(journal_path) if journal_path else None
+        # (place type, place_id) -> estimated prompt tokens before and after compaction
+        self.prompt_tokens: Dict[Tuple[str, str], Tuple[int, int]] = {}
         
     def load_data(self):
         """Load places and trip details from JSON files."""
@@ -28,41 +137,20 @@ class PlaceScorer:
             self.trip_details = json.load(f)
     
     def get_place_details(self, place_id: str) -> Dict[str, Any]:
+        """Get detailed information about a place, using the details store when configured."""
+        if self.details_store is None:
+            return self.fetch_place_details(place_id)
+        return self.details_store.get_or_fetch(
+            place_id, self.DETAILS_FIELDS, lambda: self.fetch_place_details(place_id)
+        ) or {}
+    
+    def fetch_place_details(self, place_id: str) -> Dict[str, Any]:
         """Fetch detailed information about a place from Google Places API."""
-        # Using correct field names from the official API documentation
-        fields = [
-            'name',
-            'formatted_address',
-            'geometry/location',
-            'rating',
-            'user_ratings_total',
-            'price_level',
-            'types',
-            'opening_hours',
-            'website',
-            'formatted_phone_number',
-            'reviews',
-            'editorial_summary',
-            'wheelchair_accessible_entrance',
-            'serves_vegetarian_food',
-            'serves_vegan_food',
-            'dine_in',
-            'delivery',
-            'takeout',
-            'reservable',
-            'serves_breakfast',
-            'serves_lunch',
-            'serves_dinner',
-            'serves_beer',
-            'serves_wine',
-            'live_music',
-            'good_for_groups'
-        ]
-        
+        self.details_limiter.acquire()
         url = "https://maps.googleapis.com/maps/api/place/details/json"
         params = {
             'place_id': place_id,
-            'fields': ','.join(fields),
+            'fields': ','.join(self.DETAILS_FIELDS),
             'key': self.google_api_key,
             'language': 'en'
         }
@@ -102,21 +190,83 @@ class PlaceScorer:
             print(f"Exception fetching details for place_id {place_id}: {str(e)}")
             return {}
     
-    def create_scoring_prompt(self, place_type: str, place_data: Dict, place_details: Dict) -> str:
-        """Create a prompt for Gemini to score a place based on user preferences."""
+    def trip_inputs(self) -> Dict[str, Any]:
+        """The trip details fields the scoring prompt uses."""
+        return {field: self.trip_details.get(field) for field in self.PROMPT_TRIP_FIELDS}
+    
+    def trip_key(self) -> str:
+        """Journal key of the scoring inputs: trip inputs, prompt version and model."""
+        return trip_hash({
+            'trip': self.trip_inputs(),
+            'prompt_version': self.PROMPT_VERSION,
+            'model': self.GEMINI_MODEL
+        })
+    
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Rough token estimate (~4 characters per token for English text)."""
+        return len(text) // 4 + 1
+    
+    def _prompt_reviews(self, reviews: List[Dict]) -> List[Dict]:
+        """Up to PROMPT_MAX_REVIEWS distinct, non-empty reviews, each cut to PROMPT_REVIEW_CHARS."""
+        compact = []
+        seen = set()
+        for review in reviews:
+            text = ' '.join((review.get('text') or '').split())
+            key = text.lower()
+            if not text or key in seen:
+                continue
+            seen.add(key)
+            if len(text) > self.PROMPT_REVIEW_CHARS:
+                text = text[:self.PROMPT_REVIEW_CHARS].rsplit(' ', 1)[0] + '...'
+            compact.append({'rating': review.get('rating'), 'text': text})
+            if len(compact) == self.PROMPT_MAX_REVIEWS:
+                break
+        return compact
+    
+    def compact_details(self, place_type: str, place_details: Dict) -> Dict:
+        """Project place details to the attributes the place type's criteria use."""
+        compact = {}
+        for field in self.PROMPT_FIELDS.get(place_type, ()):
+            value = place_details.get(field)
+            if value is None:
+                continue
+            if field == 'reviews':
+                value = self._prompt_reviews(value)
+            elif field == 'editorial_summary':
+                value = value.get('overview') if isinstance(value, dict) else value
+            if value or value is False or value == 0:
+                compact[field] = value
+        return compact
+    
+    def create_scoring_prompt(self, place_type: str, place_data: Dict, place_details: Dict,
+                              compact: bool = True) -> str:
+        """Create a prompt for Gemini to score a place based on user preferences.
+        
+        With compact (the default), the details are reduced by compact_details,
+        serialized without indentation and the prompt's own indentation and
+        repeated blank lines are stripped. compact=False gives the full prompt.
+        """
+        if compact:
+            details_json = json.dumps(self.compact_details(place_type, place_details),
+                                      separators=(',', ':'), ensure_ascii=False)
+        else:
+            details_json = json.dumps(place_details, indent=2)
+        
+        trip = self.trip_inputs()
         base_prompt = f"""
         Score this {place_type} for a group trip based on the following criteria.
         Return ONLY a JSON object with the format: {{"score": <number 0-100>, "reasoning": "<brief explanation>"}}
         
         TRIP DETAILS:
-        - Budget: ${self.trip_details['budget']} per person ({self.trip_details['number_of_travelers']} travelers)
+        - Budget: ${trip['budget']} per person ({trip['number_of_travelers']} travelers)
         - Accessibility: One traveler uses a walker, group is NOT ok with much walking
         - Dietary needs: Vegetarian
-        - Age group: {self.trip_details['age_group_of_travelers']}
-        - Interests: {', '.join(self.trip_details['interests'])}
-        - Trip style: {self.trip_details['how_packed_trip']}
-        - Trip type: {self.trip_details['trip_type']}
-        - Dates: {self.trip_details['dates_of_travel']['start_date']} to {self.trip_details['dates_of_travel']['end_date']}
+        - Age group: {trip['age_group_of_travelers']}
+        - Interests: {', '.join(trip['interests'])}
+        - Trip style: {trip['how_packed_trip']}
+        - Trip type: {trip['trip_type']}
+        - Dates: {trip['dates_of_travel']['start_date']} to {trip['dates_of_travel']['end_date']}
         
         PLACE INFORMATION:
         Name: {place_data.get('name', 'Unknown')}
@@ -135,7 +285,7 @@ class PlaceScorer:
         5. Amenities for young adults (15 points) - WiFi, common areas, etc.
         
         Google Places Details:
-        {json.dumps(place_details, indent=2)}
+        {details_json}
         """
         
         elif place_type == 'restaurant':
@@ -149,7 +299,7 @@ class PlaceScorer:
         5. Reviews/Rating (15 points) - Food quality and service
         
         Google Places Details:
-        {json.dumps(place_details, indent=2)}
+        {details_json}
         """
         
         elif place_type == 'attraction':
@@ -163,16 +313,32 @@ class PlaceScorer:
         5. Value/Cost (10 points) - Worth the price
         
         Google Places Details:
-        {json.dumps(place_details, indent=2)}
+        {details_json}
         """
         
+        if compact:
+            lines = []
+            for line in prompt.strip().splitlines():
+                line = line.strip()
+                if line or (lines and lines[-1]):
+                    lines.append(line)
+            prompt = '\n'.join(lines)
         return prompt
     
     def score_place_with_gemini(self, place_type: str, place_data: Dict, place_details: Dict) -> Dict:
         """Use Gemini to score a place based on the criteria."""
+        return self._score_place(place_type, place_data, place_details)[0]
+    
+    def _score_place(self, place_type: str, place_data: Dict, place_details: Dict) -> Tuple[Dict, bool]:
+        """Score a place, returning the result and whether Gemini scoring succeeded."""
         prompt = self.create_scoring_prompt(place_type, place_data, place_details)
+        full_prompt = self.create_scoring_prompt(place_type, place_data, place_details, compact=False)
+        self.prompt_tokens[(place_type, place_data.get('place_id'))] = (
+            self.estimate_tokens(full_prompt), self.estimate_tokens(prompt)
+        )
         
         try:
+            self.gemini_limiter.acquire()
             response = self.gemini_model.generate_content(prompt)
             result_text = response.text.strip()
             
@@ -190,77 +356,160 @@ class PlaceScorer:
                 'place_id': place_data.get('place_id'),
                 'score': score_data.get('score', 0),
                 'reasoning': score_data.get('reasoning', ''),
-                'location': place_data.get('location', {})
-            }
+                'location': place_data.get('location', {}),
+                **self.position_fields(place_data)
+            }, True
             
         except Exception as e:
             print(f"Error scoring {place_data.get('name')}: {str(e)}")
-            return {
-                'name': place_data.get('name'),
-                'address': place_data.get('address'),
-                'place_id': place_data.get('place_id'),
-                'score': 0,
-                'reasoning': f'Error during scoring: {str(e)}',
-                'location': place_data.get('location', {})
-            }
+            return self._failed_result(place_data, e), False
     
-    def score_all_places(self):
-        """Score all places in each category."""
-        results = {
-            'lodging': [],
-            'restaurants': [],
-            'attractions': []
+    def _failed_result(self, place_data: Dict, error: Exception) -> Dict:
+        """Zero score for a place that could not be scored."""
+        return {
+            'name': place_data.get('name'),
+            'address': place_data.get('address'),
+            'place_id': place_data.get('place_id'),
+            'score': 0,
+            'reasoning': f'Error during scoring: {str(error)}',
+            'location': place_data.get('location', {}),
+            **self.position_fields(place_data)
         }
+    
+    def position_fields(self, place_data: Dict) -> Dict:
+        """Distance and direction from the destination, for places that have them."""
+        return {field: place_data[field] for field in self.POSITION_FIELDS if field in place_data}
+    
+    def places_to_score(self) -> Dict[str, List[Dict]]:
+        """Places of each category to score, restaurants deduplicated by place_id."""
+        places = {}
+        for category in self.CATEGORIES:
+            unique = {}
+            for place in self.places_data.get(category, []):
+                unique.setdefault(place['place_id'], place)
+            places[category] = list(unique.values())
+        return places
+    
+    def _details_worker(self, jobs: queue.Queue, fetched: queue.Queue):
+        """Fetch details for queued places and pass them on to the scoring stage."""
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            category, index, place = job
+            try:
+                details = self.get_place_details(place['place_id'])
+            except Exception as e:
+                print(f"Exception fetching details for {place.get('name')}: {str(e)}")
+                details = {}
+            fetched.put((category, index, place, details))
+    
+    def _scoring_worker(self, fetched: queue.Queue, results: Dict[str, List], progress: Dict[str, int],
+                        lock: threading.Lock):
+        """Score places whose details have been fetched, storing each result in its input slot."""
+        while True:
+            job = fetched.get()
+            if job is None:
+                return
+            category, index, place, details = job
+            # Any error still fills the place's slot, so the run never stalls or leaves a gap
+            try:
+                score_result, scored = self._score_place(self.CATEGORIES[category], place, details)
+            except Exception as e:
+                print(f"Error scoring {place.get('name')}: {str(e)}")
+                score_result, scored = self._failed_result(place, e), False
+            # Failed scores and scores made without details are retried on the next run
+            if scored and details and self.journal is not None:
+                try:
+                    self.journal.record(category, self.trip_key(), score_result)
+                except Exception as e:
+                    print(f"Error journaling {place.get('name')}: {str(e)}")
+            before, after = self.prompt_tokens.get((self.CATEGORIES[category], place.get('place_id')), (0, 0))
+            with lock:
+                results[category][index] = score_result
+                progress[category] += 1
+                print(f"  [{category}] {progress[category]}/{len(results[category])}: "
+                      f"{place.get('name')} - {score_result.get('score')} (prompt ~{before} -> ~{after} tokens)")
+    
+    def _report_trip_changes(self):
+        """Print whether a change in trip details since the last run invalidates earlier scores."""
+        previous = self.journal.last_trip_details()
+        self.journal.set_trip_details(self.trip_details)
+        if previous is None or previous == self.trip_details:
+            return
+        changed = changed_fields(previous, self.trip_details)
+        used = changed & set(self.PROMPT_TRIP_FIELDS)
+        print(f"Trip details changed ({', '.join(sorted(changed))}): "
+              f"{'rescoring all places' if used else 'reusing earlier scores'}")
+    
+    def score_all_places(self):
+        """Score all places in each category.
         
-        # Score lodging
-        print("Scoring lodging options...")
-        for i, place in enumerate(self.places_data.get('lodging', [])):
-            print(f"  Processing {i+1}/{len(self.places_data['lodging'])}: {place['name']}")
-            
-            # Get place details from Google
-            details = self.get_place_details(place['place_id'])
-            time.sleep(0.5)  # Rate limiting
-            
-            # Score with Gemini
-            score_result = self.score_place_with_gemini('lodging', place, details)
-            results['lodging'].append(score_result)
-            time.sleep(1)  # Rate limiting for Gemini
-        
-        # Score restaurants
-        print("\nScoring restaurants...")
-        # Remove duplicates based on place_id
-        unique_restaurants = {}
-        for r in self.places_data.get('restaurants', []):
-            unique_restaurants[r['place_id']] = r
-        
-        restaurant_list = list(unique_restaurants.values())
-        
-        for i, place in enumerate(restaurant_list):
-            print(f"  Processing {i+1}/{len(restaurant_list)}: {place['name']}")
-            
-            # Get place details from Google
-            details = self.get_place_details(place['place_id'])
-            time.sleep(0.5)  # Rate limiting
-            
-            # Score with Gemini
-            score_result = self.score_place_with_gemini('restaurant', place, details)
-            results['restaurants'].append(score_result)
-            time.sleep(1)  # Rate limiting for Gemini
-        
-        # Score attractions
-        print("\nScoring attractions...")
-        for i, place in enumerate(self.places_data.get('attractions', [])):
-            print(f"  Processing {i+1}/{len(self.places_data['attractions'])}: {place['name']}")
-            
-            # Get place details from Google
-            details = self.get_place_details(place['place_id'])
-            time.sleep(0.5)  # Rate limiting
-            
-            # Score with Gemini
-            score_result = self.score_place_with_gemini('attraction', place, details)
-            results['attractions'].append(score_result)
-            time.sleep(1)  # Rate limiting for Gemini
-        
+        Lodging, restaurants and attractions are interleaved through one
+        details -> Gemini pipeline, so all three progress concurrently. Results
+        keep the order of places.json within each category. Places found in
+        the journal under the current trip_key() are reused instead of being
+        scored again; places new to places.json are scored.
+        """
+        places = self.places_to_score()
+        results = {category: [None] * len(items) for category, items in places.items()}
+        progress = {category: 0 for category in places}
+        pending = {category: list(enumerate(items)) for category, items in places.items()}
+        if self.journal is not None:
+            self._report_trip_changes()
+            for category, items in places.items():
+                done = self.journal.completed(category, self.trip_key())
+                pending[category] = []
+                for index, place in enumerate(items):
+                    if place['place_id'] in done:
+                        results[category][index] = {**done[place['place_id']], **self.position_fields(place)}
+                        progress[category] += 1
+                    else:
+                        pending[category].append((index, place))
+            reused = sum(progress.values())
+            if reused:
+                print(f"Reusing {reused} places already scored for these trip details")
+        lock = threading.Lock()
+        jobs = queue.Queue(maxsize=self.queue_size)
+        fetched = queue.Queue(maxsize=self.queue_size)
+        
+        print("Scoring " + ", ".join(f"{len(items)} {category}" for category, items in places.items()) + "...")
+        started = time.monotonic()
+        details_threads = [
+            threading.Thread(target=self._details_worker, args=(jobs, fetched), daemon=True,
+                             name=f'ranker-details-{i}')
+            for i in range(self.details_workers)
+        ]
+        scoring_threads = [
+            threading.Thread(target=self._scoring_worker, args=(fetched, results, progress, lock), daemon=True,
+                             name=f'ranker-score-{i}')
+            for i in range(self.scoring_workers)
+        ]
+        for thread in details_threads + scoring_threads:
+            thread.start()
+        
+        # Round-robin over categories so none waits for another to finish
+        for row in zip_longest(*(
+            [(category, index, place) for index, place in items]
+            for category, items in pending.items()
+        )):
+            for job in row:
+                if job is not None:
+                    jobs.put(job)
+        for _ in details_threads:
+            jobs.put(None)
+        for thread in details_threads:
+            thread.join()
+        for _ in scoring_threads:
+            fetched.put(None)
+        for thread in scoring_threads:
+            thread.join()
+        
+        print(f"Scored {sum(len(items) for items in pending.values())} places in {time.monotonic() - started:.1f}s")
+        if self.prompt_tokens:
+            before = sum(counts[0] for counts in self.prompt_tokens.values())
+            after = sum(counts[1] for counts in self.prompt_tokens.values())
+            print(f"Prompt tokens (estimated): ~{before} before compaction, ~{after} sent")
         return results
     
     def save_results(self, results: Dict):
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+
+def trip_hash(trip_details: Dict[str, Any]) -> str:
+    """Stable hash of trip details, independent of key order."""
+    payload = json.dumps(trip_details, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def changed_fields(old: Dict[str, Any], new: Dict[str, Any]) -> Set[str]:
+    """Top-level trip detail fields that differ between old and new."""
+    return {field for field in set(old) | set(new) if old.get(field) != new.get(field)}
+
+class ScoreJournal:
+    """Durable record of places scored by PlaceScorer, for resuming and reusing runs.
+
+    Each score is committed to SQLite as soon as it is produced, keyed by a
+    trip key, the result category and the place_id. The caller derives the
+    trip key from the trip details the score depends on (see trip_hash), so
+    a rerun whose relevant inputs are unchanged reads the scores back and
+    only scores the remaining places. The last trip details seen are kept to
+    report what changed between runs.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS scores ('
+            'trip_hash TEXT NOT NULL, category TEXT NOT NULL, place_id TEXT NOT NULL, '
+            'result TEXT NOT NULL, scored_at REAL NOT NULL, '
+            'PRIMARY KEY (trip_hash, category, place_id))'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS trips (name TEXT PRIMARY KEY, trip_details TEXT NOT NULL, saved_at REAL NOT NULL)'
+        )
+
+    def completed(self, category: str, trip_key: str) -> Dict[str, Dict[str, Any]]:
+        """Scores already recorded for trip_key in category, by place_id."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT place_id, result FROM scores WHERE trip_hash = ? AND category = ?',
+                (trip_key, category)
+            ).fetchall()
+        return {place_id: json.loads(result) for place_id, result in rows}
+
+    def record(self, category: str, trip_key: str, result: Dict[str, Any]) -> None:
+        """Append one scored place. Recording the same place again replaces it."""
+        payload = json.dumps(result, separators=(',', ':'))
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO scores (trip_hash, category, place_id, result, scored_at) VALUES (?, ?, ?, ?, ?)',
+                (trip_key, category, result['place_id'], payload, time.time())
+            )
+
+    def last_trip_details(self) -> Optional[Dict[str, Any]]:
+        """Trip details of the previous run, or None on the first one."""
+        with self._lock:
+            row = self._conn.execute("SELECT trip_details FROM trips WHERE name = 'last'").fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def set_trip_details(self, trip_details: Dict[str, Any]) -> None:
+        payload = json.dumps(trip_details, separators=(',', ':'))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO trips (name, trip_details, saved_at) VALUES ('last', ?, ?)",
+                (payload, time.time())
+            )
+
+    def clear(self, trip_key: Optional[str] = None) -> None:
+        """Forget the scores of trip_key (all scores by default), forcing a rerun."""
+        with self._lock:
+            if trip_key is None:
+                self._conn.execute('DELETE FROM scores')
+            else:
+                self._conn.execute('DELETE FROM scores WHERE trip_hash = ?', (trip_key,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -7,17 +7,41 @@ import os
 from dotenv import load_dotenv
 from datetime import datetime
 import concurrent.futures
+import time
 
 from utils.places_api import PlacesAPI
+from utils.cache import TTLCache, SQLiteCache
+from utils.place_store import PlaceDetailsStore
+from utils.place_index import PlaceIndex
 from utils.gemini_ai import GeminiAI
+from utils.concurrency import AIMDLimiter
 from utils.validators import validate_date_range, validate_request_body
+from utils.streaming import EventStream
+from utils.pipeline import Pipeline
+from utils.preranker import PreRanker
+from utils.singleflight import SingleFlight, request_key
+from utils.metrics import REGISTRY, SCORED_PLACES, register_caches
+from utils.log import configure_logging, get_logger, start_request, end_request, current_request_id
+from utils.responses import FastJSONProvider, encode_body, MIN_COMPRESS_BYTES
 from middleware.auth import require_api_key
 
 load_dotenv()
 
+# LOG_FORMAT=json for one JSON object per line. Clients can raise a single
+# request to DEBUG with the X-Debug-Log header unless LOG_DEBUG_HEADER=false.
+configure_logging(level=os.getenv('LOG_LEVEL', 'INFO'), fmt=os.getenv('LOG_FORMAT', 'text'))
+allow_debug_header = os.getenv('LOG_DEBUG_HEADER', 'true').lower() == 'true'
+log = get_logger(__name__)
+
 app = Flask(__name__)
 app.config['JSON_SORT_KEYS'] = False
 
+# JSON_ENCODER=auto uses orjson when installed; 'json' forces the standard library.
+# JSON bodies of at least COMPRESS_MIN_BYTES are gzip/brotli compressed when accepted.
+json_backend = os.getenv('JSON_ENCODER', 'auto')
+compress_min_bytes = int(os.getenv('COMPRESS_MIN_BYTES', str(MIN_COMPRESS_BYTES)))
+app.json = FastJSONProvider(app, backend=json_backend)
+
 # Configure CORS to allow requests from the frontend
 CORS(app, resources={
     r"/*": {
@@ -36,8 +60,110 @@ limiter = Limiter(
 )
 
 # Initialize services
-places_api = PlacesAPI(os.getenv('GOOGLE_PLACES_API_KEY'))
-gemini_ai = GeminiAI(os.getenv('GEMINI_API_KEY'))
+# Set GEOCODE_CACHE_PATH to persist geocodes in SQLite across restarts
+geocode_cache_path = os.getenv('GEOCODE_CACHE_PATH')
+geocode_cache = TTLCache(
+    max_entries=int(os.getenv('GEOCODE_CACHE_MAX_ENTRIES', '2048')),
+    ttl=float(os.getenv('GEOCODE_CACHE_TTL', str(7 * 24 * 3600))),
+    max_bytes=int(os.getenv('GEOCODE_CACHE_MAX_BYTES', str(1024 * 1024))),
+    backend=SQLiteCache(geocode_cache_path, table='geocodes') if geocode_cache_path else None
+)
+# Set PLACE_DETAILS_CACHE_PATH to persist place details (shareable with the ranker)
+details_store = PlaceDetailsStore(
+    fresh_ttl=float(os.getenv('PLACE_DETAILS_FRESH_TTL', str(24 * 3600))),
+    max_age=float(os.getenv('PLACE_DETAILS_MAX_AGE', str(7 * 24 * 3600))),
+    max_entries=int(os.getenv('PLACE_DETAILS_MAX_ENTRIES', '5000')),
+    path=os.getenv('PLACE_DETAILS_CACHE_PATH')
+)
+# Places seen in search responses; hotel and restaurant searches in an area
+# searched within PLACE_INDEX_MAX_AGE seconds are answered locally (0 disables)
+place_index = PlaceIndex(max_places=int(os.getenv('PLACE_INDEX_MAX_PLACES', '50000')))
+places_api = PlacesAPI(
+    os.getenv('GOOGLE_PLACES_API_KEY'),
+    pool_size=int(os.getenv('PLACES_POOL_SIZE', '20')),
+    connect_timeout=float(os.getenv('PLACES_CONNECT_TIMEOUT', '3.05')),
+    read_timeout=float(os.getenv('PLACES_READ_TIMEOUT', '10')),
+    max_retries=int(os.getenv('PLACES_MAX_RETRIES', '3')),
+    details_workers=int(os.getenv('PLACES_DETAILS_WORKERS', '8')),
+    details_rate=float(os.getenv('PLACES_DETAILS_RATE', '10')),
+    geocode_cache=geocode_cache,
+    details_store=details_store,
+    max_results=int(os.getenv('PLACES_MAX_RESULTS', '20')),
+    early_stop_count=int(os.getenv('PLACES_EARLY_STOP_COUNT')) if os.getenv('PLACES_EARLY_STOP_COUNT') else None,
+    early_stop_rating=float(os.getenv('PLACES_EARLY_STOP_RATING', '4.0')),
+    place_index=place_index,
+    index_max_age=float(os.getenv('PLACE_INDEX_MAX_AGE', str(6 * 3600)))
+)
+# Set SCORE_CACHE_PATH to keep AI relevance scores across restarts
+score_cache_path = os.getenv('SCORE_CACHE_PATH')
+score_cache = TTLCache(
+    max_entries=int(os.getenv('SCORE_CACHE_MAX_ENTRIES', '10000')),
+    ttl=float(os.getenv('SCORE_CACHE_TTL', str(6 * 3600))),
+    backend=SQLiteCache(score_cache_path, table='ai_scores') if score_cache_path else None
+)
+gemini_ai = GeminiAI(
+    os.getenv('GEMINI_API_KEY'),
+    score_cache=score_cache,
+    batch_scoring=os.getenv('GEMINI_BATCH_SCORING', 'true').lower() == 'true',
+    # Process-wide cap on in-flight Gemini calls, adapted to 429s and latency
+    limiter=AIMDLimiter(
+        initial=int(os.getenv('GEMINI_INITIAL_CONCURRENCY', '8')),
+        max_limit=int(os.getenv('GEMINI_MAX_CONCURRENCY', '32')),
+        latency_target=float(os.getenv('GEMINI_LATENCY_TARGET', '20'))
+    ),
+    # Scoring calls slower than this percentile of recent ones are duplicated (0 disables)
+    hedge_percentile=float(os.getenv('GEMINI_HEDGE_PERCENTILE', '0.95')) or None,
+    min_hedge_delay=float(os.getenv('GEMINI_MIN_HEDGE_DELAY', '2'))
+)
+# Seconds a search may take before places Gemini has not scored yet fall back
+# to the pre-rank heuristic (0 waits for every score)
+search_budget = float(os.getenv('SEARCH_DEADLINE', '25'))
+# Only the PRERANK_TOP_K most promising candidates are scored by Gemini (0 scores all)
+prerank_top_k = int(os.getenv('PRERANK_TOP_K', '10'))
+preranker = PreRanker(top_k=prerank_top_k if prerank_top_k > 0 else None)
+# Identical concurrent searches share one run, and successful results are
+# reused for SEARCH_CACHE_TTL seconds (0 only coalesces in-flight searches)
+search_cache_ttl = float(os.getenv('SEARCH_CACHE_TTL', '60'))
+search_flight = SingleFlight(
+    cache=TTLCache(
+        max_entries=int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '256')),
+        ttl=search_cache_ttl
+    ) if search_cache_ttl > 0 else None,
+    cacheable=lambda outcome: outcome[0] is not None
+)
+
+# Counters kept by the services above, exported on /metrics at scrape time
+register_caches({
+    'geocode': geocode_cache.stats,
+    'place_details': lambda: details_store.stats()['cache'],
+    'ai_scores': score_cache.stats,
+    'search_results': lambda: search_flight.stats().get('cache', {})
+})
+REGISTRY.callback(
+    'navigatio_place_details_lookups_total', 'Place details lookups by freshness of the stored copy.',
+    'counter', ['result'],
+    lambda: [((result,), details_store.stats()[field]) for result, field in
+             (('fresh', 'freshHits'), ('stale', 'staleHits'), ('miss', 'misses'))]
+)
+REGISTRY.callback(
+    'navigatio_place_index_searches_total', 'Type searches answered from the local place index or sent upstream.',
+    'counter', ['result'],
+    lambda: [((result,), place_index.stats()[field]) for result, field in
+             (('local', 'localAnswers'), ('upstream', 'upstreamNeeded'))]
+)
+REGISTRY.callback(
+    'navigatio_place_index_places', 'Places held in the local place index.',
+    'gauge', [], lambda: [((), place_index.stats()['places'])]
+)
+REGISTRY.callback(
+    'navigatio_searches_shared_total', 'Searches answered by joining an identical in-flight search.',
+    'counter', [], lambda: [((), search_flight.stats()['shared'])]
+)
+REGISTRY.callback(
+    'navigatio_gemini_concurrency', 'Adaptive limit on and number of in-flight Gemini calls.',
+    'gauge', ['value'],
+    lambda: [(('limit',), gemini_ai.limiter.limit), (('in_flight',), gemini_ai.limiter.stats()['inFlight'])]
+)
 
 # Error handlers
 @app.errorhandler(400)
@@ -84,6 +210,20 @@ def internal_error(error):
         }
     }), 500
 
+def debug_requested(headers):
+    return allow_debug_header and headers.get('X-Debug-Log', '').lower() in ('1', 'true')
+
+# Tag logs with a request id (taken from X-Request-ID when sent)
+@app.before_request
+def bind_log_context():
+    g.log_tokens = start_request(request.headers.get('X-Request-ID'), debug_requested(request.headers))
+
+@app.teardown_request
+def unbind_log_context(error=None):
+    tokens = g.pop('log_tokens', None)
+    if tokens is not None:
+        end_request(tokens)
+
 # Add rate limit headers to all responses
 @app.after_request
 def add_rate_limit_headers(response):
@@ -99,8 +239,395 @@ def add_rate_limit_headers(response):
         # Fallback values if rate limit info not available
         response.headers['X-RateLimit-Limit'] = '100'
         response.headers['X-RateLimit-Remaining'] = '99'
+    if current_request_id():
+        response.headers['X-Request-ID'] = current_request_id()
+    return response
+
+@app.after_request
+def encode_json_response(response):
+    # ETag / If-None-Match and Accept-Encoding negotiation for buffered JSON
+    # responses; event streams and already encoded bodies are left alone
+    if response.direct_passthrough or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers:
+        return response
+    status, body, etag, encoding = encode_body(response.get_data(), response.status_code, request.headers,
+                                               request.method, compress_min_bytes)
+    response.vary.add('Accept-Encoding')
+    if etag:
+        response.headers['ETag'] = etag
+    if status == 304:
+        response.status_code = 304
+        response.set_data(b'')
+        response.headers.pop('Content-Type', None)
+        return response
+    if encoding:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
     return response
 
+# Search pipelines shared by the JSON and streaming endpoints.
+# Each run_* function returns the response data (None when nothing was found)
+# and the Pipeline with its per-stage timings. When emit is given, places are
+# emitted as their details arrive and scores as they complete.
+def format_result(place):
+    """Convert a scored Place into the API response shape of its search."""
+    return place.to_json()
+
+def score_event(place):
+    return {"placeId": place.place_id, "aiAnalysis": place.ai_analysis.to_json()}
+
+def relevance_key(place):
+    # AI-scored places rank ahead of heuristic-only ones, then by relevance score
+    analysis = place.ai_analysis
+    return (not analysis.heuristic, analysis.relevance_score)
+
+def prompt_keywords(text):
+    """Words of a free-text preference that are matched against place types."""
+    return [word for word in text.lower().split() if len(word) > 2]
+
+def search_deadline():
+    """time.monotonic() value by which a search starting now must finish scoring, or None."""
+    return time.monotonic() + search_budget if search_budget > 0 else None
+
+def prerank_candidates(category, places, origin, price_range, type_keywords=(), max_distance_m=None, emit=None):
+    """Split candidates into those worth scoring with Gemini and heuristic-only ones."""
+    top, rest = preranker.split(places, origin, price_range, type_keywords, max_distance_m)
+    if rest:
+        SCORED_PLACES.inc(len(rest), category=category, source='prerank')
+    if emit:
+        for place in rest:
+            emit('score', score_event(place))
+    return top, rest
+
+def fill_unscored(category, places, origin, price_range, type_keywords=(), max_distance_m=None, emit=None):
+    """Give places Gemini did not score before the deadline the pre-rank heuristic analysis."""
+    filled = preranker.fill_missing(places, origin, price_range, type_keywords, max_distance_m)
+    if filled:
+        log.warning("Results not scored by the deadline, using heuristic scores",
+                    category=category, unscored=len(filled))
+        SCORED_PLACES.inc(len(filled), category=category, source='deadline')
+        if emit:
+            for place in filled:
+                emit('score', score_event(place))
+    return places
+
+def hotel_search_params(data):
+    """Validate a hotel search body and extract its parameters."""
+    validate_request_body(data, ['city', 'dateRange', 'priceRange'])
+    return {
+        "city": data['city'],
+        "check_in": data['dateRange']['checkIn'],
+        "check_out": data['dateRange']['checkOut'],
+        "price_range": data['priceRange'],
+        "location_prefs": data.get('locationPreferences', ''),
+        "trip_description": data.get('tripDescription', ''),
+        "excluded_hotels": data.get('excludedHotels', [])
+    }
+
+def run_hotel_search(params, emit=None):
+    """Run the hotel search pipeline. Returns (data or None, pipeline)."""
+    deadline = search_deadline()
+    # All Gemini scoring calls of this search share one fairness group
+    scoring_group = object()
+    # Hotel search radius is 5km
+    heuristic = {'price_range': params['price_range'], 'max_distance_m': 5000}
+    
+    def generate_query():
+        # Generate search query using Gemini
+        search_query = gemini_ai.generate_hotel_search_query(
+            params['city'], params['check_in'], params['check_out'], params['price_range'],
+            params['location_prefs'], params['trip_description']
+        )
+        if emit:
+            emit('query', {"query": search_query})
+        return search_query
+    
+    def search(geocode):
+        # Search for hotels using Google Places
+        if not geocode:
+            return []
+        return places_api.search_hotels(
+            params['city'], params['price_range'], params['location_prefs'], params['excluded_hotels'],
+            on_place=(lambda hotel: emit('place', format_result(hotel))) if emit else None,
+            coords=geocode
+        )
+    
+    def prerank(search, geocode):
+        return prerank_candidates('hotel', search, geocode, emit=emit, **heuristic)
+    
+    def score(prerank, geocode):
+        # Score the pre-ranked hotels with AI in parallel
+        top, rest = prerank
+        if not top:
+            return rest
+        scored = gemini_ai.score_hotels_parallel(
+            top, params['city'], params['check_in'], params['check_out'], params['price_range'],
+            params['location_prefs'], params['trip_description'],
+            on_scored=(lambda hotel: emit('score', score_event(hotel))) if emit else None,
+            deadline=deadline, group=scoring_group
+        )
+        return fill_unscored('hotel', scored, geocode, emit=emit, **heuristic) + rest
+    
+    def rank(score):
+        # Sort by relevance score (highest first)
+        score.sort(key=relevance_key, reverse=True)
+        return [format_result(hotel) for hotel in score]
+    
+    # The query is only echoed back, so it is generated alongside the Places calls
+    pipeline = (Pipeline(name='hotels')
+                .add('query', generate_query)
+                .add('geocode', lambda: places_api.get_coordinates(params['city']))
+                .add('search', search, ['geocode'])
+                .add('prerank', prerank, ['search', 'geocode'])
+                .add('score', score, ['prerank', 'geocode'])
+                .add('rank', rank, ['score']))
+    stages = pipeline.run()
+    if not stages['search']:
+        return None, pipeline
+    
+    return {
+        "query": stages['query'],
+        "results": stages['rank'],
+        "totalResults": len(stages['rank'])
+    }, pipeline
+
+def restaurant_search_params(data):
+    """Validate a restaurant search body and extract its parameters."""
+    validate_request_body(data, ['address'])
+    return {
+        "address": data['address'],
+        "price_range": data.get('priceRange', ''),
+        "eating_preferences": data.get('eatingPreferences', ''),
+        "food_restrictions": data.get('foodRestrictions', [])
+    }
+
+def run_restaurant_search(params, emit=None):
+    """Run the restaurant search pipeline. Returns (data or None, pipeline)."""
+    deadline = search_deadline()
+    # All Gemini scoring calls of this search share one fairness group
+    scoring_group = object()
+    # Restaurant search radius is 2km; cuisine words are matched against place types
+    heuristic = {
+        'price_range': params['price_range'],
+        'type_keywords': prompt_keywords(params['eating_preferences']),
+        'max_distance_m': 2000
+    }
+    
+    def generate_query():
+        # Generate search query using Gemini
+        search_query = gemini_ai.generate_restaurant_search_query(
+            params['address'], params['price_range'], params['eating_preferences'], params['food_restrictions']
+        )
+        if emit:
+            emit('query', {"query": search_query})
+        return search_query
+    
+    def search(geocode):
+        # Search for restaurants using Google Places
+        if not geocode:
+            return []
+        return places_api.search_restaurants(
+            params['address'], params['price_range'], params['eating_preferences'], params['food_restrictions'],
+            on_place=(lambda restaurant: emit('place', format_result(restaurant))) if emit else None,
+            coords=geocode
+        )
+    
+    def prerank(search, geocode):
+        return prerank_candidates('restaurant', search, geocode, emit=emit, **heuristic)
+    
+    def score(prerank, geocode):
+        # Score the pre-ranked restaurants with AI in parallel
+        top, rest = prerank
+        if not top:
+            return rest
+        scored = gemini_ai.score_restaurants_parallel(
+            top, params['address'], params['price_range'],
+            params['eating_preferences'], params['food_restrictions'],
+            on_scored=(lambda restaurant: emit('score', score_event(restaurant))) if emit else None,
+            deadline=deadline, group=scoring_group
+        )
+        return fill_unscored('restaurant', scored, geocode, emit=emit, **heuristic) + rest
+    
+    def rank(score):
+        # Sort by relevance score (highest first)
+        score.sort(key=relevance_key, reverse=True)
+        return [format_result(restaurant) for restaurant in score]
+    
+    # The query is only echoed back, so it is generated alongside the Places calls
+    pipeline = (Pipeline(name='restaurants')
+                .add('query', generate_query)
+                .add('geocode', lambda: places_api.get_coordinates(params['address']))
+                .add('search', search, ['geocode'])
+                .add('prerank', prerank, ['search', 'geocode'])
+                .add('score', score, ['prerank', 'geocode'])
+                .add('rank', rank, ['score']))
+    stages = pipeline.run()
+    if not stages['search']:
+        return None, pipeline
+    
+    return {
+        "query": stages['query'],
+        "referenceAddress": params['address'],
+        "results": stages['rank'],
+        "totalResults": len(stages['rank'])
+    }, pipeline
+
+def activity_search_params(data):
+    """Validate an activity search body and extract its parameters."""
+    validate_request_body(data, ['address', 'searchPrompt'])
+    return {
+        "address": data['address'],
+        "price_range": data.get('priceRange', ''),
+        "max_distance": data.get('maxDistance', ''),
+        "search_prompt": data['searchPrompt']
+    }
+
+def run_activity_search(params, emit=None):
+    """Run the activity search pipeline. Returns (data or None, pipeline)."""
+    deadline = search_deadline()
+    # All Gemini scoring calls of this search share one fairness group
+    scoring_group = object()
+    heuristic = {
+        'price_range': params['price_range'],
+        'type_keywords': prompt_keywords(params['search_prompt']),
+        'max_distance_m': places_api.activity_radius(params['max_distance'])
+    }
+    
+    def generate_query():
+        # Generate search query using Gemini
+        search_query = gemini_ai.generate_activity_search_query(
+            params['address'], params['price_range'], params['max_distance'], params['search_prompt']
+        )
+        if emit:
+            emit('query', {"query": search_query})
+        print(f"[DEBUG] Generated activity search query: {search_query}")
+        return search_query
+    
+    def search(query, geocode):
+        # Search for activities using Google Places with the Gemini-generated query
+        if not geocode:
+            return []
+        return places_api.search_activities(
+            params['address'], params['price_range'], params['max_distance'], query,  # Use the Gemini-generated query instead of search_prompt
+            on_place=(lambda activity: emit('place', format_result(activity))) if emit else None,
+            coords=geocode
+        )
+    
+    def prerank(search, geocode):
+        return prerank_candidates('activity', search, geocode, emit=emit, **heuristic)
+    
+    def score(prerank, geocode):
+        # Score the pre-ranked activities with AI in parallel
+        top, rest = prerank
+        if not top:
+            return rest
+        scored = gemini_ai.score_activities_parallel(
+            top, params['address'], params['price_range'],
+            params['max_distance'], params['search_prompt'],
+            on_scored=(lambda activity: emit('score', score_event(activity))) if emit else None,
+            deadline=deadline, group=scoring_group
+        )
+        return fill_unscored('activity', scored, geocode, emit=emit, **heuristic) + rest
+    
+    def rank(score):
+        # Sort by relevance score (highest first)
+        score.sort(key=relevance_key, reverse=True)
+        return [format_result(activity) for activity in score]
+    
+    # The query feeds textsearch, so only geocoding can overlap it
+    pipeline = (Pipeline(name='activities')
+                .add('query', generate_query)
+                .add('geocode', lambda: places_api.get_coordinates(params['address']))
+                .add('search', search, ['query', 'geocode'])
+                .add('prerank', prerank, ['search', 'geocode'])
+                .add('score', score, ['prerank', 'geocode'])
+                .add('rank', rank, ['score']))
+    stages = pipeline.run()
+    if not stages['search']:
+        return None, pipeline
+    
+    return {
+        "query": stages['query'],
+        "referenceAddress": params['address'],
+        "results": stages['rank'],
+        "totalResults": len(stages['rank'])
+    }, pipeline
+
+def coalesced_search(kind, run_search, params):
+    """Run a JSON search, joining an identical in-flight or recent one.
+    
+    Returns (data or None, pipeline, source); see SingleFlight for source.
+    """
+    (result, pipeline), source = search_flight.do(request_key(kind, params), lambda: run_search(params))
+    return result, pipeline, source
+
+def stream_search(run_search, params, not_found_message, log_label):
+    """Stream a search as Server-Sent Events.
+    
+    Emits `query`, then a `place` event per detailed place, a `score` event per
+    scored place, the per-stage `timings`, and finally a `summary` event
+    carrying the same data as the JSON endpoint (or an `error` event).
+    """
+    def producer(emit):
+        result, pipeline = run_search(params, emit)
+        emit('timings', pipeline.timings)
+        if result is None:
+            emit('error', {"code": "NO_RESULTS_FOUND", "message": not_found_message})
+        else:
+            emit('summary', result)
+    
+    def on_error(e):
+        app.logger.error(f"Error in {log_label} stream: {str(e)}")
+        return 'error', {
+            "code": "EXTERNAL_SERVICE_ERROR",
+            "message": f"Error communicating with external services: {str(e)}"
+        }
+    
+    return Response(
+        EventStream(producer, on_error),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def invalid_request(message):
+    return jsonify({
+        "success": False,
+        "data": None,
+        "error": {
+            "code": "INVALID_REQUEST",
+            "message": message
+        }
+    }), 400
+
+def invalid_date_range():
+    return jsonify({
+        "success": False,
+        "data": None,
+        "error": {
+            "code": "INVALID_DATE_RANGE",
+            "message": "Check-in date must be before check-out date"
+        }
+    }), 400
+
+def no_results(message):
+    return jsonify({
+        "success": False,
+        "data": None,
+        "error": {
+            "code": "NO_RESULTS_FOUND",
+            "message": message
+        }
+    }), 404
+
+def external_service_error(e):
+    return jsonify({
+        "success": False,
+        "data": None,
+        "error": {
+            "code": "EXTERNAL_SERVICE_ERROR",
+            "message": f"Error communicating with external services: {str(e)}"
+        }
+    }), 500
+
 # Routes
 @app.route('/hotels/search', methods=['POST'])
 @require_api_key
@@ -108,112 +635,43 @@ def add_rate_limit_headers(response):
 def search_hotels():
     """Search for hotels based on location, dates, and preferences."""
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['city', 'dateRange', 'priceRange']
-        validate_request_body(data, required_fields)
+        params = hotel_search_params(request.get_json())
         
         # Validate date range
-        check_in = data['dateRange']['checkIn']
-        check_out = data['dateRange']['checkOut']
-        if not validate_date_range(check_in, check_out):
-            return jsonify({
-                "success": False,
-                "data": None,
-                "error": {
-                    "code": "INVALID_DATE_RANGE",
-                    "message": "Check-in date must be before check-out date"
-                }
-            }), 400
-        
-        city = data['city']
-        price_range = data['priceRange']
-        location_prefs = data.get('locationPreferences', '')
-        trip_description = data.get('tripDescription', '')
-        excluded_hotels = data.get('excludedHotels', [])
-        
-        # Generate search query using Gemini
-        search_query = gemini_ai.generate_hotel_search_query(
-            city, check_in, check_out, price_range, location_prefs, trip_description
-        )
-        
-        # Search for hotels using Google Places
-        hotels = places_api.search_hotels(
-            city, price_range, location_prefs, excluded_hotels
-        )
-        
-        if not hotels:
-            return jsonify({
-                "success": False,
-                "data": None,
-                "error": {
-                    "code": "NO_RESULTS_FOUND",
-                    "message": "No hotels found matching the search criteria"
-                }
-            }), 404
+        if not validate_date_range(params['check_in'], params['check_out']):
+            return invalid_date_range()
         
-        # Score hotels with AI in parallel
-        scored_hotels = gemini_ai.score_hotels_parallel(
-            hotels, city, check_in, check_out, price_range, 
-            location_prefs, trip_description
-        )
-        
-        # Sort by relevance score (highest first)
-        scored_hotels.sort(key=lambda x: x['aiAnalysis']['relevanceScore'], reverse=True)
+        result, pipeline, source = coalesced_search('hotels', run_hotel_search, params)
+        if result is None:
+            return no_results("No hotels found matching the search criteria")
         
-        # Format response
-        results = []
-        for hotel in scored_hotels:
-            hotel_result = {
-                "name": hotel['name'],
-                "images": hotel.get('images', []),
-                "roomPrices": hotel.get('roomPrices', {
-                    "available": False,
-                    "pricePerNight": None,
-                    "totalPrice": None,
-                    "currency": "USD"
-                }),
-                "address": hotel.get('address', ''),
-                "reviews": hotel.get('reviews', {
-                    "rating": 0,
-                    "totalReviews": 0,
-                    "snippets": []
-                }),
-                "aiAnalysis": hotel['aiAnalysis'],
-                "placeId": hotel.get('placeId', '')
-            }
-            results.append(hotel_result)
-        
-        return jsonify({
+        response = jsonify({
             "success": True,
-            "data": {
-                "query": search_query,
-                "results": results,
-                "totalResults": len(results)
-            },
+            "data": result,
             "error": None
         })
+        response.headers['Server-Timing'] = pipeline.server_timing()
+        response.headers['X-Search-Cache'] = source
+        return response
         
     except ValueError as e:
-        return jsonify({
-            "success": False,
-            "data": None,
-            "error": {
-                "code": "INVALID_REQUEST",
-                "message": str(e)
-            }
-        }), 400
+        return invalid_request(str(e))
     except Exception as e:
         app.logger.error(f"Error in hotel search: {str(e)}")
-        return jsonify({
-            "success": False,
-            "data": None,
-            "error": {
-                "code": "EXTERNAL_SERVICE_ERROR",
-                "message": f"Error communicating with external services: {str(e)}"
-            }
-        }), 500
+        return external_service_error(e)
+
+@app.route('/hotels/search/stream', methods=['POST'])
+@require_api_key
+@limiter.limit("100 per minute")
+def stream_hotels():
+    """Stream hotel search results as Server-Sent Events."""
+    try:
+        params = hotel_search_params(request.get_json())
+    except ValueError as e:
+        return invalid_request(str(e))
+    if not validate_date_range(params['check_in'], params['check_out']):
+        return invalid_date_range()
+    return stream_search(run_hotel_search, params, "No hotels found matching the search criteria", "hotel search")
 
 @app.route('/restaurants/search', methods=['POST'])
 @require_api_key
@@ -221,96 +679,37 @@ def search_hotels():
 def search_restaurants():
     """Search for restaurants near a specific address."""
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        validate_request_body(data, ['address'])
-        
-        address = data['address']
-        price_range = data.get('priceRange', '')
-        eating_preferences = data.get('eatingPreferences', '')
-        food_restrictions = data.get('foodRestrictions', [])
-        
-        # Generate search query using Gemini
-        search_query = gemini_ai.generate_restaurant_search_query(
-            address, price_range, eating_preferences, food_restrictions
-        )
-        
-        # Search for restaurants using Google Places
-        restaurants = places_api.search_restaurants(
-            address, price_range, eating_preferences, food_restrictions
-        )
-        
-        if not restaurants:
-            return jsonify({
-                "success": False,
-                "data": None,
-                "error": {
-                    "code": "NO_RESULTS_FOUND",
-                    "message": "No restaurants found matching the search criteria"
-                }
-            }), 404
+        params = restaurant_search_params(request.get_json())
         
-        # Score restaurants with AI in parallel
-        scored_restaurants = gemini_ai.score_restaurants_parallel(
-            restaurants, address, price_range, eating_preferences, food_restrictions
-        )
-        
-        # Sort by relevance score (highest first)
-        scored_restaurants.sort(key=lambda x: x['aiAnalysis']['relevanceScore'], reverse=True)
+        result, pipeline, source = coalesced_search('restaurants', run_restaurant_search, params)
+        if result is None:
+            return no_results("No restaurants found matching the search criteria")
         
-        # Format response
-        results = []
-        for restaurant in scored_restaurants:
-            restaurant_result = {
-                "name": restaurant['name'],
-                "images": restaurant.get('images', []),
-                "priceLevel": restaurant.get('priceLevel', ''),
-                "address": restaurant.get('address', ''),
-                "reviews": restaurant.get('reviews', {
-                    "rating": 0,
-                    "totalReviews": 0,
-                    "snippets": []
-                }),
-                "aiAnalysis": restaurant['aiAnalysis'],
-                "placeId": restaurant.get('placeId', ''),
-                "distance": restaurant.get('distance', {
-                    "meters": 0,
-                    "text": "Unknown"
-                })
-            }
-            results.append(restaurant_result)
-        
-        return jsonify({
+        response = jsonify({
             "success": True,
-            "data": {
-                "query": search_query,
-                "referenceAddress": address,
-                "results": results,
-                "totalResults": len(results)
-            },
+            "data": result,
             "error": None
         })
+        response.headers['Server-Timing'] = pipeline.server_timing()
+        response.headers['X-Search-Cache'] = source
+        return response
         
     except ValueError as e:
-        return jsonify({
-            "success": False,
-            "data": None,
-            "error": {
-                "code": "INVALID_REQUEST",
-                "message": str(e)
-            }
-        }), 400
+        return invalid_request(str(e))
     except Exception as e:
         app.logger.error(f"Error in restaurant search: {str(e)}")
-        return jsonify({
-            "success": False,
-            "data": None,
-            "error": {
-                "code": "EXTERNAL_SERVICE_ERROR",
-                "message": f"Error communicating with external services: {str(e)}"
-            }
-        }), 500
+        return external_service_error(e)
+
+@app.route('/restaurants/search/stream', methods=['POST'])
+@require_api_key
+@limiter.limit("100 per minute")
+def stream_restaurants():
+    """Stream restaurant search results as Server-Sent Events."""
+    try:
+        params = restaurant_search_params(request.get_json())
+    except ValueError as e:
+        return invalid_request(str(e))
+    return stream_search(run_restaurant_search, params, "No restaurants found matching the search criteria", "restaurant search")
 
 @app.route('/activities/search', methods=['POST'])
 @require_api_key
@@ -318,99 +717,37 @@ def search_restaurants():
 def search_activities():
     """Search for activities and attractions near a specific address."""
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        validate_request_body(data, ['address', 'searchPrompt'])
-        
-        address = data['address']
-        price_range = data.get('priceRange', '')
-        max_distance = data.get('maxDistance', '')
-        search_prompt = data['searchPrompt']
-        
-        # Generate search query using Gemini
-        search_query = gemini_ai.generate_activity_search_query(
-            address, price_range, max_distance, search_prompt
-        )
-        
-        print(f"[DEBUG] Generated activity search query: {search_query}")
+        params = activity_search_params(request.get_json())
         
-        # Search for activities using Google Places with the Gemini-generated query
-        activities = places_api.search_activities(
-            address, price_range, max_distance, search_query  # Use the Gemini-generated query instead of search_prompt
-        )
-        
-        if not activities:
-            return jsonify({
-                "success": False,
-                "data": None,
-                "error": {
-                    "code": "NO_RESULTS_FOUND",
-                    "message": "No activities found matching the search criteria"
-                }
-            }), 404
-        
-        # Score activities with AI in parallel
-        scored_activities = gemini_ai.score_activities_parallel(
-            activities, address, price_range, max_distance, search_prompt
-        )
+        result, pipeline, source = coalesced_search('activities', run_activity_search, params)
+        if result is None:
+            return no_results("No activities found matching the search criteria")
         
-        # Sort by relevance score (highest first)
-        scored_activities.sort(key=lambda x: x['aiAnalysis']['relevanceScore'], reverse=True)
-        
-        # Format response
-        results = []
-        for activity in scored_activities:
-            activity_result = {
-                "name": activity['name'],
-                "images": activity.get('images', []),
-                "priceInfo": activity.get('priceInfo', ''),
-                "address": activity.get('address', ''),
-                "reviews": activity.get('reviews', {
-                    "rating": 0,
-                    "totalReviews": 0,
-                    "snippets": []
-                }),
-                "aiAnalysis": activity['aiAnalysis'],
-                "placeId": activity.get('placeId', ''),
-                "distance": activity.get('distance', {
-                    "meters": 0,
-                    "text": "Unknown"
-                }),
-                "activityType": activity.get('activityType', '')
-            }
-            results.append(activity_result)
-        
-        return jsonify({
+        response = jsonify({
             "success": True,
-            "data": {
-                "query": search_query,
-                "referenceAddress": address,
-                "results": results,
-                "totalResults": len(results)
-            },
+            "data": result,
             "error": None
         })
+        response.headers['Server-Timing'] = pipeline.server_timing()
+        response.headers['X-Search-Cache'] = source
+        return response
         
     except ValueError as e:
-        return jsonify({
-            "success": False,
-            "data": None,
-            "error": {
-                "code": "INVALID_REQUEST",
-                "message": str(e)
-            }
-        }), 400
+        return invalid_request(str(e))
     except Exception as e:
         app.logger.error(f"Error in activity search: {str(e)}")
-        return jsonify({
-            "success": False,
-            "data": None,
-            "error": {
-                "code": "EXTERNAL_SERVICE_ERROR",
-                "message": f"Error communicating with external services: {str(e)}"
-            }
-        }), 500
+        return external_service_error(e)
+
+@app.route('/activities/search/stream', methods=['POST'])
+@require_api_key
+@limiter.limit("100 per minute")
+def stream_activities():
+    """Stream activity search results as Server-Sent Events."""
+    try:
+        params = activity_search_params(request.get_json())
+    except ValueError as e:
+        return invalid_request(str(e))
+    return stream_search(run_activity_search, params, "No activities found matching the search criteria", "activity search")
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -424,6 +761,12 @@ def health_check():
         "error": None
     })
 
+@app.route('/metrics', methods=['GET'])
+@limiter.exempt
+def metrics():
+    """Prometheus metrics endpoint."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
 
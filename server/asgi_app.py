@@ -0,0 +1,344 @@
+"""Async (ASGI) variant of the search API.
+
+Serves the JSON search endpoints from app.py on an event loop, so waiting on
+Google Places and Gemini does not pin a worker thread per request. Services,
+caches and response formatting are shared with app.py. The streaming
+endpoints are only served by the Flask app.
+
+Run with: hypercorn asgi_app:app --bind 0.0.0.0:5000
+"""
+from quart import Quart, Response, request, jsonify, g
+from limits import parse
+from limits.storage import MemoryStorage
+from limits.strategies import FixedWindowRateLimiter
+from datetime import datetime
+
+from app import (
+    places_api, gemini_ai, search_flight, json_backend, compress_min_bytes,
+    debug_requested, hotel_search_params, restaurant_search_params, activity_search_params,
+    format_result,
+    relevance_key, prompt_keywords, prerank_candidates, fill_unscored, search_deadline
+)
+from utils.validators import validate_date_range
+from utils.pipeline import AsyncPipeline
+from utils.singleflight import request_key
+from utils.metrics import REGISTRY
+from utils.log import start_request, end_request, current_request_id
+from utils.responses import FastJSONProvider, encode_body
+from middleware.async_auth import require_api_key_async
+
+app = Quart(__name__)
+app.config['JSON_SORT_KEYS'] = False
+app.json = FastJSONProvider(app, backend=json_backend)
+
+ALLOWED_ORIGINS = {"http://localhost:3000", "http://127.0.0.1:3000"}
+
+# Same per-client limit as the Flask app
+RATE_LIMIT = parse("100 per minute")
+rate_limiter = FixedWindowRateLimiter(MemoryStorage())
+
+def error_response(code, message, status):
+    return jsonify({
+        "success": False,
+        "data": None,
+        "error": {
+            "code": code,
+            "message": message
+        }
+    }), status
+
+@app.before_request
+async def bind_log_context():
+    g.log_tokens = start_request(request.headers.get('X-Request-ID'), debug_requested(request.headers))
+
+@app.teardown_request
+async def unbind_log_context(error=None):
+    tokens = g.pop('log_tokens', None)
+    if tokens is not None:
+        end_request(tokens)
+
+@app.before_request
+async def check_rate_limit():
+    if request.method == 'OPTIONS' or request.path == '/metrics':
+        return None
+    if not rate_limiter.hit(RATE_LIMIT, request.remote_addr):
+        return error_response("RATE_LIMIT_EXCEEDED", "Too many requests. Rate limit: 100 requests per minute.", 429)
+    return None
+
+@app.after_request
+async def add_headers(response):
+    origin = request.headers.get('Origin')
+    if origin in ALLOWED_ORIGINS:
+        response.headers['Access-Control-Allow-Origin'] = origin
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+        response.vary.add('Origin')
+    reset, remaining = rate_limiter.get_window_stats(RATE_LIMIT, request.remote_addr)
+    response.headers['X-RateLimit-Limit'] = str(RATE_LIMIT.amount)
+    response.headers['X-RateLimit-Remaining'] = str(remaining)
+    response.headers['X-RateLimit-Reset'] = str(int(reset))
+    if current_request_id():
+        response.headers['X-Request-ID'] = current_request_id()
+    return response
+
+@app.after_request
+async def encode_json_response(response):
+    # Same ETag and compression handling as the Flask app
+    if response.mimetype != 'application/json' or 'Content-Encoding' in response.headers:
+        return response
+    status, body, etag, encoding = encode_body(await response.get_data(), response.status_code, request.headers,
+                                               request.method, compress_min_bytes)
+    response.vary.add('Accept-Encoding')
+    if etag:
+        response.headers['ETag'] = etag
+    if status == 304:
+        response.status_code = 304
+        response.set_data(b'')
+        response.headers.pop('Content-Type', None)
+        return response
+    if encoding:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.after_serving
+async def close_clients():
+    await places_api.aclose()
+
+@app.errorhandler(500)
+async def internal_error(error):
+    return error_response("INTERNAL_ERROR", "An unexpected error occurred", 500)
+
+# Async search pipelines, with the same stages as the run_* functions in app.py
+async def run_hotel_search(params):
+    """Run the hotel search pipeline. Returns (data or None, pipeline)."""
+    deadline = search_deadline()
+    heuristic = {'price_range': params['price_range'], 'max_distance_m': 5000}
+    
+    async def search(geocode):
+        if not geocode:
+            return []
+        return await places_api.search_hotels_async(
+            params['city'], params['price_range'], params['location_prefs'], params['excluded_hotels'],
+            coords=geocode
+        )
+    
+    def prerank(search, geocode):
+        return prerank_candidates('hotel', search, geocode, **heuristic)
+    
+    async def score(prerank, geocode):
+        top, rest = prerank
+        if not top:
+            return rest
+        scored = await gemini_ai.score_hotels_async(
+            top, params['city'], params['check_in'], params['check_out'], params['price_range'],
+            params['location_prefs'], params['trip_description'], deadline=deadline
+        )
+        return fill_unscored('hotel', scored, geocode, **heuristic) + rest
+    
+    def rank(score):
+        score.sort(key=relevance_key, reverse=True)
+        return [format_result(hotel) for hotel in score]
+    
+    pipeline = (AsyncPipeline(name='hotels')
+                .add('query', lambda: gemini_ai.generate_hotel_search_query_async(
+                    params['city'], params['check_in'], params['check_out'], params['price_range'],
+                    params['location_prefs'], params['trip_description']
+                ))
+                .add('geocode', lambda: places_api.get_coordinates_async(params['city']))
+                .add('search', search, ['geocode'])
+                .add('prerank', prerank, ['search', 'geocode'])
+                .add('score', score, ['prerank', 'geocode'])
+                .add('rank', rank, ['score']))
+    stages = await pipeline.run()
+    if not stages['search']:
+        return None, pipeline
+    
+    return {
+        "query": stages['query'],
+        "results": stages['rank'],
+        "totalResults": len(stages['rank'])
+    }, pipeline
+
+async def run_restaurant_search(params):
+    """Run the restaurant search pipeline. Returns (data or None, pipeline)."""
+    deadline = search_deadline()
+    heuristic = {
+        'price_range': params['price_range'],
+        'type_keywords': prompt_keywords(params['eating_preferences']),
+        'max_distance_m': 2000
+    }
+    
+    async def search(geocode):
+        if not geocode:
+            return []
+        return await places_api.search_restaurants_async(
+            params['address'], params['price_range'], params['eating_preferences'], params['food_restrictions'],
+            coords=geocode
+        )
+    
+    def prerank(search, geocode):
+        return prerank_candidates('restaurant', search, geocode, **heuristic)
+    
+    async def score(prerank, geocode):
+        top, rest = prerank
+        if not top:
+            return rest
+        scored = await gemini_ai.score_restaurants_async(
+            top, params['address'], params['price_range'],
+            params['eating_preferences'], params['food_restrictions'], deadline=deadline
+        )
+        return fill_unscored('restaurant', scored, geocode, **heuristic) + rest
+    
+    def rank(score):
+        score.sort(key=relevance_key, reverse=True)
+        return [format_result(restaurant) for restaurant in score]
+    
+    pipeline = (AsyncPipeline(name='restaurants')
+                .add('query', lambda: gemini_ai.generate_restaurant_search_query_async(
+                    params['address'], params['price_range'], params['eating_preferences'], params['food_restrictions']
+                ))
+                .add('geocode', lambda: places_api.get_coordinates_async(params['address']))
+                .add('search', search, ['geocode'])
+                .add('prerank', prerank, ['search', 'geocode'])
+                .add('score', score, ['prerank', 'geocode'])
+                .add('rank', rank, ['score']))
+    stages = await pipeline.run()
+    if not stages['search']:
+        return None, pipeline
+    
+    return {
+        "query": stages['query'],
+        "referenceAddress": params['address'],
+        "results": stages['rank'],
+        "totalResults": len(stages['rank'])
+    }, pipeline
+
+async def run_activity_search(params):
+    """Run the activity search pipeline. Returns (data or None, pipeline)."""
+    deadline = search_deadline()
+    heuristic = {
+        'price_range': params['price_range'],
+        'type_keywords': prompt_keywords(params['search_prompt']),
+        'max_distance_m': places_api.activity_radius(params['max_distance'])
+    }
+    
+    async def search(query, geocode):
+        if not geocode:
+            return []
+        return await places_api.search_activities_async(
+            params['address'], params['price_range'], params['max_distance'], query,
+            coords=geocode
+        )
+    
+    def prerank(search, geocode):
+        return prerank_candidates('activity', search, geocode, **heuristic)
+    
+    async def score(prerank, geocode):
+        top, rest = prerank
+        if not top:
+            return rest
+        scored = await gemini_ai.score_activities_async(
+            top, params['address'], params['price_range'],
+            params['max_distance'], params['search_prompt'], deadline=deadline
+        )
+        return fill_unscored('activity', scored, geocode, **heuristic) + rest
+    
+    def rank(score):
+        score.sort(key=relevance_key, reverse=True)
+        return [format_result(activity) for activity in score]
+    
+    pipeline = (AsyncPipeline(name='activities')
+                .add('query', lambda: gemini_ai.generate_activity_search_query_async(
+                    params['address'], params['price_range'], params['max_distance'], params['search_prompt']
+                ))
+                .add('geocode', lambda: places_api.get_coordinates_async(params['address']))
+                .add('search', search, ['query', 'geocode'])
+                .add('prerank', prerank, ['search', 'geocode'])
+                .add('score', score, ['prerank', 'geocode'])
+                .add('rank', rank, ['score']))
+    stages = await pipeline.run()
+    if not stages['search']:
+        return None, pipeline
+    
+    return {
+        "query": stages['query'],
+        "referenceAddress": params['address'],
+        "results": stages['rank'],
+        "totalResults": len(stages['rank'])
+    }, pipeline
+
+async def search_response(kind, run_search, params, not_found_message, log_label):
+    """Run a search, joining an identical in-flight or recent one, and wrap it
+    in the standard response envelope."""
+    try:
+        (result, pipeline), source = await search_flight.do_async(
+            request_key(kind, params), lambda: run_search(params)
+        )
+    except Exception as e:
+        app.logger.error(f"Error in {log_label}: {str(e)}")
+        return error_response("EXTERNAL_SERVICE_ERROR", f"Error communicating with external services: {str(e)}", 500)
+    if result is None:
+        return error_response("NO_RESULTS_FOUND", not_found_message, 404)
+    
+    response = jsonify({
+        "success": True,
+        "data": result,
+        "error": None
+    })
+    response.headers['Server-Timing'] = pipeline.server_timing()
+    response.headers['X-Search-Cache'] = source
+    return response
+
+# Routes
+@app.route('/hotels/search', methods=['POST'])
+@require_api_key_async
+async def search_hotels():
+    """Search for hotels based on location, dates, and preferences."""
+    try:
+        params = hotel_search_params(await request.get_json(silent=True))
+    except ValueError as e:
+        return error_response("INVALID_REQUEST", str(e), 400)
+    if not validate_date_range(params['check_in'], params['check_out']):
+        return error_response("INVALID_DATE_RANGE", "Check-in date must be before check-out date", 400)
+    return await search_response('hotels', run_hotel_search, params, "No hotels found matching the search criteria", "hotel search")
+
+@app.route('/restaurants/search', methods=['POST'])
+@require_api_key_async
+async def search_restaurants():
+    """Search for restaurants near a specific address."""
+    try:
+        params = restaurant_search_params(await request.get_json(silent=True))
+    except ValueError as e:
+        return error_response("INVALID_REQUEST", str(e), 400)
+    return await search_response('restaurants', run_restaurant_search, params, "No restaurants found matching the search criteria", "restaurant search")
+
+@app.route('/activities/search', methods=['POST'])
+@require_api_key_async
+async def search_activities():
+    """Search for activities and attractions near a specific address."""
+    try:
+        params = activity_search_params(await request.get_json(silent=True))
+    except ValueError as e:
+        return error_response("INVALID_REQUEST", str(e), 400)
+    return await search_response('activities', run_activity_search, params, "No activities found matching the search criteria", "activity search")
+
+@app.route('/health', methods=['GET'])
+async def health_check():
+    """Health check endpoint."""
+    return jsonify({
+        "success": True,
+        "data": {
+            "status": "healthy",
+            "timestamp": datetime.now().isoformat()
+        },
+        "error": None
+    })
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    """Prometheus metrics endpoint."""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+if __name__ == '__main__':
+    app.run(debug=True, port=5000)
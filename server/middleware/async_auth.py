@@ -0,0 +1,18 @@
+from functools import wraps
+from quart import request, jsonify
+
+from middleware.auth import authenticate, authentication_failed
+
+def require_api_key_async(f):
+    """require_api_key for the async (Quart) app."""
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        api_key, error = authenticate(request.headers.get('Authorization', ''))
+        if error:
+            return jsonify(authentication_failed(error)), 401
+        
+        request.api_key = api_key
+        
+        return await f(*args, **kwargs)
+    
+    return decorated_function
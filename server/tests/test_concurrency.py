@@ -0,0 +1,20 @@
+import time
+
+from utils.concurrency import FairExecutor
+
+SLEEP = 0.3
+
+def test_fair_executor_runs_a_burst_in_parallel_on_a_warm_pool():
+    executor = FairExecutor(max_workers=32)
+    # Warm the pool so a worker is already started and idle
+    executor.submit('warm', time.sleep, 0).result()
+    time.sleep(0.05)
+
+    start = time.monotonic()
+    futures = [executor.submit('burst', time.sleep, SLEEP) for _ in range(8)]
+    for future in futures:
+        future.result()
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 2 * SLEEP
+    assert executor.stats()['workers'] >= 8
@@ -0,0 +1,200 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .log import get_logger
+
+log = get_logger(__name__)
+
+_TABLE_NAME_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+def normalize_key(text: str) -> str:
+    """Normalize free-form text (a city or address) into a cache key."""
+    key = ' '.join(text.lower().split())
+    key = re.sub(r'\s*,\s*', ', ', key)
+    return key.strip(' ,.')
+
+def estimate_size(value: Any) -> int:
+    """Approximate the memory footprint of a JSON-like value in bytes."""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+class SQLiteCache:
+    """Persistent key/value store with per-entry expiry, backed by SQLite.
+
+    Values are stored as JSON, so only JSON-serializable values are supported.
+    A single connection is shared between threads behind a lock; WAL mode lets
+    several processes (server workers, the batch ranker) share one file.
+    """
+
+    def __init__(self, path: str, table: str = 'cache'):
+        if not _TABLE_NAME_RE.match(table):
+            raise ValueError(f"Invalid table name: {table}")
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {table} ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+            'stored_at REAL NOT NULL, expires_at REAL NOT NULL)'
+        )
+
+    def get(self, key: str) -> Optional[Tuple[Any, float, float]]:
+        """Return (value, stored_at, expires_at) for a live entry, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT value, stored_at, expires_at FROM {self.table} WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None or row[2] <= time.time():
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def set(self, key: str, value: Any, expires_at: float, stored_at: Optional[float] = None) -> None:
+        stored_at = time.time() if stored_at is None else stored_at
+        payload = json.dumps(value, separators=(',', ':'))
+        with self._lock:
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)',
+                (key, payload, stored_at, expires_at)
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+
+    def purge_expired(self) -> int:
+        """Delete expired rows and return how many were removed."""
+        with self._lock:
+            cursor = self._conn.execute(f'DELETE FROM {self.table} WHERE expires_at <= ?', (time.time(),))
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f'DELETE FROM {self.table}')
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a TTL.
+
+    The memory tier is bounded by entry count and, optionally, by an
+    approximate byte budget. When a persistent backend such as SQLiteCache is
+    given, it is consulted on memory misses and written through on every set.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0,
+                 max_bytes: Optional[int] = None, backend: Optional[SQLiteCache] = None,
+                 sizeof: Callable[[Any], int] = estimate_size):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self._sizeof = sizeof
+        # key -> (value, stored_at, expires_at, size)
+        self._entries: "OrderedDict[str, Tuple[Any, float, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get_entry(key) is not None
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[3]
+
+    def _store(self, key: str, value: Any, stored_at: float, expires_at: float) -> None:
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        self._remove(key)
+        self._entries[key] = (value, stored_at, expires_at, size)
+        self._bytes += size
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def get_entry(self, key: str) -> Optional[Tuple[Any, float, float]]:
+        """Return (value, stored_at, expires_at) for a live entry without counting a hit or miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[2] > now:
+                    self._entries.move_to_end(key)
+                    return entry[0], entry[1], entry[2]
+                self._remove(key)
+        if self.backend is not None:
+            try:
+                stored = self.backend.get(key)
+            except sqlite3.Error:
+                log.warning("Cache backend read failed", key=key, exc_info=True)
+                stored = None
+            if stored is not None:
+                with self._lock:
+                    self._store(key, *stored)
+                    self.backend_hits += 1
+                return stored
+        return None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self.get_entry(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return entry[0]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        stored_at = time.time()
+        expires_at = stored_at + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._store(key, value, stored_at, expires_at)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value, expires_at, stored_at)
+            except (sqlite3.Error, TypeError, ValueError):
+                log.warning("Cache backend write failed", key=key, exc_info=True)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'backendHits': self.backend_hits,
+                'evictions': self.evictions,
+                'hitRate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,287 @@
+import asyncio
+import collections
+import concurrent.futures
+import contextvars
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Iterable, Iterator, Optional, Set, Tuple
+
+class AIMDLimiter:
+    """Concurrency limit that adapts to upstream health.
+
+    Each healthy completion grows the limit by 1/limit (about +1 per window of
+    `limit` calls); an overload signal (HTTP 429/503) or a call slower than
+    `latency_target` multiplies it by `decrease_factor`. Decreases are spaced
+    at least `cooldown` seconds apart so one burst of failures, which all
+    started under the old limit, only counts once.
+    """
+
+    def __init__(self, initial: int = 8, min_limit: int = 1, max_limit: int = 32,
+                 decrease_factor: float = 0.5, latency_target: Optional[float] = None,
+                 cooldown: float = 1.0):
+        if not min_limit <= initial <= max_limit:
+            raise ValueError("initial must be between min_limit and max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self.decreases = 0
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self._in_flight < self.limit:
+                self._in_flight += 1
+                return True
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Block until a slot is free. Returns False if timeout expires first."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._in_flight < self.limit, timeout):
+                return False
+            self._in_flight += 1
+            return True
+
+    async def acquire_async(self, timeout: Optional[float] = None, poll: float = 0.02) -> bool:
+        """Like acquire, but waits without blocking the event loop."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.try_acquire():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(poll)
+        return True
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False) -> None:
+        """Free a slot and adjust the limit from the call's outcome."""
+        with self._cond:
+            self._in_flight -= 1
+            slow = self.latency_target is not None and latency is not None and latency > self.latency_target
+            if overloaded or slow:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+                    self._last_decrease = now
+                    self.decreases += 1
+            else:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {'limit': self.limit, 'inFlight': self._in_flight, 'decreases': self.decreases}
+
+class FairExecutor:
+    """Shared thread pool that serves submitting groups round-robin.
+
+    Tasks are queued per group (typically one group per request), and idle
+    workers take the next task from the next group in turn, so a request that
+    submits many tasks cannot starve requests that submit few. Worker threads
+    are started on demand up to `max_workers` and live for the process. Tasks
+    run in a copy of the submitter's context variables.
+    """
+
+    def __init__(self, max_workers: int = 32, thread_name_prefix: str = 'fair'):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._queues: 'collections.OrderedDict[Hashable, collections.deque]' = collections.OrderedDict()
+        self._cond = threading.Condition()
+        self._workers = 0
+        # Workers not running a task (waiting, or started and not yet waiting)
+        self._idle = 0
+        self._queued = 0
+
+    def submit(self, group: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        with self._cond:
+            task = (future, contextvars.copy_context(), fn, args, kwargs)
+            self._queues.setdefault(group, collections.deque()).append(task)
+            self._queued += 1
+            # Enough workers for every queued task, so a burst runs in parallel
+            while self._queued > self._idle and self._workers < self.max_workers:
+                self._workers += 1
+                self._idle += 1
+                threading.Thread(
+                    target=self._work, name=f"{self.thread_name_prefix}-{self._workers}", daemon=True
+                ).start()
+            self._cond.notify()
+        return future
+
+    def _next_task(self) -> tuple:
+        with self._cond:
+            self._cond.wait_for(lambda: self._queues)
+            self._idle -= 1
+            self._queued -= 1
+            # Take one task from the oldest group and move the group to the back
+            group, tasks = self._queues.popitem(last=False)
+            task = tasks.popleft()
+            if tasks:
+                self._queues[group] = tasks
+            return task
+
+    def _work(self) -> None:
+        while True:
+            future, context, fn, args, kwargs = self._next_task()
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = context.run(fn, *args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            with self._cond:
+                self._idle += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'workers': self._workers,
+                'idle': self._idle,
+                'queued': self._queued,
+                'groups': len(self._queues)
+            }
+
+class LatencyTracker:
+    """Sliding window of recent latencies, used to derive percentile thresholds."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: collections.deque = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency at quantile q (0-1), or None until min_samples have been recorded."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+def _drop_attempts(attempts: Dict[Any, Hashable], key: Hashable) -> None:
+    """Cancel the other attempts for a key that already has a result."""
+    for attempt, attempt_key in list(attempts.items()):
+        if attempt_key == key:
+            attempt.cancel()
+            del attempts[attempt]
+
+def as_completed_hedged(keys: Iterable[Hashable],
+                        submit: Callable[..., concurrent.futures.Future],
+                        call: Callable[[Hashable], Any],
+                        hedge_after: Optional[float] = None, deadline: Optional[float] = None,
+                        should_hedge: Optional[Callable[[Hashable], bool]] = None,
+                        poll: float = 0.1) -> Iterator[Tuple[Hashable, concurrent.futures.Future]]:
+    """Run call(key) for each key via submit(fn, key) and yield (key, future) as each finishes.
+
+    An attempt still running hedge_after seconds after it started gets one
+    duplicate, unless should_hedge(key) returns False, and the first attempt
+    to finish is yielded; a failed attempt is only yielded if no other
+    attempt for the key is left. Iteration stops at deadline (a
+    time.monotonic() value) without yielding unfinished keys. Attempts that
+    have not started by then, and duplicates that lost, are cancelled
+    (attempts already running in a thread finish in the background).
+    """
+    started: Dict[Hashable, float] = {}
+
+    def attempt(key):
+        started.setdefault(key, time.monotonic())
+        return call(key)
+
+    attempts = {submit(attempt, key): key for key in keys}
+    remaining = set(attempts.values())
+    hedged: Set[Hashable] = set()
+    try:
+        while remaining:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                return
+            timeouts = [deadline - now] if deadline is not None else []
+            if hedge_after is not None:
+                for key in remaining - hedged:
+                    if key not in started:
+                        # Still queued; check again shortly
+                        timeouts.append(poll)
+                    elif now - started[key] < hedge_after:
+                        timeouts.append(started[key] + hedge_after - now)
+                    else:
+                        hedged.add(key)
+                        if should_hedge is None or should_hedge(key):
+                            attempts[submit(attempt, key)] = key
+
+            done, _ = concurrent.futures.wait(
+                list(attempts), timeout=min(timeouts) if timeouts else None,
+                return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                key = attempts.pop(future, None)
+                if key is None:
+                    # A duplicate dropped earlier in this batch
+                    continue
+                if future.exception() is not None and key in attempts.values():
+                    continue
+                remaining.discard(key)
+                _drop_attempts(attempts, key)
+                yield key, future
+    finally:
+        for future in attempts:
+            future.cancel()
+
+async def as_completed_hedged_async(keys: Iterable[Hashable], call: Callable[[Hashable], Awaitable[Any]],
+                                    hedge_after: Optional[float] = None, deadline: Optional[float] = None,
+                                    should_hedge: Optional[Callable[[Hashable], bool]] = None
+                                    ) -> AsyncIterator[Tuple[Hashable, asyncio.Task]]:
+    """as_completed_hedged for coroutines: each call(key) runs as a task on the
+    current loop. Attempts still running when iteration ends are cancelled."""
+    started: Dict[Hashable, float] = {}
+    attempts: Dict[asyncio.Task, Hashable] = {}
+
+    def start(key):
+        started.setdefault(key, time.monotonic())
+        attempts[asyncio.ensure_future(call(key))] = key
+
+    for key in keys:
+        start(key)
+    remaining = set(started)
+    hedged: Set[Hashable] = set()
+    try:
+        while remaining:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                return
+            timeouts = [deadline - now] if deadline is not None else []
+            if hedge_after is not None:
+                for key in remaining - hedged:
+                    if now - started[key] < hedge_after:
+                        timeouts.append(started[key] + hedge_after - now)
+                    else:
+                        hedged.add(key)
+                        if should_hedge is None or should_hedge(key):
+                            start(key)
+
+            done, _ = await asyncio.wait(
+                list(attempts), timeout=min(timeouts) if timeouts else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                key = attempts.pop(task, None)
+                if key is None:
+                    # A duplicate dropped earlier in this batch
+                    continue
+                if task.exception() is not None and key in attempts.values():
+                    continue
+                remaining.discard(key)
+                _drop_attempts(attempts, key)
+                yield key, task
+    finally:
+        for task in attempts:
+            task.cancel()
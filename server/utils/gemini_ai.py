@@ -1,57 +1,567 @@
 import google.generativeai as genai
-from typing import List, Dict, Any
+from google.api_core import exceptions as google_exceptions
+from typing import List, Dict, Any, Optional, Callable, Hashable
 import json
-import concurrent.futures
+import asyncio
+import dataclasses
+import functools
+import hashlib
 import re
+import time
+
+from .cache import TTLCache, normalize_key
+from .concurrency import AIMDLimiter, FairExecutor, LatencyTracker, as_completed_hedged, as_completed_hedged_async
+from .metrics import UPSTREAM_SECONDS, UPSTREAM_ERRORS, UPSTREAM_RETRIES, SCORED_PLACES
+from .models import AIAnalysis, Place
 
 class GeminiAI:
-    def __init__(self, api_key: str):
+    MODEL_NAME = 'gemini-2.5-flash'
+    # Bump when the score_* prompts change so cached scores are not reused
+    SCORING_PROMPT_VERSION = 'v1'
+    SCORING_GUIDELINES = """Scoring guidelines:
+- 1-3: Poor match (doesn't meet key criteria)
+- 4-6: Moderate match (meets some criteria)
+- 7-8: Good match (meets most criteria well)
+- 9-10: Excellent match (perfectly matches all criteria)"""
+    # Batch prompts are split so each stays under this many (estimated) input tokens
+    BATCH_TOKEN_BUDGET = 6000
+    BATCH_MAX_ITEMS = 20
+    # Errors that mean Gemini is overloaded; they shrink the concurrency limit
+    OVERLOAD_ERRORS = (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.TooManyRequests,
+        google_exceptions.ServiceUnavailable
+    )
+    BATCH_LABELS = {'hotel': 'HOTELS', 'restaurant': 'RESTAURANTS', 'activity': 'ACTIVITIES'}
+    
+    def __init__(self, api_key: str, score_cache: Optional[TTLCache] = None,
+                 batch_scoring: bool = True, limiter: Optional[AIMDLimiter] = None,
+                 scoring_executor: Optional[FairExecutor] = None,
+                 hedge_percentile: Optional[float] = 0.95, min_hedge_delay: float = 2.0):
         if not api_key:
             raise ValueError("Gemini API key is required")
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        self.model = genai.GenerativeModel(self.MODEL_NAME)
+        # Pagination, back-button and excludedHotels reruns re-score the same places
+        self.score_cache = score_cache if score_cache is not None else TTLCache(
+            max_entries=10000, ttl=6 * 3600
+        )
+        # Score all candidates of a request in one prompt (per chunk) instead of one call each
+        self.batch_scoring = batch_scoring
+        # Every Gemini call takes a slot from one adaptive, process-wide limit
+        self.limiter = limiter if limiter is not None else AIMDLimiter()
+        # Scoring work from all requests shares one pool, served round-robin per request
+        self.scoring_executor = scoring_executor if scoring_executor is not None else FairExecutor(
+            max_workers=self.limiter.max_limit, thread_name_prefix='gemini-scoring'
+        )
+        # Scoring calls slower than this percentile of recent ones (and at least
+        # min_hedge_delay seconds) are duplicated; None disables hedging
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay = min_hedge_delay
+        self.latencies = {'score': LatencyTracker(), 'score_batch': LatencyTracker()}
+    
+    def _generate(self, operation: str, prompt: str, **kwargs: Any) -> Any:
+        """Call Gemini within the concurrency limit, reporting latency and overload to it.
         
-    def generate_hotel_search_query(self, city: str, check_in: str, check_out: str,
-                                   price_range: str, location_prefs: str, trip_description: str) -> str:
-        """Generate an optimized search query for hotel search."""
-        prompt = f"""Generate a concise, optimal search query string for finding hotels in {city} with these criteria:
+        operation ('query', 'score' or 'score_batch') labels the call in metrics.
+        """
+        self.limiter.acquire()
+        started = time.monotonic()
+        overloaded = False
+        try:
+            response = self.model.generate_content(prompt, **kwargs)
+            self._record_latency(operation, time.monotonic() - started)
+            return response
+        except self.OVERLOAD_ERRORS as e:
+            overloaded = True
+            self._record_error(operation, e)
+            raise
+        except Exception as e:
+            self._record_error(operation, e)
+            raise
+        finally:
+            latency = time.monotonic() - started
+            self.limiter.release(latency, overloaded)
+            UPSTREAM_SECONDS.observe(latency, api='gemini', operation=operation)
+    
+    async def _generate_async(self, operation: str, prompt: str, **kwargs: Any) -> Any:
+        await self.limiter.acquire_async()
+        started = time.monotonic()
+        overloaded = False
+        try:
+            response = await self.model.generate_content_async(prompt, **kwargs)
+            self._record_latency(operation, time.monotonic() - started)
+            return response
+        except self.OVERLOAD_ERRORS as e:
+            overloaded = True
+            self._record_error(operation, e)
+            raise
+        except Exception as e:
+            self._record_error(operation, e)
+            raise
+        finally:
+            latency = time.monotonic() - started
+            self.limiter.release(latency, overloaded)
+            UPSTREAM_SECONDS.observe(latency, api='gemini', operation=operation)
+    
+    def _record_latency(self, operation: str, latency: float) -> None:
+        tracker = self.latencies.get(operation)
+        if tracker is not None:
+            tracker.record(latency)
+    
+    def _hedge_after(self, operation: str) -> Optional[float]:
+        """Seconds after which a scoring call is hedged, or None while hedging is off or not warmed up."""
+        if self.hedge_percentile is None:
+            return None
+        threshold = self.latencies[operation].percentile(self.hedge_percentile)
+        return None if threshold is None else max(threshold, self.min_hedge_delay)
+    
+    def _should_hedge(self, key: Any) -> bool:
+        """Only hedge while the concurrency limit has a free slot, so duplicates never wait behind first attempts."""
+        stats = self.limiter.stats()
+        if stats['inFlight'] >= stats['limit']:
+            return False
+        UPSTREAM_RETRIES.inc(api='gemini', reason='hedge')
+        return True
+    
+    @staticmethod
+    def _expired(deadline: Optional[float]) -> bool:
+        return deadline is not None and time.monotonic() >= deadline
+    
+    def _record_error(self, operation: str, error: Exception) -> None:
+        """Count a failed Gemini call by HTTP status code where the SDK provides one."""
+        code = getattr(error, 'code', None)
+        status = str(int(code)) if isinstance(code, int) else type(error).__name__
+        UPSTREAM_ERRORS.inc(api='gemini', operation=operation, status=status)
+    
+    def _normalize_criterion(self, value: Any) -> Any:
+        if isinstance(value, str):
+            return normalize_key(value)
+        if isinstance(value, (list, tuple)):
+            return sorted(self._normalize_criterion(v) for v in value)
+        return value
+    
+    def _score_cache_key(self, category: str, place: Place, *criteria: Any) -> Optional[str]:
+        """Build a score cache key from place, category, search criteria and model/prompt version."""
+        place_id = place.place_id
+        if not place_id:
+            return None
+        normalized = json.dumps([self._normalize_criterion(c) for c in criteria], separators=(',', ':'))
+        criteria_hash = hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+        return f"{category}:{place_id}:{criteria_hash}:{self.MODEL_NAME}:{self.SCORING_PROMPT_VERSION}"
+    
+    def _get_cached_analysis(self, cache_key: Optional[str]) -> Optional[AIAnalysis]:
+        if cache_key is None:
+            return None
+        cached = self.score_cache.get(cache_key)
+        return AIAnalysis.from_json(cached) if cached is not None else None
+    
+    def _cache_analysis(self, cache_key: Optional[str], analysis: AIAnalysis) -> None:
+        # Stored in API JSON form so the SQLite tier can serialize it
+        if cache_key is not None:
+            self.score_cache.set(cache_key, analysis.to_json())
+    
+    def _hotel_criteria(self, city: str, check_in: str, check_out: str, price_range: str,
+                        location_prefs: str, trip_description: str) -> str:
+        return f"""- City: {city}
 - Check-in: {check_in}, Check-out: {check_out}
 - Price range: {price_range}
 - Location preferences: {location_prefs if location_prefs else 'none'}
-- Trip description: {trip_description if trip_description else 'none'}
+- Trip description: {trip_description if trip_description else 'none'}"""
+    
+    def _hotel_information(self, hotel: Place) -> str:
+        return f"""Name: {hotel.name or 'Unknown'}
+Address: {hotel.address or 'Unknown'}
+Rating: {hotel.rating}
+Total Reviews: {hotel.total_reviews}
+Review Snippets: {', '.join(hotel.review_snippets[:2])}"""
+    
+    def _restaurant_criteria(self, address: str, price_range: str, eating_preferences: str,
+                             food_restrictions: List[str]) -> str:
+        restrictions_text = ', '.join(food_restrictions) if food_restrictions else 'none'
+        return f"""- Reference address: {address}
+- Price range: {price_range if price_range else 'any'}
+- Eating preferences: {eating_preferences if eating_preferences else 'none'}
+- Food restrictions: {restrictions_text}"""
+    
+    def _restaurant_information(self, restaurant: Place) -> str:
+        return f"""Name: {restaurant.name or 'Unknown'}
+Address: {restaurant.address or 'Unknown'}
+Price Level: {restaurant.price_level_text}
+Rating: {restaurant.rating}
+Total Reviews: {restaurant.total_reviews}
+Distance: {restaurant.distance_text}
+Review Snippets: {', '.join(restaurant.review_snippets[:2])}"""
+    
+    def _activity_criteria(self, address: str, price_range: str, max_distance: str,
+                           search_prompt: str) -> str:
+        return f"""- Reference address: {address}
+- Price range: {price_range if price_range else 'any'}
+- Max distance: {max_distance if max_distance else 'no limit'}
+- Search description: {search_prompt}"""
+    
+    def _activity_information(self, activity: Place) -> str:
+        return f"""Name: {activity.name or 'Unknown'}
+Address: {activity.address or 'Unknown'}
+Type: {activity.activity_type or 'attraction'}
+Rating: {activity.rating}
+Total Reviews: {activity.total_reviews}
+Distance: {activity.distance_text}
+Review Snippets: {', '.join(activity.review_snippets[:2])}"""
+    
+    def _estimate_tokens(self, text: str) -> int:
+        """Rough token estimate (~4 characters per token for English text)."""
+        return len(text) // 4 + 1
+    
+    def _strip_code_fence(self, text: str) -> str:
+        text = text.strip()
+        if text.startswith('```json'):
+            return text[7:-3]
+        if text.startswith('```'):
+            return text[3:-3]
+        return text
+    
+    def _build_batch_prompt(self, category: str, criteria_text: str, place_blocks: List[str]) -> str:
+        places_text = '\n\n'.join(place_blocks)
+        return f"""Analyze each {category} below and score its relevance (1-10) for this {category} search request.
 
-Return ONLY the search query string, nothing else."""
+SEARCH CRITERIA:
+{criteria_text}
+
+{self.BATCH_LABELS[category]}:
+{places_text}
+
+Return ONLY a JSON array with exactly one object per {category}, in this exact format:
+[
+  {{
+    "placeId": "<placeId exactly as given above>",
+    "relevanceScore": <number 1-10>,
+    "summary": "<brief explanation of why this {category} matches the request, max 200 characters>"
+  }}
+]
+
+{self.SCORING_GUIDELINES}"""
+    
+    def _chunk_by_token_budget(self, blocks: List[str], overhead_tokens: int) -> List[List[int]]:
+        """Group block indices so each batch prompt stays within BATCH_TOKEN_BUDGET."""
+        chunks = []
+        current = []
+        used = overhead_tokens
+        for idx, block in enumerate(blocks):
+            cost = self._estimate_tokens(block)
+            if current and (used + cost > self.BATCH_TOKEN_BUDGET or len(current) >= self.BATCH_MAX_ITEMS):
+                chunks.append(current)
+                current = []
+                used = overhead_tokens
+            current.append(idx)
+            used += cost
+        if current:
+            chunks.append(current)
+        return chunks
+    
+    def _request_batch_scores(self, category: str, criteria_text: str, blocks: List[str],
+                              expected_ids: set) -> Dict[str, AIAnalysis]:
+        """Score one chunk with a single Gemini call. Returns analyses keyed by placeId."""
+        prompt = self._build_batch_prompt(category, criteria_text, blocks)
+        try:
+            response = self._generate('score_batch', prompt, generation_config=self._scoring_config())
+            items = json.loads(self._strip_code_fence(response.text))
+        except Exception as e:
+            print(f"Error in batch {category} scoring: {e}")
+            return {}
+        return self._parse_batch_scores(category, items, expected_ids)
+    
+    async def _request_batch_scores_async(self, category: str, criteria_text: str, blocks: List[str],
+                                          expected_ids: set) -> Dict[str, AIAnalysis]:
+        prompt = self._build_batch_prompt(category, criteria_text, blocks)
+        try:
+            response = await self._generate_async('score_batch', prompt, generation_config=self._scoring_config())
+            items = json.loads(self._strip_code_fence(response.text))
+        except Exception as e:
+            print(f"Error in batch {category} scoring: {e}")
+            return {}
+        return self._parse_batch_scores(category, items, expected_ids)
+    
+    def _scoring_config(self) -> Any:
+        return genai.GenerationConfig(
+            temperature=0.3,
+            response_mime_type="application/json"
+        )
+    
+    def _parse_batch_scores(self, category: str, items: Any, expected_ids: set) -> Dict[str, AIAnalysis]:
+        """Validate a batch response, keeping one clamped analysis per expected placeId."""
+        if not isinstance(items, list):
+            print(f"Batch {category} scoring returned {type(items).__name__}, expected a list")
+            return {}
+        
+        analyses = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            place_id = item.get('placeId')
+            if place_id not in expected_ids or place_id in analyses:
+                continue
+            try:
+                score = int(item.get('relevanceScore'))
+            except (TypeError, ValueError):
+                continue
+            analyses[place_id] = AIAnalysis(max(1, min(10, score)), item.get('summary') or 'No analysis available')
+        return analyses
+    
+    def _score_in_batches(self, category: str, places: List[Place], criteria: tuple,
+                          criteria_text: str, describe: Callable[[Place], str],
+                          score_one: Callable[[Place], Place],
+                          on_scored: Optional[Callable[[Place], None]] = None,
+                          deadline: Optional[float] = None,
+                          group: Optional[Hashable] = None) -> List[Place]:
+        """Score places with one Gemini call per token-budgeted chunk.
+        
+        Cached scores are reused, and any place missing from a batch response
+        is scored individually with score_one. on_scored is called for each
+        place as soon as its score is known. Slow chunks are hedged, and
+        places still unscored at deadline (a time.monotonic() value) are
+        returned without an aiAnalysis. All calls are queued on the scoring
+        pool under group (typically one per request), which shares the pool
+        fairly between groups.
+        """
+        group = group if group is not None else object()
+        batchable, fallback = self._take_cached(category, places, criteria, on_scored)
+        
+        if batchable and not self._expired(deadline):
+            blocks, chunks = self._plan_batches(category, criteria_text, batchable, describe)
+            
+            def request_chunk(i):
+                return self._request_batch_scores(
+                    category, criteria_text,
+                    [blocks[j] for j in chunks[i]], {batchable[j].place_id for j in chunks[i]}
+                )
+            
+            results = as_completed_hedged(
+                range(len(chunks)), functools.partial(self.scoring_executor.submit, group), request_chunk,
+                self._hedge_after('score_batch'), deadline, self._should_hedge
+            )
+            for i, future in results:
+                self._apply_batch_scores(
+                    category, criteria, batchable, chunks[i], future.result(), fallback, on_scored
+                )
+        
+        if fallback and not self._expired(deadline):
+            print(f"[WARNING] {len(fallback)} {category} result(s) missing from batch scoring, scoring individually")
+            self._score_individually(category, fallback, score_one, on_scored, deadline, group)
+        
+        return places
+    
+    async def _score_in_batches_async(self, category: str, places: List[Place], criteria: tuple,
+                                      criteria_text: str, describe: Callable[[Place], str],
+                                      score_one: Callable[[Place], Place],
+                                      on_scored: Optional[Callable[[Place], None]] = None,
+                                      deadline: Optional[float] = None) -> List[Place]:
+        """Async _score_in_batches. Places missing from a batch response are
+        scored individually on a worker thread."""
+        batchable, fallback = self._take_cached(category, places, criteria, on_scored)
+        
+        if batchable and not self._expired(deadline):
+            blocks, chunks = self._plan_batches(category, criteria_text, batchable, describe)
+            
+            def request_chunk(i):
+                return self._request_batch_scores_async(
+                    category, criteria_text,
+                    [blocks[j] for j in chunks[i]], {batchable[j].place_id for j in chunks[i]}
+                )
+            
+            results = as_completed_hedged_async(
+                range(len(chunks)), request_chunk, self._hedge_after('score_batch'), deadline, self._should_hedge
+            )
+            async for i, task in results:
+                self._apply_batch_scores(category, criteria, batchable, chunks[i], task.result(), fallback, on_scored)
+        
+        if fallback and not self._expired(deadline):
+            print(f"[WARNING] {len(fallback)} {category} result(s) missing from batch scoring, scoring individually")
+            await asyncio.to_thread(self._score_individually, category, fallback, score_one, on_scored, deadline)
+        
+        return places
+    
+    def _take_cached(self, category: str, places: List[Place], criteria: tuple,
+                     on_scored: Optional[Callable[[Place], None]] = None) -> tuple:
+        """Apply cached scores. Returns (places to batch, places to score individually)."""
+        pending = []
+        for place in places:
+            cached = self._get_cached_analysis(self._score_cache_key(category, place, *criteria))
+            if cached is not None:
+                place.ai_analysis = cached
+                SCORED_PLACES.inc(category=category, source='cache')
+                if on_scored is not None:
+                    on_scored(place)
+            else:
+                pending.append(place)
+        
+        # Places without a placeId cannot be matched back to a batch response
+        batchable = [place for place in pending if place.place_id]
+        fallback = [place for place in pending if not place.place_id]
+        return batchable, fallback
+    
+    def _plan_batches(self, category: str, criteria_text: str, batchable: List[Place],
+                      describe: Callable[[Place], str]) -> tuple:
+        """Describe each place and group them into token-budgeted chunks. Returns (blocks, chunks)."""
+        blocks = [f"placeId: {place.place_id}\n{describe(place)}" for place in batchable]
+        overhead = self._estimate_tokens(self._build_batch_prompt(category, criteria_text, []))
+        return blocks, self._chunk_by_token_budget(blocks, overhead)
+    
+    def _apply_batch_scores(self, category: str, criteria: tuple, batchable: List[Place],
+                            chunk: List[int], analyses: Dict[str, AIAnalysis],
+                            fallback: List[Place],
+                            on_scored: Optional[Callable[[Place], None]] = None) -> None:
+        """Store one chunk's scores; places missing from the response go to fallback."""
+        for i in chunk:
+            place = batchable[i]
+            analysis = analyses.get(place.place_id)
+            if analysis is None:
+                fallback.append(place)
+                continue
+            place.ai_analysis = analysis
+            self._cache_analysis(self._score_cache_key(category, place, *criteria), analysis)
+            SCORED_PLACES.inc(category=category, source='batch')
+            if on_scored is not None:
+                on_scored(place)
+    
+    def _score_individually(self, category: str, places: List[Place],
+                            score_one: Callable[[Place], Place],
+                            on_scored: Optional[Callable[[Place], None]] = None,
+                            deadline: Optional[float] = None,
+                            group: Optional[Hashable] = None) -> List[Place]:
+        """Score places with one Gemini call each, in parallel on the shared scoring pool.
+        
+        Slow calls are hedged, and places that fail or are still unscored at
+        deadline are returned without an aiAnalysis. Each call scores a copy
+        of its place, so calls finishing after the deadline change nothing.
+        Calls are queued under group, as in _score_in_batches.
+        """
+        if self._expired(deadline):
+            return places
+        group = group if group is not None else object()
+        results = as_completed_hedged(
+            range(len(places)), functools.partial(self.scoring_executor.submit, group),
+            lambda i: score_one(dataclasses.replace(places[i])), self._hedge_after('score'), deadline, self._should_hedge
+        )
+        for i, future in results:
+            try:
+                scored_place = future.result()
+            except Exception as e:
+                print(f"Error in parallel {category} scoring: {e}")
+                continue
+            places[i].ai_analysis = scored_place.ai_analysis
+            if on_scored is not None:
+                on_scored(places[i])
+        
+        return places
+        
+    def generate_hotel_search_query(self, city: str, check_in: str, check_out: str,
+                                   price_range: str, location_prefs: str, trip_description: str) -> str:
+        """Generate an optimized search query for hotel search."""
+        prompt = self._hotel_query_prompt(city, check_in, check_out, price_range, location_prefs, trip_description)
         
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate('query', prompt)
             return response.text.strip()
         except Exception as e:
             print(f"Error generating hotel search query: {e}")
             return f"hotels in {city}"
     
+    async def generate_hotel_search_query_async(self, city: str, check_in: str, check_out: str,
+                                                price_range: str, location_prefs: str,
+                                                trip_description: str) -> str:
+        prompt = self._hotel_query_prompt(city, check_in, check_out, price_range, location_prefs, trip_description)
+        try:
+            response = await self._generate_async('query', prompt)
+            return response.text.strip()
+        except Exception as e:
+            print(f"Error generating hotel search query: {e}")
+            return f"hotels in {city}"
+    
+    def _hotel_query_prompt(self, city: str, check_in: str, check_out: str,
+                            price_range: str, location_prefs: str, trip_description: str) -> str:
+        return f"""Generate a concise, optimal search query string for finding hotels in {city} with these criteria:
+- Check-in: {check_in}, Check-out: {check_out}
+- Price range: {price_range}
+- Location preferences: {location_prefs if location_prefs else 'none'}
+- Trip description: {trip_description if trip_description else 'none'}
+
+Return ONLY the search query string, nothing else."""
+    
     def generate_restaurant_search_query(self, address: str, price_range: str,
                                         eating_preferences: str, food_restrictions: List[str]) -> str:
         """Generate an optimized search query for restaurant search."""
+        prompt = self._restaurant_query_prompt(address, price_range, eating_preferences, food_restrictions)
+        
+        try:
+            response = self._generate('query', prompt)
+            return response.text.strip()
+        except Exception as e:
+            print(f"Error generating restaurant search query: {e}")
+            return f"restaurants near {address}"
+    
+    async def generate_restaurant_search_query_async(self, address: str, price_range: str,
+                                                     eating_preferences: str,
+                                                     food_restrictions: List[str]) -> str:
+        prompt = self._restaurant_query_prompt(address, price_range, eating_preferences, food_restrictions)
+        try:
+            response = await self._generate_async('query', prompt)
+            return response.text.strip()
+        except Exception as e:
+            print(f"Error generating restaurant search query: {e}")
+            return f"restaurants near {address}"
+    
+    def _restaurant_query_prompt(self, address: str, price_range: str,
+                                 eating_preferences: str, food_restrictions: List[str]) -> str:
         restrictions_text = ', '.join(food_restrictions) if food_restrictions else 'none'
         
-        prompt = f"""Generate a concise, optimal search query string for finding restaurants near {address} with these criteria:
+        return f"""Generate a concise, optimal search query string for finding restaurants near {address} with these criteria:
 - Price range: {price_range if price_range else 'any'}
 - Eating preferences: {eating_preferences if eating_preferences else 'none'}
 - Food restrictions: {restrictions_text}
 
 Return ONLY the search query string, nothing else."""
-        
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            print(f"Error generating restaurant search query: {e}")
-            return f"restaurants near {address}"
     
     def generate_activity_search_query(self, address: str, price_range: str,
                                       max_distance: str, search_prompt: str) -> str:
         """Generate an optimal search query for activity search that includes various establishment types."""
-        prompt = f"""Generate a comprehensive, optimal search query string for Google Places API to find activities and attractions near {address} with these criteria:
+        prompt = self._activity_query_prompt(address, price_range, max_distance, search_prompt)
+        
+        try:
+            response = self._generate('query', prompt, generation_config=self._activity_query_config())
+            return self._clean_activity_query(response.text, address, search_prompt)
+        except Exception as e:
+            print(f"Error generating activity search query: {e}")
+            return f"{search_prompt} attractions activities near {address}"
+    
+    async def generate_activity_search_query_async(self, address: str, price_range: str,
+                                                   max_distance: str, search_prompt: str) -> str:
+        prompt = self._activity_query_prompt(address, price_range, max_distance, search_prompt)
+        try:
+            response = await self._generate_async('query', prompt, generation_config=self._activity_query_config())
+            return self._clean_activity_query(response.text, address, search_prompt)
+        except Exception as e:
+            print(f"Error generating activity search query: {e}")
+            return f"{search_prompt} attractions activities near {address}"
+    
+    def _activity_query_config(self) -> Any:
+        return genai.GenerationConfig(
+            temperature=0.7,
+            max_output_tokens=50
+        )
+    
+    def _clean_activity_query(self, text: str, address: str, search_prompt: str) -> str:
+        query = text.strip()
+        # Clean up the response if it has quotes or extra text
+        query = query.strip('"\'')
+        if not query or len(query) < 5:
+            # Fallback query
+            return f"{search_prompt} near {address}"
+        return query
+    
+    def _activity_query_prompt(self, address: str, price_range: str,
+                               max_distance: str, search_prompt: str) -> str:
+        return f"""Generate a comprehensive, optimal search query string for Google Places API to find activities and attractions near {address} with these criteria:
 - Price range: {price_range if price_range else 'any'}
 - Max distance: {max_distance if max_distance else 'no limit'}
 - User preferences: {search_prompt}
@@ -69,44 +579,27 @@ The query should be natural language and work well with Google Places text searc
 Return ONLY the search query string (2-10 words max), nothing else. Example format: "museums parks movie theatres near {address}"
         
 Query:"""
-        
-        try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.GenerationConfig(
-                    temperature=0.7,
-                    max_output_tokens=50
-                )
-            )
-            query = response.text.strip()
-            # Clean up the response if it has quotes or extra text
-            query = query.strip('"\'')
-            if not query or len(query) < 5:
-                # Fallback query
-                return f"{search_prompt} near {address}"
-            return query
-        except Exception as e:
-            print(f"Error generating activity search query: {e}")
-            return f"{search_prompt} attractions activities near {address}"
     
-    def score_hotel(self, hotel: Dict[str, Any], city: str, check_in: str, check_out: str,
-                   price_range: str, location_prefs: str, trip_description: str) -> Dict[str, Any]:
+    def score_hotel(self, hotel: Place, city: str, check_in: str, check_out: str,
+                   price_range: str, location_prefs: str, trip_description: str) -> Place:
         """Score a single hotel for relevance (1-10 scale)."""
+        cache_key = self._score_cache_key(
+            'hotel', hotel, city, check_in, check_out,
+            price_range, location_prefs, trip_description
+        )
+        cached = self._get_cached_analysis(cache_key)
+        if cached is not None:
+            hotel.ai_analysis = cached
+            SCORED_PLACES.inc(category='hotel', source='cache')
+            return hotel
+        
         prompt = f"""Analyze this hotel and score its relevance (1-10) for this hotel search request.
 
 SEARCH CRITERIA:
-- City: {city}
-- Check-in: {check_in}, Check-out: {check_out}
-- Price range: {price_range}
-- Location preferences: {location_prefs if location_prefs else 'none'}
-- Trip description: {trip_description if trip_description else 'none'}
+{self._hotel_criteria(city, check_in, check_out, price_range, location_prefs, trip_description)}
 
 HOTEL INFORMATION:
-Name: {hotel.get('name', 'Unknown')}
-Address: {hotel.get('address', 'Unknown')}
-Rating: {hotel.get('reviews', {}).get('rating', 'N/A')}
-Total Reviews: {hotel.get('reviews', {}).get('totalReviews', 0)}
-Review Snippets: {', '.join(hotel.get('reviews', {}).get('snippets', [])[:2])}
+{self._hotel_information(hotel)}
 
 Return ONLY a JSON object in this exact format:
 {{
@@ -114,14 +607,11 @@ Return ONLY a JSON object in this exact format:
   "summary": "<brief explanation of why this hotel matches the request, max 200 characters>"
 }}
 
-Scoring guidelines:
-- 1-3: Poor match (doesn't meet key criteria)
-- 4-6: Moderate match (meets some criteria)
-- 7-8: Good match (meets most criteria well)
-- 9-10: Excellent match (perfectly matches all criteria)"""
+{self.SCORING_GUIDELINES}"""
         
         try:
-            response = self.model.generate_content(
+            response = self._generate(
+                'score',
                 prompt,
                 generation_config=genai.GenerationConfig(
                     temperature=0.3,
@@ -138,61 +628,76 @@ Scoring guidelines:
             
             score_data = json.loads(result_text)
             
-            hotel['aiAnalysis'] = {
-                'relevanceScore': int(score_data.get('relevanceScore', 5)),
-                'summary': score_data.get('summary', 'No analysis available')
-            }
+            hotel.ai_analysis = AIAnalysis(
+                int(score_data.get('relevanceScore', 5)), score_data.get('summary', 'No analysis available')
+            )
+            self._cache_analysis(cache_key, hotel.ai_analysis)
+            SCORED_PLACES.inc(category='hotel', source='individual')
             
         except Exception as e:
-            print(f"Error scoring hotel {hotel.get('name')}: {e}")
-            hotel['aiAnalysis'] = {
-                'relevanceScore': 5,
-                'summary': 'Unable to analyze hotel'
-            }
+            print(f"Error scoring hotel {hotel.name}: {e}")
+            hotel.ai_analysis = AIAnalysis(5, 'Unable to analyze hotel')
+            SCORED_PLACES.inc(category='hotel', source='default')
         
         return hotel
     
-    def score_hotels_parallel(self, hotels: List[Dict[str, Any]], city: str, check_in: str,
+    def score_hotels_parallel(self, hotels: List[Place], city: str, check_in: str,
                             check_out: str, price_range: str, location_prefs: str,
-                            trip_description: str) -> List[Dict[str, Any]]:
-        """Score multiple hotels in parallel."""
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            futures = [
-                executor.submit(self.score_hotel, hotel, city, check_in, check_out,
-                              price_range, location_prefs, trip_description)
-                for hotel in hotels
-            ]
-            
-            scored_hotels = []
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    scored_hotels.append(future.result())
-                except Exception as e:
-                    print(f"Error in parallel hotel scoring: {e}")
+                            trip_description: str,
+                            on_scored: Optional[Callable[[Place], None]] = None,
+                            deadline: Optional[float] = None,
+                            group: Optional[Hashable] = None) -> List[Place]:
+        """Score multiple hotels, batching them into as few Gemini calls as possible.
         
-        return scored_hotels
+        on_scored is called with each hotel as soon as its score is known.
+        Hotels not scored by deadline (a time.monotonic() value) are
+        returned without an aiAnalysis. group is the scoring pool fairness
+        group, one per request.
+        """
+        criteria = (city, check_in, check_out, price_range, location_prefs, trip_description)
+        score_one = lambda hotel: self.score_hotel(hotel, *criteria)
+        if not self.batch_scoring:
+            return self._score_individually('hotel', hotels, score_one, on_scored, deadline, group)
+        return self._score_in_batches(
+            'hotel', hotels, criteria, self._hotel_criteria(*criteria),
+            self._hotel_information, score_one, on_scored, deadline, group
+        )
     
-    def score_restaurant(self, restaurant: Dict[str, Any], address: str, price_range: str,
-                        eating_preferences: str, food_restrictions: List[str]) -> Dict[str, Any]:
+    async def score_hotels_async(self, hotels: List[Place], city: str, check_in: str,
+                                 check_out: str, price_range: str, location_prefs: str,
+                                 trip_description: str,
+                                 on_scored: Optional[Callable[[Place], None]] = None,
+                                 deadline: Optional[float] = None) -> List[Place]:
+        """Async score_hotels_parallel."""
+        criteria = (city, check_in, check_out, price_range, location_prefs, trip_description)
+        score_one = lambda hotel: self.score_hotel(hotel, *criteria)
+        if not self.batch_scoring:
+            return await asyncio.to_thread(self._score_individually, 'hotel', hotels, score_one, on_scored, deadline)
+        return await self._score_in_batches_async(
+            'hotel', hotels, criteria, self._hotel_criteria(*criteria),
+            self._hotel_information, score_one, on_scored, deadline
+        )
+    
+    def score_restaurant(self, restaurant: Place, address: str, price_range: str,
+                        eating_preferences: str, food_restrictions: List[str]) -> Place:
         """Score a single restaurant for relevance (1-10 scale)."""
-        restrictions_text = ', '.join(food_restrictions) if food_restrictions else 'none'
+        cache_key = self._score_cache_key(
+            'restaurant', restaurant, address, price_range,
+            eating_preferences, food_restrictions
+        )
+        cached = self._get_cached_analysis(cache_key)
+        if cached is not None:
+            restaurant.ai_analysis = cached
+            SCORED_PLACES.inc(category='restaurant', source='cache')
+            return restaurant
         
         prompt = f"""Analyze this restaurant and score its relevance (1-10) for this restaurant search request.
 
 SEARCH CRITERIA:
-- Reference address: {address}
-- Price range: {price_range if price_range else 'any'}
-- Eating preferences: {eating_preferences if eating_preferences else 'none'}
-- Food restrictions: {restrictions_text}
+{self._restaurant_criteria(address, price_range, eating_preferences, food_restrictions)}
 
 RESTAURANT INFORMATION:
-Name: {restaurant.get('name', 'Unknown')}
-Address: {restaurant.get('address', 'Unknown')}
-Price Level: {restaurant.get('priceLevel', 'N/A')}
-Rating: {restaurant.get('reviews', {}).get('rating', 'N/A')}
-Total Reviews: {restaurant.get('reviews', {}).get('totalReviews', 0)}
-Distance: {restaurant.get('distance', {}).get('text', 'Unknown')}
-Review Snippets: {', '.join(restaurant.get('reviews', {}).get('snippets', [])[:2])}
+{self._restaurant_information(restaurant)}
 
 Return ONLY a JSON object in this exact format:
 {{
@@ -200,14 +705,11 @@ Return ONLY a JSON object in this exact format:
   "summary": "<brief explanation of why this restaurant matches the request, max 200 characters>"
 }}
 
-Scoring guidelines:
-- 1-3: Poor match (doesn't meet key criteria)
-- 4-6: Moderate match (meets some criteria)
-- 7-8: Good match (meets most criteria well)
-- 9-10: Excellent match (perfectly matches all criteria)"""
+{self.SCORING_GUIDELINES}"""
         
         try:
-            response = self.model.generate_content(
+            response = self._generate(
+                'score',
                 prompt,
                 generation_config=genai.GenerationConfig(
                     temperature=0.3,
@@ -223,59 +725,76 @@ Scoring guidelines:
             
             score_data = json.loads(result_text)
             
-            restaurant['aiAnalysis'] = {
-                'relevanceScore': int(score_data.get('relevanceScore', 5)),
-                'summary': score_data.get('summary', 'No analysis available')
-            }
+            restaurant.ai_analysis = AIAnalysis(
+                int(score_data.get('relevanceScore', 5)), score_data.get('summary', 'No analysis available')
+            )
+            self._cache_analysis(cache_key, restaurant.ai_analysis)
+            SCORED_PLACES.inc(category='restaurant', source='individual')
             
         except Exception as e:
-            print(f"Error scoring restaurant {restaurant.get('name')}: {e}")
-            restaurant['aiAnalysis'] = {
-                'relevanceScore': 5,
-                'summary': 'Unable to analyze restaurant'
-            }
+            print(f"Error scoring restaurant {restaurant.name}: {e}")
+            restaurant.ai_analysis = AIAnalysis(5, 'Unable to analyze restaurant')
+            SCORED_PLACES.inc(category='restaurant', source='default')
         
         return restaurant
     
-    def score_restaurants_parallel(self, restaurants: List[Dict[str, Any]], address: str,
+    def score_restaurants_parallel(self, restaurants: List[Place], address: str,
                                   price_range: str, eating_preferences: str,
-                                  food_restrictions: List[str]) -> List[Dict[str, Any]]:
-        """Score multiple restaurants in parallel."""
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            futures = [
-                executor.submit(self.score_restaurant, restaurant, address, price_range,
-                              eating_preferences, food_restrictions)
-                for restaurant in restaurants
-            ]
-            
-            scored_restaurants = []
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    scored_restaurants.append(future.result())
-                except Exception as e:
-                    print(f"Error in parallel restaurant scoring: {e}")
+                                  food_restrictions: List[str],
+                                  on_scored: Optional[Callable[[Place], None]] = None,
+                                  deadline: Optional[float] = None,
+                                  group: Optional[Hashable] = None) -> List[Place]:
+        """Score multiple restaurants, batching them into as few Gemini calls as possible.
         
-        return scored_restaurants
+        on_scored is called with each restaurant as soon as its score is known.
+        Restaurants not scored by deadline (a time.monotonic() value) are
+        returned without an aiAnalysis. group is the scoring pool fairness
+        group, one per request.
+        """
+        criteria = (address, price_range, eating_preferences, food_restrictions)
+        score_one = lambda restaurant: self.score_restaurant(restaurant, *criteria)
+        if not self.batch_scoring:
+            return self._score_individually('restaurant', restaurants, score_one, on_scored, deadline, group)
+        return self._score_in_batches(
+            'restaurant', restaurants, criteria, self._restaurant_criteria(*criteria),
+            self._restaurant_information, score_one, on_scored, deadline, group
+        )
     
-    def score_activity(self, activity: Dict[str, Any], address: str, price_range: str,
-                      max_distance: str, search_prompt: str) -> Dict[str, Any]:
+    async def score_restaurants_async(self, restaurants: List[Place], address: str,
+                                      price_range: str, eating_preferences: str,
+                                      food_restrictions: List[str],
+                                      on_scored: Optional[Callable[[Place], None]] = None,
+                                      deadline: Optional[float] = None) -> List[Place]:
+        """Async score_restaurants_parallel."""
+        criteria = (address, price_range, eating_preferences, food_restrictions)
+        score_one = lambda restaurant: self.score_restaurant(restaurant, *criteria)
+        if not self.batch_scoring:
+            return await asyncio.to_thread(self._score_individually, 'restaurant', restaurants, score_one, on_scored, deadline)
+        return await self._score_in_batches_async(
+            'restaurant', restaurants, criteria, self._restaurant_criteria(*criteria),
+            self._restaurant_information, score_one, on_scored, deadline
+        )
+    
+    def score_activity(self, activity: Place, address: str, price_range: str,
+                      max_distance: str, search_prompt: str) -> Place:
         """Score a single activity for relevance (1-10 scale)."""
+        cache_key = self._score_cache_key(
+            'activity', activity, address, price_range,
+            max_distance, search_prompt
+        )
+        cached = self._get_cached_analysis(cache_key)
+        if cached is not None:
+            activity.ai_analysis = cached
+            SCORED_PLACES.inc(category='activity', source='cache')
+            return activity
+        
         prompt = f"""Analyze this activity/attraction and score its relevance (1-10) for this activity search request.
 
 SEARCH CRITERIA:
-- Reference address: {address}
-- Price range: {price_range if price_range else 'any'}
-- Max distance: {max_distance if max_distance else 'no limit'}
-- Search description: {search_prompt}
+{self._activity_criteria(address, price_range, max_distance, search_prompt)}
 
 ACTIVITY INFORMATION:
-Name: {activity.get('name', 'Unknown')}
-Address: {activity.get('address', 'Unknown')}
-Type: {activity.get('activityType', 'attraction')}
-Rating: {activity.get('reviews', {}).get('rating', 'N/A')}
-Total Reviews: {activity.get('reviews', {}).get('totalReviews', 0)}
-Distance: {activity.get('distance', {}).get('text', 'Unknown')}
-Review Snippets: {', '.join(activity.get('reviews', {}).get('snippets', [])[:2])}
+{self._activity_information(activity)}
 
 Return ONLY a JSON object in this exact format:
 {{
@@ -283,14 +802,11 @@ Return ONLY a JSON object in this exact format:
   "summary": "<brief explanation of why this activity matches the request, max 200 characters>"
 }}
 
-Scoring guidelines:
-- 1-3: Poor match (doesn't meet key criteria)
-- 4-6: Moderate match (meets some criteria)
-- 7-8: Good match (meets most criteria well)
-- 9-10: Excellent match (perfectly matches all criteria)"""
+{self.SCORING_GUIDELINES}"""
         
         try:
-            response = self.model.generate_content(
+            response = self._generate(
+                'score',
                 prompt,
                 generation_config=genai.GenerationConfig(
                     temperature=0.3,
@@ -306,37 +822,52 @@ Scoring guidelines:
             
             score_data = json.loads(result_text)
             
-            activity['aiAnalysis'] = {
-                'relevanceScore': int(score_data.get('relevanceScore', 5)),
-                'summary': score_data.get('summary', 'No analysis available')
-            }
+            activity.ai_analysis = AIAnalysis(
+                int(score_data.get('relevanceScore', 5)), score_data.get('summary', 'No analysis available')
+            )
+            self._cache_analysis(cache_key, activity.ai_analysis)
+            SCORED_PLACES.inc(category='activity', source='individual')
             
         except Exception as e:
-            print(f"Error scoring activity {activity.get('name')}: {e}")
-            activity['aiAnalysis'] = {
-                'relevanceScore': 5,
-                'summary': 'Unable to analyze activity'
-            }
+            print(f"Error scoring activity {activity.name}: {e}")
+            activity.ai_analysis = AIAnalysis(5, 'Unable to analyze activity')
+            SCORED_PLACES.inc(category='activity', source='default')
         
         return activity
     
-    def score_activities_parallel(self, activities: List[Dict[str, Any]], address: str,
+    def score_activities_parallel(self, activities: List[Place], address: str,
                                  price_range: str, max_distance: str,
-                                 search_prompt: str) -> List[Dict[str, Any]]:
-        """Score multiple activities in parallel."""
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            futures = [
-                executor.submit(self.score_activity, activity, address, price_range,
-                              max_distance, search_prompt)
-                for activity in activities
-            ]
-            
-            scored_activities = []
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    scored_activities.append(future.result())
-                except Exception as e:
-                    print(f"Error in parallel activity scoring: {e}")
+                                 search_prompt: str,
+                                 on_scored: Optional[Callable[[Place], None]] = None,
+                                 deadline: Optional[float] = None,
+                                 group: Optional[Hashable] = None) -> List[Place]:
+        """Score multiple activities, batching them into as few Gemini calls as possible.
         
-        return scored_activities
-
+        on_scored is called with each activity as soon as its score is known.
+        Activities not scored by deadline (a time.monotonic() value) are
+        returned without an aiAnalysis. group is the scoring pool fairness
+        group, one per request.
+        """
+        criteria = (address, price_range, max_distance, search_prompt)
+        score_one = lambda activity: self.score_activity(activity, *criteria)
+        if not self.batch_scoring:
+            return self._score_individually('activity', activities, score_one, on_scored, deadline, group)
+        return self._score_in_batches(
+            'activity', activities, criteria, self._activity_criteria(*criteria),
+            self._activity_information, score_one, on_scored, deadline, group
+        )
+    
+    async def score_activities_async(self, activities: List[Place], address: str,
+                                     price_range: str, max_distance: str,
+                                     search_prompt: str,
+                                     on_scored: Optional[Callable[[Place], None]] = None,
+                                     deadline: Optional[float] = None) -> List[Place]:
+        """Async score_activities_parallel."""
+        criteria = (address, price_range, max_distance, search_prompt)
+        score_one = lambda activity: self.score_activity(activity, *criteria)
+        if not self.batch_scoring:
+            return await asyncio.to_thread(self._score_individually, 'activity', activities, score_one, on_scored, deadline)
+        return await self._score_in_batches_async(
+            'activity', activities, criteria, self._activity_criteria(*criteria),
+            self._activity_information, score_one, on_scored, deadline
+        )
@@ -0,0 +1,65 @@
+from typing import Any, Dict, Optional, Sequence, Union
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000
+
+# A point is a {'lat': ..., 'lng': ...} dict (as in Places results) or a (lat, lng) pair
+Point = Union[Dict[str, float], Sequence[float]]
+
+def location_of(place: Dict[str, Any]) -> Optional[Dict[str, float]]:
+    """The {'lat', 'lng'} of a Places search result (or a dict with a 'location'), or None."""
+    location = place.get('location') or (place.get('geometry') or {}).get('location') or {}
+    if location.get('lat') is None or location.get('lng') is None:
+        return None
+    return location
+
+def to_radians(points: Sequence[Point]) -> np.ndarray:
+    """(N, 2) array of [lat, lng] in radians. Points without coordinates become NaN."""
+    coords = np.full((len(points), 2), np.nan)
+    for i, point in enumerate(points):
+        if point is None:
+            continue
+        if isinstance(point, dict):
+            lat, lng = point.get('lat'), point.get('lng')
+        else:
+            lat, lng = point
+        if lat is not None and lng is not None:
+            coords[i] = (lat, lng)
+    return np.radians(coords)
+
+def _haversine(lat1: np.ndarray, lng1: np.ndarray, lat2: np.ndarray, lng2: np.ndarray) -> np.ndarray:
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def distances_from(origin: Point, points: Sequence[Point]) -> np.ndarray:
+    """Distances in meters from origin to each point, in one pass. NaN where a point has no coordinates."""
+    if not len(points):
+        return np.empty(0)
+    (origin_lat, origin_lng), = to_radians([origin])
+    coords = to_radians(points)
+    return _haversine(origin_lat, origin_lng, coords[:, 0], coords[:, 1])
+
+def distance_matrix(points: Sequence[Point], others: Optional[Sequence[Point]] = None) -> np.ndarray:
+    """(N, M) matrix of distances in meters between points and others (points itself by default)."""
+    coords = to_radians(points)
+    other_coords = coords if others is None else to_radians(others)
+    return _haversine(
+        coords[:, 0, None], coords[:, 1, None],
+        other_coords[None, :, 0], other_coords[None, :, 1]
+    )
+
+def bearings_from(origin: Point, points: Sequence[Point]) -> np.ndarray:
+    """Initial compass bearing in degrees [0, 360) from origin to each point. NaN where a point has no coordinates."""
+    if not len(points):
+        return np.empty(0)
+    (origin_lat, origin_lng), = to_radians([origin])
+    coords = to_radians(points)
+    dlng = coords[:, 1] - origin_lng
+    y = np.sin(dlng) * np.cos(coords[:, 0])
+    x = np.cos(origin_lat) * np.sin(coords[:, 0]) - np.sin(origin_lat) * np.cos(coords[:, 0]) * np.cos(dlng)
+    return np.degrees(np.arctan2(y, x)) % 360
+
+def compass_point(bearing: float) -> str:
+    """'N', 'NE', ... for a bearing in degrees."""
+    return ('N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW')[int((bearing % 360) / 45 + 0.5) % 8]
@@ -0,0 +1,158 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import uuid
+from typing import Any, Optional, Tuple
+
+ROOT_LOGGER = 'navigatio'
+
+_request_id: contextvars.ContextVar = contextvars.ContextVar('request_id', default=None)
+_request_debug: contextvars.ContextVar = contextvars.ContextVar('request_debug', default=False)
+_listener: Optional[logging.handlers.QueueListener] = None
+
+class LazyJSON:
+    """Log argument serialized with json.dumps only if the record is emitted."""
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __str__(self) -> str:
+        return json.dumps(self.value, default=str)
+
+def _json_default(value: Any) -> Any:
+    return value.value if isinstance(value, LazyJSON) else str(value)
+
+class StructuredLogger(logging.LoggerAdapter):
+    """Logger taking event fields as keyword arguments.
+
+        log.debug("Fetched details for %s", name, place_id=place_id, status=status)
+
+    Messages use %-style arguments and are only formatted when the record is
+    emitted. DEBUG records are also emitted, whatever the configured level,
+    inside a request with debug logging enabled (see start_request). Pass
+    sample=<fraction> to keep only that share of a hot-path event.
+    """
+
+    def __init__(self, logger: logging.Logger):
+        super().__init__(logger, {})
+
+    def isEnabledFor(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level) or (_request_debug.get() and not self.logger.disabled)
+
+    def log(self, level: int, msg: str, *args: Any, exc_info: Any = None,
+            sample: Optional[float] = None, **fields: Any) -> None:
+        if not self.isEnabledFor(level):
+            return
+        if sample is not None and not _request_debug.get() and random.random() >= sample:
+            return
+        if exc_info is True:
+            exc_info = sys.exc_info()
+        record = self.logger.makeRecord(
+            self.logger.name, level, '(unknown file)', 0, msg, args, exc_info,
+            extra={'fields': fields, 'request_id': _request_id.get()}
+        )
+        # handle() skips the logger's level check, which isEnabledFor already did
+        self.logger.handle(record)
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Merge the message in the calling thread, since arguments may be mutated
+    after the call, but leave event fields and tracebacks to the formatter."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Formatted here so queued records do not keep stack frames alive
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def _exception_text(formatter: logging.Formatter, record: logging.LogRecord) -> Optional[str]:
+    if record.exc_info:
+        return formatter.formatException(record.exc_info)
+    return record.exc_text
+
+class TextFormatter(logging.Formatter):
+    """'[LEVEL] message key=value ...', the format of the former print output."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"[{record.levelname}] {record.getMessage()}"
+        fields = dict(getattr(record, 'fields', None) or {})
+        if getattr(record, 'request_id', None):
+            fields['request_id'] = record.request_id
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        exc_text = _exception_text(self, record)
+        if exc_text:
+            line += '\n' + exc_text
+        return line
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, with event fields as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        if getattr(record, 'request_id', None):
+            entry['requestId'] = record.request_id
+        entry.update(getattr(record, 'fields', None) or {})
+        exc_text = _exception_text(self, record)
+        if exc_text:
+            entry['exc'] = exc_text
+        return json.dumps(entry, default=_json_default)
+
+def get_logger(name: str) -> StructuredLogger:
+    """Structured logger under the application's root logger."""
+    if not name.startswith(ROOT_LOGGER):
+        name = f"{ROOT_LOGGER}.{name}"
+    return StructuredLogger(logging.getLogger(name))
+
+def configure_logging(level: str = 'INFO', fmt: str = 'text', stream: Any = None) -> None:
+    """Send application logs through a queue to a background writer thread.
+
+    Request threads only merge the message and enqueue the record; event
+    fields are formatted and written on the listener thread. Safe to call
+    more than once.
+    """
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    root.propagate = False
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JSONFormatter() if fmt == 'json' else TextFormatter())
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    root.addHandler(_QueueHandler(records))
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+def start_request(request_id: Optional[str] = None, debug: bool = False) -> Tuple[contextvars.Token, contextvars.Token]:
+    """Tag logs in the current context with a request id, optionally at DEBUG.
+
+    Returns tokens for end_request. Work submitted to the app's thread pools
+    runs in a copy of the submitting context, so it inherits both settings.
+    """
+    return _request_id.set(request_id or uuid.uuid4().hex[:12]), _request_debug.set(debug)
+
+def end_request(tokens: Tuple[contextvars.Token, contextvars.Token]) -> None:
+    request_id_token, debug_token = tokens
+    _request_id.reset(request_id_token)
+    _request_debug.reset(debug_token)
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
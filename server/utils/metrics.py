@@ -0,0 +1,203 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from .log import get_logger
+
+log = get_logger(__name__)
+
+# Upper bounds (seconds) suited to upstream calls from a few ms to tens of seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """Monotonically increasing count, per label combination."""
+    type_name = 'counter'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+class Histogram(_Metric):
+    """Cumulative histogram of observed values (seconds, by convention)."""
+    type_name = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label key: [count per bucket (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[idx] += 1
+            self._values[key] = [counts, total + value]
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe the duration of the with-block, including when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        lines = self._header()
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(round(total, 6))}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class CallbackMetric(_Metric):
+    """Counter or gauge whose samples are read from a callback at scrape time.
+
+    Used to export counters that components already keep (cache stats).
+    The callback returns (label values, value) pairs.
+    """
+
+    def __init__(self, name: str, help_text: str, type_name: str, labelnames: Sequence[str],
+                 callback: Callable[[], Iterable[Tuple[Sequence[Any], float]]]):
+        super().__init__(name, help_text, labelnames)
+        self.type_name = type_name
+        self._callback = callback
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for label_values, value in self._callback():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, label_values)} {_format_value(value)}")
+        return lines
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def callback(self, name: str, help_text: str, type_name: str, labelnames: Sequence[str],
+                 callback: Callable[[], Iterable[Tuple[Sequence[Any], float]]]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help_text, type_name, labelnames, callback))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                log.warning("Failed to collect metric", metric=metric.name, exc_info=True)
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'navigatio_search_stage_duration_seconds',
+    'Duration of each search pipeline stage (rank covers sorting and formatting).',
+    ['search', 'stage']
+)
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    'navigatio_upstream_request_duration_seconds',
+    'Duration of upstream API calls, per Places request (one search page, one place) or Gemini call.',
+    ['api', 'operation']
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    'navigatio_upstream_errors_total',
+    'Failed upstream calls by HTTP status, API status or exception type.',
+    ['api', 'operation', 'status']
+)
+UPSTREAM_RETRIES = REGISTRY.counter(
+    'navigatio_upstream_retries_total',
+    'Upstream calls retried, by reason.',
+    ['api', 'reason']
+)
+SCORED_PLACES = REGISTRY.counter(
+    'navigatio_scored_places_total',
+    'Places given a relevance score, by how the score was obtained.',
+    ['category', 'source']
+)
+
+def register_caches(caches: Dict[str, Callable[[], Dict[str, Any]]], registry: MetricsRegistry = REGISTRY) -> None:
+    """Export TTLCache.stats()-shaped counters for named caches."""
+    def samples(field: str) -> Callable[[], List[Tuple[Sequence[Any], float]]]:
+        return lambda: [((name,), stats().get(field, 0)) for name, stats in caches.items()]
+
+    registry.callback('navigatio_cache_hits_total', 'Cache hits.', 'counter', ['cache'], samples('hits'))
+    registry.callback('navigatio_cache_misses_total', 'Cache misses.', 'counter', ['cache'], samples('misses'))
+    registry.callback('navigatio_cache_evictions_total', 'Cache evictions.', 'counter', ['cache'], samples('evictions'))
+    registry.callback('navigatio_cache_entries', 'Entries held in memory.', 'gauge', ['cache'], samples('entries'))
+    registry.callback('navigatio_cache_bytes', 'Approximate bytes held in memory.', 'gauge', ['cache'], samples('bytes'))
@@ -0,0 +1,112 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+PRICE_LEVEL_TEXT = {0: '', 1: '$', 2: '$$', 3: '$$$', 4: '$$$$'}
+
+@dataclass(slots=True)
+class AIAnalysis:
+    """Relevance of a place to a search, from Gemini or the pre-rank heuristic."""
+    relevance_score: int
+    summary: str
+    heuristic: bool = False
+
+    def to_json(self) -> Dict[str, Any]:
+        data = {'relevanceScore': self.relevance_score, 'summary': self.summary}
+        if self.heuristic:
+            data['heuristic'] = True
+        return data
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> 'AIAnalysis':
+        return cls(int(data['relevanceScore']), data['summary'], bool(data.get('heuristic', False)))
+
+@dataclass(slots=True)
+class Place:
+    """A hotel, restaurant or activity on its way from Places search to the response.
+
+    Created from a search result, completed from place details, then scored.
+    Converted to the API JSON shape of its kind only by to_json().
+    """
+    kind: str  # 'hotel', 'restaurant' or 'activity'
+    place_id: str
+    name: str
+    address: str = ''
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    rating: float = 0
+    total_reviews: int = 0
+    price_level: Optional[int] = None
+    types: Tuple[str, ...] = ()
+    # Distance from the search origin; restaurants and activities only
+    distance_m: Optional[float] = None
+    images: List[str] = field(default_factory=list)
+    review_snippets: List[str] = field(default_factory=list)
+    price_info: str = ''
+    activity_type: str = ''
+    ai_analysis: Optional[AIAnalysis] = None
+
+    @classmethod
+    def from_search_result(cls, kind: str, result: Dict[str, Any], address_field: str = 'vicinity',
+                           distance_m: Optional[float] = None) -> 'Place':
+        """Candidate from a nearbysearch/textsearch result."""
+        location = (result.get('geometry') or {}).get('location') or {}
+        address = result.get(address_field) or result.get('formatted_address', '')
+        return cls(
+            kind=kind,
+            place_id=result.get('place_id') or '',
+            name=result.get('name') or '',
+            address=address,
+            lat=location.get('lat'),
+            lng=location.get('lng'),
+            rating=result.get('rating', 0),
+            total_reviews=result.get('user_ratings_total', 0),
+            price_level=result.get('price_level'),
+            types=tuple(result.get('types', ())),
+            distance_m=distance_m
+        )
+
+    @property
+    def location(self) -> Optional[Dict[str, float]]:
+        if self.lat is None or self.lng is None:
+            return None
+        return {'lat': self.lat, 'lng': self.lng}
+
+    @property
+    def price_level_text(self) -> str:
+        return PRICE_LEVEL_TEXT.get(self.price_level, '')
+
+    @property
+    def distance_text(self) -> str:
+        if self.distance_m is None:
+            return 'Unknown'
+        if self.distance_m < 1000:
+            return f"{int(self.distance_m)} meters"
+        return f"{self.distance_m/1000:.1f} km"
+
+    def _reviews_json(self) -> Dict[str, Any]:
+        return {'rating': self.rating, 'totalReviews': self.total_reviews, 'snippets': self.review_snippets}
+
+    def _distance_json(self) -> Dict[str, Any]:
+        return {'meters': int(self.distance_m or 0), 'text': self.distance_text}
+
+    def to_json(self) -> Dict[str, Any]:
+        """The result object of this place's search endpoint."""
+        data = {'name': self.name, 'images': self.images}
+        if self.kind == 'hotel':
+            # Real pricing would require booking API access
+            data['roomPrices'] = {'available': False, 'pricePerNight': None, 'totalPrice': None, 'currency': 'USD'}
+        elif self.kind == 'restaurant':
+            data['priceLevel'] = self.price_level_text
+        else:
+            data['priceInfo'] = self.price_info
+        data.update({
+            'address': self.address,
+            'reviews': self._reviews_json(),
+            'aiAnalysis': self.ai_analysis.to_json() if self.ai_analysis is not None else None,
+            'placeId': self.place_id
+        })
+        if self.kind != 'hotel':
+            data['distance'] = self._distance_json()
+        if self.kind == 'activity':
+            data['activityType'] = self.activity_type
+        return data
@@ -0,0 +1,156 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import inspect
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from .metrics import STAGE_SECONDS
+
+# Stages that run alongside another stage share this pool across requests;
+# the rest run on the request's own thread (see Pipeline.run). Stages never
+# wait on each other inside the pool, so it cannot deadlock.
+_stage_executor = concurrent.futures.ThreadPoolExecutor(max_workers=32, thread_name_prefix='pipeline')
+
+class Pipeline:
+    """Run named stages concurrently, serializing only declared dependencies.
+
+    Each stage function is called with the results of its dependencies as
+    keyword arguments, so `add('search', lambda coords: ..., ['coords'])`
+    runs once the 'coords' stage has finished. Per-stage timings are recorded
+    in `timings` as milliseconds since the pipeline started, and, when the
+    pipeline is given a `name`, in the stage-duration histogram under it.
+    """
+
+    def __init__(self, executor: Optional[concurrent.futures.Executor] = None, name: Optional[str] = None):
+        self._executor = executor or _stage_executor
+        self.name = name
+        self._stages: Dict[str, tuple] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    def add(self, name: str, func: Callable[..., Any], depends_on: Iterable[str] = ()) -> 'Pipeline':
+        if name in self._stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        self._stages[name] = (func, tuple(depends_on))
+        return self
+
+    def _check_dependencies(self) -> None:
+        for name, (_, deps) in self._stages.items():
+            unknown = [dep for dep in deps if dep not in self._stages]
+            if unknown:
+                raise ValueError(f"Stage {name} depends on unknown stage(s): {', '.join(unknown)}")
+
+    def _record(self, name: str, stage_start: float, started: float) -> None:
+        duration = time.perf_counter() - stage_start
+        self.timings[name] = {
+            'startMs': round((stage_start - started) * 1000, 1),
+            'durationMs': round(duration * 1000, 1)
+        }
+        if self.name:
+            STAGE_SECONDS.observe(duration, search=self.name, stage=name)
+
+    def _run_stage(self, name: str, func: Callable[..., Any], kwargs: Dict[str, Any], started: float) -> Any:
+        stage_start = time.perf_counter()
+        try:
+            return func(**kwargs)
+        finally:
+            self._record(name, stage_start, started)
+
+    def run(self) -> Dict[str, Any]:
+        """Run all stages and return their results keyed by stage name.
+
+        Of the stages ready at once, all but the last are submitted to the
+        executor and the last runs on the calling thread, so a linear chain of
+        stages (most of a search) never waits for a pool worker. The first
+        stage exception is re-raised; stages already running are left to
+        finish in the background.
+        """
+        self._check_dependencies()
+        started = time.perf_counter()
+        pending = dict(self._stages)
+        running: Dict[concurrent.futures.Future, str] = {}
+        results: Dict[str, Any] = {}
+
+        while pending or running:
+            ready = [name for name, (_, deps) in pending.items() if all(dep in results for dep in deps)]
+            if not ready and not running:
+                raise ValueError(f"Dependency cycle between stages: {', '.join(pending)}")
+            for name in ready[:-1]:
+                func, deps = pending.pop(name)
+                kwargs = {dep: results[dep] for dep in deps}
+                # Stages run in a copy of the caller's context (request id, log level)
+                future = self._executor.submit(
+                    contextvars.copy_context().run, self._run_stage, name, func, kwargs, started
+                )
+                running[future] = name
+            if ready:
+                name = ready[-1]
+                func, deps = pending.pop(name)
+                results[name] = self._run_stage(name, func, {dep: results[dep] for dep in deps}, started)
+                # Collect stages that finished meanwhile before looking for newly ready ones
+                for future in [future for future in running if future.done()]:
+                    results[running.pop(future)] = future.result()
+                continue
+
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+        self._record('total', started, started)
+        return results
+
+    def server_timing(self) -> str:
+        """Format stage timings as a Server-Timing header value."""
+        return ', '.join(f"{name};dur={timing['durationMs']}" for name, timing in self.timings.items())
+
+class AsyncPipeline(Pipeline):
+    """Pipeline whose stages run as tasks on the current event loop.
+
+    Stage functions may be coroutine functions or plain functions; plain
+    functions run inline on the loop, so they must not block.
+    """
+
+    def __init__(self, name: Optional[str] = None):
+        super().__init__(executor=None, name=name)
+
+    async def _run_stage_async(self, name: str, func: Callable[..., Any], kwargs: Dict[str, Any],
+                               started: float) -> Any:
+        stage_start = time.perf_counter()
+        try:
+            result = func(**kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        finally:
+            self._record(name, stage_start, started)
+
+    async def run(self) -> Dict[str, Any]:
+        """Run all stages and return their results keyed by stage name.
+
+        The first stage exception is re-raised; stages still running are cancelled.
+        """
+        self._check_dependencies()
+        started = time.perf_counter()
+        pending = dict(self._stages)
+        running: Dict[asyncio.Task, str] = {}
+        results: Dict[str, Any] = {}
+
+        try:
+            while pending or running:
+                ready = [name for name, (_, deps) in pending.items() if all(dep in results for dep in deps)]
+                for name in ready:
+                    func, deps = pending.pop(name)
+                    kwargs = {dep: results[dep] for dep in deps}
+                    running[asyncio.ensure_future(self._run_stage_async(name, func, kwargs, started))] = name
+                if not running:
+                    raise ValueError(f"Dependency cycle between stages: {', '.join(pending)}")
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results[running.pop(task)] = task.result()
+        finally:
+            for task in running:
+                task.cancel()
+
+        self._record('total', started, started)
+        return results
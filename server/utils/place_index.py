@@ -0,0 +1,191 @@
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .geo import Point, distance_matrix, distances_from, location_of
+
+# Fields of a Places search result worth keeping to answer a search locally
+RESULT_FIELDS = (
+    'place_id', 'name', 'vicinity', 'formatted_address', 'geometry', 'rating',
+    'user_ratings_total', 'price_level', 'types', 'photos', 'business_status'
+)
+
+class PlaceIndex:
+    """In-memory spatial index of places seen in Places search responses.
+
+    Places are bucketed in a fixed lat/lng grid (cells of `cell_deg` degrees,
+    about 1.1 km north-south at the default), so a radius query only measures
+    the places in the cells overlapping the circle, in one vectorized pass.
+
+    The index also remembers which areas have been searched upstream, per
+    place type, and when. covered_nearby() only answers from the index when
+    an upstream search of the same type covering the whole query circle is
+    recent enough, so callers fall back to Google for areas never or not
+    recently searched. When places are evicted to stay under max_places, the
+    coverage of the areas they were in is dropped too, since the index no
+    longer holds everything those searches returned.
+    """
+
+    def __init__(self, cell_deg: float = 0.01, max_places: int = 50000, max_areas: int = 5000):
+        self.cell_deg = cell_deg
+        self.max_places = max_places
+        # place_id -> (result, lat, lng), least recently seen first
+        self._places: 'OrderedDict[str, Tuple[Dict[str, Any], float, float]]' = OrderedDict()
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        # Upstream searches: (place type, lat, lng, radius_m, searched_at), newest last
+        self._areas: deque = deque(maxlen=max_areas)
+        self._lock = threading.Lock()
+        self.local_answers = 0
+        self.upstream_needed = 0
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lng / self.cell_deg))
+
+    def add(self, results: Iterable[Dict[str, Any]]) -> int:
+        """Index (or refresh) Places search results. Returns how many were indexed.
+
+        A place already indexed keeps the types it was indexed with, merged
+        with the new ones, so a search of one type never hides it from
+        searches of another.
+        """
+        added = 0
+        with self._lock:
+            for result in results:
+                location = location_of(result)
+                place_id = result.get('place_id')
+                if location is None or not place_id:
+                    continue
+                stored = {field: result[field] for field in RESULT_FIELDS if field in result}
+                previous = self._discard(place_id)
+                if previous is not None:
+                    types = list(previous[0].get('types', ()))
+                    types.extend(t for t in stored.get('types', ()) if t not in types)
+                    stored['types'] = types
+                lat, lng = float(location['lat']), float(location['lng'])
+                self._places[place_id] = (stored, lat, lng)
+                self._cells.setdefault(self._cell(lat, lng), set()).add(place_id)
+                added += 1
+            evicted = []
+            while len(self._places) > self.max_places:
+                entry = self._discard(next(iter(self._places)))
+                evicted.append((entry[1], entry[2]))
+            if evicted:
+                self._uncover(evicted)
+        return added
+
+    def _uncover(self, points: List[Tuple[float, float]]) -> None:
+        """Forget the searched areas containing any of points. Caller holds the lock."""
+        if not self._areas:
+            return
+        areas = list(self._areas)
+        radii = np.array([area[3] for area in areas])
+        inside = (distance_matrix(points, [(area[1], area[2]) for area in areas]) <= radii).any(axis=0)
+        self._areas = deque((area for area, drop in zip(areas, inside) if not drop), maxlen=self._areas.maxlen)
+
+    def _discard(self, place_id: str) -> Optional[Tuple[Dict[str, Any], float, float]]:
+        entry = self._places.pop(place_id, None)
+        if entry is None:
+            return None
+        cell = self._cell(entry[1], entry[2])
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(place_id)
+            if not members:
+                del self._cells[cell]
+        return entry
+
+    def nearby(self, origin: Point, radius_m: float, place_type: Optional[str] = None,
+               min_rating: Optional[float] = None, price_levels: Optional[Set[int]] = None,
+               limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Indexed places within radius_m of origin, nearest first.
+
+        Places without a price_level are kept when filtering on price_levels.
+        Returns copies of the stored search results.
+        """
+        lat, lng = (origin['lat'], origin['lng']) if isinstance(origin, dict) else origin
+        dlat = math.degrees(radius_m / 6371000)
+        dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        lat_lo, lng_lo = self._cell(lat - dlat, lng - dlng)
+        lat_hi, lng_hi = self._cell(lat + dlat, lng + dlng)
+
+        with self._lock:
+            candidates = [
+                self._places[place_id]
+                for lat_cell in range(lat_lo, lat_hi + 1)
+                for lng_cell in range(lng_lo, lng_hi + 1)
+                for place_id in self._cells.get((lat_cell, lng_cell), ())
+            ]
+
+        if place_type is not None:
+            candidates = [entry for entry in candidates if place_type in entry[0].get('types', ())]
+        if min_rating is not None:
+            candidates = [entry for entry in candidates if (entry[0].get('rating') or 0) >= min_rating]
+        if price_levels is not None:
+            candidates = [entry for entry in candidates
+                          if entry[0].get('price_level') is None or entry[0]['price_level'] in price_levels]
+        if not candidates:
+            return []
+
+        distances = distances_from((lat, lng), [(entry[1], entry[2]) for entry in candidates])
+        inside = np.flatnonzero(distances <= radius_m)
+        order = inside[np.argsort(distances[inside], kind='stable')][:limit]
+        return [dict(candidates[i][0]) for i in order]
+
+    def mark_covered(self, place_type: str, origin: Point, radius_m: float) -> None:
+        """Record that an upstream search for place_type around origin was just made."""
+        lat, lng = (origin['lat'], origin['lng']) if isinstance(origin, dict) else origin
+        with self._lock:
+            self._areas.append((place_type, float(lat), float(lng), float(radius_m), time.time()))
+
+    def coverage_age(self, place_type: str, origin: Point, radius_m: float) -> Optional[float]:
+        """Seconds since the latest upstream search for place_type whose area
+        contains the whole query circle, or None if there was none."""
+        with self._lock:
+            areas = [area for area in self._areas if area[0] == place_type]
+        if not areas:
+            return None
+        distances = distances_from(origin, [(area[1], area[2]) for area in areas])
+        radii = np.array([area[3] for area in areas])
+        searched_at = np.array([area[4] for area in areas])
+        containing = distances + radius_m <= radii
+        if not containing.any():
+            return None
+        return max(0.0, time.time() - float(searched_at[containing].max()))
+
+    def covered_nearby(self, place_type: str, origin: Point, radius_m: float,
+                       max_age: float, min_results: int = 1) -> Optional[List[Dict[str, Any]]]:
+        """Places of place_type within radius_m of origin if the area was
+        searched upstream less than max_age seconds ago and at least
+        min_results of them are indexed, else None (search upstream)."""
+        age = self.coverage_age(place_type, origin, radius_m)
+        results = None
+        if age is not None and age <= max_age:
+            results = self.nearby(origin, radius_m, place_type=place_type)
+            if len(results) < min_results:
+                results = None
+        with self._lock:
+            if results is None:
+                self.upstream_needed += 1
+            else:
+                self.local_answers += 1
+        return results
+
+    def reject_local_answer(self) -> None:
+        """Count a covered_nearby answer the caller could not use as an upstream search."""
+        with self._lock:
+            self.local_answers -= 1
+            self.upstream_needed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'places': len(self._places),
+                'cells': len(self._cells),
+                'areas': len(self._areas),
+                'localAnswers': self.local_answers,
+                'upstreamNeeded': self.upstream_needed
+            }
@@ -0,0 +1,146 @@
+import concurrent.futures
+import hashlib
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from .cache import SQLiteCache, TTLCache
+from .log import get_logger
+
+log = get_logger(__name__)
+
+class PlaceDetailsStore:
+    """Two-tier cache of Google place details keyed by place_id and field set.
+
+    Entries are served as fresh for `fresh_ttl` seconds. Between `fresh_ttl`
+    and `max_age` they are still served, but a background refresh is scheduled
+    (stale-while-revalidate) so the next caller gets a fresh copy. The memory
+    tier is size-bounded; pass `path` to add a SQLite tier that survives
+    restarts and can be shared by the server and the batch ranker.
+    """
+
+    def __init__(self, fresh_ttl: float = 24 * 3600, max_age: float = 7 * 24 * 3600,
+                 max_entries: int = 5000, max_bytes: Optional[int] = 64 * 1024 * 1024,
+                 path: Optional[str] = None, refresh_workers: int = 2):
+        if fresh_ttl > max_age:
+            raise ValueError("fresh_ttl must not exceed max_age")
+        self.fresh_ttl = fresh_ttl
+        self.max_age = max_age
+        self._cache = TTLCache(
+            max_entries=max_entries,
+            ttl=max_age,
+            max_bytes=max_bytes,
+            backend=SQLiteCache(path, table='place_details') if path else None
+        )
+        self._refresh_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=refresh_workers, thread_name_prefix='place-refresh'
+        )
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    @staticmethod
+    def make_key(place_id: str, fields: Iterable[str]) -> str:
+        """Build the cache key for a place_id and the set of requested fields."""
+        field_hash = hashlib.sha1(','.join(sorted(fields)).encode('utf-8')).hexdigest()[:12]
+        return f"{place_id}:{field_hash}"
+
+    def get(self, place_id: str, fields: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """Return cached details regardless of freshness, or None."""
+        entry = self._cache.get_entry(self.make_key(place_id, fields))
+        return entry[0] if entry is not None else None
+
+    def put(self, place_id: str, fields: Iterable[str], details: Dict[str, Any]) -> None:
+        self._cache.set(self.make_key(place_id, fields), details)
+
+    def get_or_fetch(self, place_id: str, fields: Iterable[str],
+                     fetch: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Return details for place_id, calling fetch() only on a miss.
+
+        Stale entries are returned immediately and refreshed in the background.
+        Empty or failed fetches are not cached.
+        """
+        key = self.make_key(place_id, fields)
+        details = self._lookup(key, fetch)
+        if details is None:
+            details = fetch()
+            if details:
+                self._cache.set(key, details)
+        return details
+
+    async def get_or_fetch_async(self, place_id: str, fields: Iterable[str],
+                                 fetch: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+                                 refresh: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Async get_or_fetch: fetch() is awaited on a miss.
+
+        Stale entries are refreshed on the background pool with the blocking
+        refresh(), so the event loop never waits on a revalidation.
+        """
+        key = self.make_key(place_id, fields)
+        details = self._lookup(key, refresh)
+        if details is None:
+            details = await fetch()
+            if details:
+                self._cache.set(key, details)
+        return details
+
+    def _lookup(self, key: str, refresh: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Return cached details for key, scheduling refresh() if they are stale."""
+        entry = self._cache.get_entry(key)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        details, stored_at, _ = entry
+        if time.time() - stored_at < self.fresh_ttl:
+            with self._lock:
+                self.fresh_hits += 1
+        else:
+            with self._lock:
+                self.stale_hits += 1
+            self._schedule_refresh(key, refresh)
+        return details
+
+    def _schedule_refresh(self, key: str, fetch: Callable[[], Optional[Dict[str, Any]]]) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._refresh_executor.submit(self._refresh, key, fetch)
+
+    def _refresh(self, key: str, fetch: Callable[[], Optional[Dict[str, Any]]]) -> None:
+        try:
+            details = fetch()
+            with self._lock:
+                if details:
+                    self.refreshes += 1
+                else:
+                    self.refresh_failures += 1
+            if details:
+                self._cache.set(key, details)
+        except Exception:
+            with self._lock:
+                self.refresh_failures += 1
+            log.warning("Background refresh failed", key=key, exc_info=True)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of store counters, including the underlying cache tiers."""
+        with self._lock:
+            counters = {
+                'freshHits': self.fresh_hits,
+                'staleHits': self.stale_hits,
+                'misses': self.misses,
+                'refreshes': self.refreshes,
+                'refreshFailures': self.refresh_failures,
+                'refreshesInFlight': len(self._refreshing)
+            }
+        counters['cache'] = self._cache.stats()
+        return counters
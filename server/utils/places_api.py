@@ -1,15 +1,185 @@
+import asyncio
 import requests
-import json
-from typing import List, Dict, Any, Optional
+import httpx
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import List, Dict, Any, Optional, Callable, Iterable, Tuple
 import time
+import concurrent.futures
+import contextvars
+import threading
+
+from .cache import TTLCache, normalize_key
+from .place_store import PlaceDetailsStore
+from .place_index import PlaceIndex
+from .rate_limiter import TokenBucket
+from .metrics import UPSTREAM_SECONDS, UPSTREAM_ERRORS, UPSTREAM_RETRIES
+from .log import get_logger, LazyJSON
+from .geo import distances_from, location_of
+from .models import Place
+
+log = get_logger(__name__)
+
+# Converts the results of one search page to candidates (None to skip a place), in order
+PageConverter = Callable[[List[Dict[str, Any]]], List[Optional[Place]]]
+
+class _CountingRetry(Retry):
+    """urllib3 Retry that counts each retry it allows in the upstream retries metric."""
+
+    def increment(self, *args, **kwargs):
+        retry = super().increment(*args, **kwargs)
+        reason = 'status' if kwargs.get('response') is not None else 'connection'
+        UPSTREAM_RETRIES.inc(api='places', reason=reason)
+        return retry
 
 class PlacesAPI:
-    def __init__(self, api_key: str):
+    # Google reports quota pressure as HTTP 200 with this body status, so it
+    # cannot be handled by urllib3's Retry and is retried in _get instead.
+    QUOTA_STATUS = 'OVER_QUERY_LIMIT'
+    RETRY_STATUS_CODES = (500, 502, 503, 504)
+    # A next_page_token only becomes valid about two seconds after it is
+    # issued; until then Google answers INVALID_REQUEST.
+    PAGE_TOKEN_DELAY = 2.0
+    PAGE_TOKEN_ATTEMPTS = 3
+    PAGE_TOKEN_RETRY_DELAY = 0.5
+    # Body statuses that are not failures; anything else is counted as an upstream error
+    SUCCESS_STATUSES = ('OK', 'ZERO_RESULTS')
+    # Metric operation label per endpoint, where it differs from the endpoint name
+    ENDPOINT_OPERATIONS = {'findplacefromtext': 'geocode'}
+    DETAILS_FIELDS = (
+        'name', 'formatted_address', 'geometry/location', 'rating',
+        'user_ratings_total', 'price_level', 'types', 'photos',
+        'reviews', 'website', 'formatted_phone_number',
+        'wheelchair_accessible_entrance', 'serves_vegetarian_food',
+        'opening_hours', 'editorial_summary'
+    )
+    # Requested again when a place rejects some of DETAILS_FIELDS
+    BASIC_DETAILS_FIELDS = (
+        'name', 'formatted_address', 'geometry/location',
+        'rating', 'user_ratings_total', 'price_level', 'photos', 'reviews'
+    )
+
+    def __init__(self, api_key: str, pool_size: int = 20, connect_timeout: float = 3.05,
+                 read_timeout: float = 10.0, max_retries: int = 3, backoff_factor: float = 0.5,
+                 details_workers: int = 8, details_rate: float = 10.0,
+                 geocode_cache: Optional[TTLCache] = None,
+                 details_store: Optional[PlaceDetailsStore] = None,
+                 max_results: int = 20, page_workers: int = 4,
+                 early_stop_count: Optional[int] = None, early_stop_rating: float = 4.0,
+                 async_pool_size: int = 100, place_index: Optional[PlaceIndex] = None,
+                 index_max_age: float = 6 * 3600):
         self.api_key = api_key
         self.base_url = "https://maps.googleapis.com/maps/api/place"
-        
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        # One pooled session shared by every search method and worker thread
+        self.session = self._create_session(pool_size, max_retries, backoff_factor)
+        # Place details are fanned out on a long-lived pool and paced by a
+        # token bucket shared across concurrent requests
+        self.details_limiter = TokenBucket(details_rate)
+        self._details_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=details_workers, thread_name_prefix='places-details'
+        )
+        # Cities and addresses repeat across requests, so geocodes are cached
+        self.geocode_cache = geocode_cache if geocode_cache is not None else TTLCache(
+            max_entries=2048, ttl=7 * 24 * 3600
+        )
+        # Popular places recur in almost every search for a city
+        self.details_store = details_store if details_store is not None else PlaceDetailsStore()
+        # Every search result is indexed locally. Type searches (hotels,
+        # restaurants) in an area searched less than index_max_age seconds ago
+        # are answered from the index without calling Google (0 disables).
+        self.place_index = place_index if place_index is not None else PlaceIndex()
+        self.index_max_age = index_max_age
+        # Follow-up search pages wait for their token on a timer, then are
+        # fetched on a small shared pool, off the request thread.
+        # Pagination stops once early_stop_count candidates rated at least
+        # early_stop_rating have been found.
+        self.max_results = max_results
+        self.early_stop_count = early_stop_count
+        self.early_stop_rating = early_stop_rating
+        self._page_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=page_workers, thread_name_prefix='places-pages'
+        )
+        # The *_async methods share one httpx client, created on first use so
+        # it binds to the serving event loop
+        self.async_pool_size = async_pool_size
+        self._async_client: Optional[httpx.AsyncClient] = None
+    
+    def _create_session(self, pool_size: int, max_retries: int, backoff_factor: float) -> requests.Session:
+        """Create a keep-alive session with a bounded, thread-safe connection pool."""
+        retry = _CountingRetry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.RETRY_STATUS_CODES,
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False
+        )
+        # pool_maxsize is per host; pool_block makes extra threads wait for a
+        # free keep-alive connection instead of opening throwaway ones
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+            pool_block=True
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def _operation(self, url: str) -> str:
+        """Metric label for an endpoint URL ('.../nearbysearch/json' -> 'nearbysearch')."""
+        endpoint = url.rstrip('/').split('/')[-2]
+        return self.ENDPOINT_OPERATIONS.get(endpoint, endpoint)
+    
+    def _record_outcome(self, operation: str, status_code: int, status: Optional[str]) -> None:
+        """Count a failed response by HTTP status, or by body status for HTTP 200."""
+        if status_code >= 400:
+            UPSTREAM_ERRORS.inc(api='places', operation=operation, status=str(status_code))
+        elif status is not None and status not in self.SUCCESS_STATUSES:
+            UPSTREAM_ERRORS.inc(api='places', operation=operation, status=status)
+    
+    def _get(self, url: str, params: Dict[str, Any]) -> requests.Response:
+        """GET through the pooled session, backing off on OVER_QUERY_LIMIT responses."""
+        operation = self._operation(url)
+        status = None
+        with UPSTREAM_SECONDS.time(api='places', operation=operation):
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+                except requests.RequestException as e:
+                    UPSTREAM_ERRORS.inc(api='places', operation=operation, status=type(e).__name__)
+                    raise
+                if not response.ok:
+                    break
+                try:
+                    status = response.json().get('status')
+                except ValueError:
+                    status = None
+                    break
+                if status != self.QUOTA_STATUS or attempt == self.max_retries:
+                    break
+                delay = self.backoff_factor * (2 ** attempt)
+                log.warning("%s from %s, retrying in %.1fs", self.QUOTA_STATUS, operation, delay)
+                UPSTREAM_RETRIES.inc(api='places', reason='quota')
+                time.sleep(delay)
+        self._record_outcome(operation, response.status_code, status)
+        return response
+    
+    def get_coordinates(self, location: str) -> Optional[Dict[str, float]]:
+        """Geocode a city or address (cached)."""
+        return self._get_place_coordinates(location)
+    
     def _get_place_coordinates(self, location: str) -> Optional[Dict[str, float]]:
         """Get coordinates for a location (city or address)."""
+        cache_key = normalize_key(location)
+        cached = self.geocode_cache.get(cache_key)
+        if cached is not None:
+            log.debug("Geocode cache hit", location=location)
+            return cached
+        
         url = f"{self.base_url}/findplacefromtext/json"
         params = {
             "input": location,
@@ -18,102 +188,360 @@ class PlacesAPI:
             "key": self.api_key
         }
         
-        print(f"[DEBUG] Getting coordinates for location: {location}")
-        print(f"[DEBUG] API URL: {url}")
-        print(f"[DEBUG] Params: {params}")
-        
         try:
-            response = requests.get(url, params=params)
-            print(f"[DEBUG] Response status code: {response.status_code}")
-            print(f"[DEBUG] Response URL: {response.url}")
-            
+            response = self._get(url, params)
             response.raise_for_status()
             data = response.json()
-            print(f"[DEBUG] Response data status: {data.get('status')}")
-            print(f"[DEBUG] Response data: {json.dumps(data, indent=2)}")
+            log.debug("Geocode response %s", LazyJSON(data), location=location, status=data.get('status'))
             
             if data.get("candidates"):
                 location_data = data["candidates"][0]["geometry"]["location"]
-                print(f"[DEBUG] Found coordinates: {location_data}")
+                self.geocode_cache.set(cache_key, location_data)
                 return location_data
             else:
-                print(f"[DEBUG] No candidates found in response")
+                log.debug("No geocode candidates", location=location)
         except requests.exceptions.HTTPError as e:
-            print(f"[ERROR] HTTP error getting coordinates: {e}")
-            print(f"[ERROR] Response content: {response.text if 'response' in locals() else 'N/A'}")
+            log.error("HTTP error getting coordinates: %s", e, location=location, body=response.text[:500])
         except Exception as e:
-            print(f"[ERROR] Error getting coordinates: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Error getting coordinates: %s", e, location=location)
         
         return None
     
-    def _get_place_details(self, place_id: str) -> Optional[Dict[str, Any]]:
-        """Get detailed information about a place."""
-        fields = [
-            'name', 'formatted_address', 'geometry/location', 'rating',
-            'user_ratings_total', 'price_level', 'types', 'photos',
-            'reviews', 'website', 'formatted_phone_number',
-            'wheelchair_accessible_entrance', 'serves_vegetarian_food',
-            'opening_hours', 'editorial_summary'
-        ]
-        
-        url = f"{self.base_url}/details/json"
-        params = {
+    def _details_params(self, place_id: str, fields: Iterable[str]) -> Dict[str, Any]:
+        return {
             'place_id': place_id,
             'fields': ','.join(fields),
             'key': self.api_key,
             'language': 'en'
         }
+    
+    def _get_place_details(self, place_id: str) -> Optional[Dict[str, Any]]:
+        """Get detailed information about a place, served from the details store when cached.
+        
+        Falls back to BASIC_DETAILS_FIELDS if the full field set fails. Each
+        field set is stored under its own key, so basic details are never
+        served as full ones.
+        """
+        for fields in (self.DETAILS_FIELDS, self.BASIC_DETAILS_FIELDS):
+            details = self.details_store.get_or_fetch(
+                place_id, fields, lambda fields=fields: self._fetch_place_details(place_id, fields)
+            )
+            if details is not None:
+                return details
+        log.warning("Place details unavailable", place_id=place_id)
+        return None
+    
+    def _fetch_place_details(self, place_id: str, fields: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """Fetch the given fields of a place from the Places API."""
+        self.details_limiter.acquire()
         
-        print(f"[DEBUG] Getting place details for place_id: {place_id}")
-        print(f"[DEBUG] API URL: {url}")
-        print(f"[DEBUG] Params: place_id={place_id}, fields={params['fields']}, key={'***' if self.api_key else 'MISSING'}")
+        url = f"{self.base_url}/details/json"
+        params = self._details_params(place_id, fields)
         
         try:
-            response = requests.get(url, params=params)
-            print(f"[DEBUG] Response status code: {response.status_code}")
-            print(f"[DEBUG] Response URL: {response.url}")
-            
+            response = self._get(url, params)
             response.raise_for_status()
             data = response.json()
-            print(f"[DEBUG] Response data status: {data.get('status')}")
             
             if data['status'] == 'OK':
                 result = data.get('result', {})
-                print(f"[DEBUG] Successfully retrieved place details for: {result.get('name', 'Unknown')}")
+                log.debug("Fetched place details", place_id=place_id, name=result.get('name'), sample=0.1)
                 return result
-            else:
-                print(f"[DEBUG] Status not OK: {data.get('status')}")
-                print(f"[DEBUG] Error message: {data.get('error_message', 'No error message')}")
             
-            # Retry with basic fields if some are not available
-            print(f"[DEBUG] Retrying with basic fields...")
-            basic_fields = ['name', 'formatted_address', 'geometry/location', 
-                          'rating', 'user_ratings_total', 'price_level', 'photos', 'reviews']
-            params['fields'] = ','.join(basic_fields)
-            response = requests.get(url, params=params)
-            data = response.json()
-            print(f"[DEBUG] Retry response status: {data.get('status')}")
-            
-            if data['status'] == 'OK':
-                result = data.get('result', {})
-                print(f"[DEBUG] Successfully retrieved place details (retry) for: {result.get('name', 'Unknown')}")
-                return result
-            else:
-                print(f"[DEBUG] Retry failed with status: {data.get('status')}")
-                print(f"[DEBUG] Error message: {data.get('error_message', 'No error message')}")
+            log.debug("Place details returned status %s", data.get('status'), place_id=place_id,
+                      error=data.get('error_message'))
                 
         except requests.exceptions.HTTPError as e:
-            print(f"[ERROR] HTTP error getting place details: {e}")
-            print(f"[ERROR] Response content: {response.text if 'response' in locals() else 'N/A'}")
+            log.error("HTTP error getting place details: %s", e, place_id=place_id, body=response.text[:500])
         except Exception as e:
-            print(f"[ERROR] Error getting place details: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Error getting place details: %s", e, place_id=place_id)
         
         return None
     
+    def _detail_candidates(self, candidates: List[Place],
+                           apply_details: Callable[[Place, Dict[str, Any]], Place],
+                           on_place: Optional[Callable[[Place], None]] = None,
+                           next_page: Optional[concurrent.futures.Future] = None) -> List[Place]:
+        """Fetch details for all candidates in parallel and merge them in.
+        
+        Places are returned in candidate order. A failed lookup only drops that
+        candidate. If on_place is given, it is called with each detailed place
+        as soon as its details arrive. next_page is a future from
+        _schedule_next_page; its candidates are appended and detailed as soon
+        as the page arrives, while earlier details are still in flight.
+        """
+        ordered = []
+        futures = {}
+        seen = set()
+        
+        def add_candidates(new_candidates):
+            added = []
+            for candidate in new_candidates:
+                # Consecutive pages can repeat a place
+                if candidate.place_id in seen:
+                    continue
+                seen.add(candidate.place_id)
+                # Run in the request's context so per-request log settings carry over
+                future = self._details_executor.submit(
+                    contextvars.copy_context().run, self._get_place_details, candidate.place_id
+                )
+                futures[future] = len(ordered)
+                ordered.append(candidate)
+                added.append(future)
+            return added
+        
+        pending = set(add_candidates(candidates))
+        if next_page is not None:
+            pending.add(next_page)
+        
+        detailed = {}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future not in futures:
+                    # A follow-up search page arrived
+                    try:
+                        page_candidates, following_page = future.result()
+                    except Exception as e:
+                        log.error("Error fetching next search page: %s", e)
+                        continue
+                    pending.update(add_candidates(page_candidates))
+                    if following_page is not None:
+                        pending.add(following_page)
+                    continue
+                
+                idx = futures[future]
+                candidate = ordered[idx]
+                try:
+                    details = future.result()
+                except Exception as e:
+                    log.error("Error fetching details for %s: %s", candidate.name, e)
+                    continue
+                if not details:
+                    log.error("Failed to get details for %s", candidate.name)
+                    continue
+                detailed[idx] = apply_details(candidate, details)
+                if on_place is not None:
+                    on_place(detailed[idx])
+        
+        return [detailed[idx] for idx in sorted(detailed)]
+    
+    def _fetch_search_page(self, url: str, params: Dict[str, Any], label: str) -> Dict[str, Any]:
+        """Fetch one nearbysearch/textsearch page. Returns the response body, or {} on error."""
+        try:
+            response = self._get(url, params)
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            log.error("Error searching %s: %s", label, e)
+            return {}
+        
+        if data.get('status') not in ('OK', 'ZERO_RESULTS'):
+            log.warning("Search for %s returned status %s", label, data.get('status'),
+                        error=data.get('error_message'))
+        return data
+    
+    def _page_candidates(self, data: Dict[str, Any],
+                         to_candidates: PageConverter,
+                         limit: int) -> List[Place]:
+        """Convert a search page and keep up to `limit` candidates; to_candidates returns None to skip a place."""
+        if data.get('status') != 'OK':
+            return []
+        self.place_index.add(data.get('results', []))
+        candidates = [candidate for candidate in to_candidates(data.get('results', [])) if candidate is not None]
+        return candidates[:limit]
+    
+    def _index_query(self, params: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, float], float]]:
+        """(place type, origin, radius) of a search the place index can answer, or None.
+        
+        Only plain nearbysearches by type qualify; keyword and text searches
+        depend on Google's matching.
+        """
+        if 'type' not in params or 'keyword' in params or 'query' in params:
+            return None
+        lat, lng = params['location'].split(',')
+        return params['type'], {'lat': float(lat), 'lng': float(lng)}, float(params['radius'])
+    
+    def _local_candidates(self, params: Dict[str, Any], to_candidates: PageConverter,
+                          label: str) -> Optional[List[Place]]:
+        """Candidates for the search from the place index, or None if Google must be asked.
+        
+        The index only answers when it still yields a full max_results
+        candidates; anything shorter may be missing places Google would return.
+        """
+        query = self._index_query(params)
+        if query is None or not self.index_max_age:
+            return None
+        place_type, origin, radius = query
+        results = self.place_index.covered_nearby(place_type, origin, radius, self.index_max_age,
+                                                  min_results=self.max_results)
+        if results is None:
+            return None
+        # Google ranks nearby results by prominence, approximated by review count
+        results.sort(key=lambda place: place.get('user_ratings_total') or 0, reverse=True)
+        candidates = [candidate for candidate in to_candidates(results) if candidate is not None]
+        if len(candidates) < self.max_results:
+            self.place_index.reject_local_answer()
+            return None
+        log.debug("Answered %s search from the place index", label, candidates=len(candidates))
+        return candidates[:self.max_results]
+    
+    def _mark_covered(self, params: Dict[str, Any], data: Dict[str, Any]) -> None:
+        """Record a successful first search page as fresh coverage of its area."""
+        query = self._index_query(params)
+        if query is not None and data.get('status') in self.SUCCESS_STATUSES:
+            self.place_index.mark_covered(*query)
+    
+    def _count_quality(self, candidates: List[Place]) -> int:
+        return sum(1 for candidate in candidates if (candidate.rating or 0) >= self.early_stop_rating)
+    
+    def _search_first_page(self, url: str, params: Dict[str, Any],
+                           to_candidates: PageConverter,
+                           label: str) -> Tuple[List[Place], Optional[concurrent.futures.Future]]:
+        """Fetch the first search page and schedule the following ones in the background.
+        
+        Returns (candidates, next page future or None) for _detail_candidates.
+        Areas recently searched are answered from the place index instead.
+        """
+        local = self._local_candidates(params, to_candidates, label)
+        if local is not None:
+            return local, None
+        data = self._fetch_search_page(url, params, label)
+        candidates = self._page_candidates(data, to_candidates, self.max_results)
+        self._mark_covered(params, data)
+        log.debug("Found %d %s on page 1", len(candidates), label)
+        next_page = self._schedule_next_page(
+            url, params, data, to_candidates, self.max_results - len(candidates),
+            self._count_quality(candidates), label, 2
+        )
+        return candidates, next_page
+    
+    def _next_page_token(self, data: Dict[str, Any], remaining: int, quality_found: int,
+                         label: str, page_num: int) -> Optional[str]:
+        """Return the token for the next page, or None if no further page is needed."""
+        next_page_token = data.get('next_page_token')
+        if not next_page_token or remaining <= 0:
+            return None
+        if self.early_stop_count is not None and quality_found >= self.early_stop_count:
+            log.debug("%d %s rated %s+ already found, skipping page %d",
+                      quality_found, label, self.early_stop_rating, page_num)
+            return None
+        return next_page_token
+    
+    def _schedule_next_page(self, url: str, params: Dict[str, Any], data: Dict[str, Any],
+                            to_candidates: PageConverter,
+                            remaining: int, quality_found: int, label: str,
+                            page_num: int) -> Optional[concurrent.futures.Future]:
+        """Fetch the next page in the background once its token is valid.
+        
+        Returns a future of (candidates, next page future or None), or None
+        if no further page is needed.
+        """
+        next_page_token = self._next_page_token(data, remaining, quality_found, label, page_num)
+        if next_page_token is None:
+            return None
+        future = concurrent.futures.Future()
+        self._fetch_next_page_later(
+            self.PAGE_TOKEN_DELAY, future, url, params, next_page_token,
+            to_candidates, remaining, quality_found, label, page_num, 0
+        )
+        return future
+    
+    def _fetch_next_page_later(self, delay: float, future: concurrent.futures.Future, *args: Any) -> None:
+        """Run _fetch_next_page on the page pool after delay seconds.
+        
+        The token delay is waited out on a timer, not on a pool worker, so
+        pages waiting for their token do not hold up other requests' pages.
+        """
+        context = contextvars.copy_context()
+        timer = threading.Timer(
+            delay, self._page_executor.submit, (context.run, self._fetch_next_page, future) + args
+        )
+        timer.daemon = True
+        timer.start()
+    
+    def _fetch_next_page(self, future: concurrent.futures.Future, url: str, params: Dict[str, Any],
+                         next_page_token: str, to_candidates: PageConverter,
+                         remaining: int, quality_found: int, label: str,
+                         page_num: int, attempt: int) -> None:
+        """Fetch a follow-up page and resolve future with (candidates, next page future or None).
+        
+        A token that is not valid yet is retried after PAGE_TOKEN_RETRY_DELAY,
+        up to PAGE_TOKEN_ATTEMPTS attempts.
+        """
+        try:
+            data = self._fetch_search_page(url, dict(params, pagetoken=next_page_token), label)
+            if data.get('status') == 'INVALID_REQUEST' and attempt + 1 < self.PAGE_TOKEN_ATTEMPTS:
+                self._fetch_next_page_later(
+                    self.PAGE_TOKEN_RETRY_DELAY, future, url, params, next_page_token,
+                    to_candidates, remaining, quality_found, label, page_num, attempt + 1
+                )
+                return
+            
+            candidates = self._page_candidates(data, to_candidates, remaining)
+            log.debug("Found %d %s on page %d", len(candidates), label, page_num)
+            following_page = self._schedule_next_page(
+                url, params, data, to_candidates, remaining - len(candidates),
+                quality_found + self._count_quality(candidates), label, page_num + 1
+            )
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result((candidates, following_page))
+    
+    def _apply_common_details(self, place: Place, details: Dict[str, Any]) -> Place:
+        """Fill in the images, address and reviews every kind of place shows."""
+        # Get images
+        images = []
+        for photo in details.get('photos', [])[:2]:
+            photo_ref = photo.get('photo_reference')
+            if photo_ref:
+                images.append(self._get_photo_url(photo_ref))
+        
+        # Get review snippets
+        review_snippets = []
+        for review in details.get('reviews', [])[:3]:
+            if 'text' in review:
+                review_snippets.append(review['text'][:200])  # Limit length
+        
+        place.images = images
+        place.review_snippets = review_snippets
+        place.address = details.get('formatted_address', place.address)
+        place.rating = details.get('rating', place.rating)
+        place.total_reviews = details.get('user_ratings_total', place.total_reviews)
+        return place
+    
+    def _apply_hotel_details(self, hotel: Place, details: Dict[str, Any]) -> Place:
+        """Merge place details into a hotel candidate."""
+        return self._apply_common_details(hotel, details)
+    
+    def _apply_restaurant_details(self, restaurant: Place, details: Dict[str, Any]) -> Place:
+        """Merge place details into a restaurant candidate."""
+        self._apply_common_details(restaurant, details)
+        restaurant.price_level = details.get('price_level', restaurant.price_level)
+        return restaurant
+    
+    def _apply_activity_details(self, activity: Place, details: Dict[str, Any], price_range: str) -> Place:
+        """Merge place details into an activity candidate."""
+        self._apply_common_details(activity, details)
+        
+        # Determine activity type
+        activity.types = tuple(details.get('types', activity.types))
+        types_text = ' '.join(activity.types).lower()
+        activity_type = 'attraction'
+        if 'museum' in types_text:
+            activity_type = 'museum'
+        elif 'park' in types_text:
+            activity_type = 'park'
+        elif 'zoo' in types_text:
+            activity_type = 'zoo'
+        elif 'theater' in types_text or 'theatre' in types_text:
+            activity_type = 'theater'
+        
+        activity.activity_type = activity_type
+        activity.price_info = price_range if price_range else 'Price varies'
+        return activity
+    
     def _get_photo_url(self, photo_reference: str, max_width: int = 400) -> str:
         """Generate a photo URL from a photo reference."""
         url = f"{self.base_url}/photo"
@@ -124,45 +552,8 @@ class PlacesAPI:
         }
         return f"{url}?{'&'.join([f'{k}={v}' for k, v in params.items()])}"
     
-    def _calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-        """Calculate distance in meters between two coordinates using Haversine formula."""
-        from math import radians, cos, sin, asin, sqrt
-        
-        # Convert to radians
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        
-        # Haversine formula
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * asin(sqrt(a))
-        r = 6371000  # Radius of earth in meters
-        
-        return c * r
-    
-    def search_hotels(self, city: str, price_range: str, location_prefs: str, 
-                     excluded_hotels: List[str]) -> List[Dict[str, Any]]:
-        """Search for hotels in a city."""
-        print(f"[DEBUG] ========== Starting hotel search ==========")
-        print(f"[DEBUG] City: {city}")
-        print(f"[DEBUG] Price range: {price_range}")
-        print(f"[DEBUG] Location preferences: {location_prefs}")
-        print(f"[DEBUG] Excluded hotels: {excluded_hotels}")
-        print(f"[DEBUG] API key present: {'Yes' if self.api_key else 'No'}")
-        
-        # Get city coordinates
-        coords = self._get_place_coordinates(city)
-        if not coords:
-            print(f"[ERROR] Failed to get coordinates for city: {city}")
-            return []
-        
-        print(f"[DEBUG] City coordinates found: {coords}")
-        
-        # Build keywords
-        keywords = ["hotel", "lodging", "accommodation"]
-        if location_prefs:
-            keywords.append(location_prefs.lower())
-        
+    def _hotel_search_request(self, coords: Dict[str, float], excluded_hotels: List[str]) -> tuple:
+        """Build the lodging nearbysearch. Returns (url, params, to_candidates)."""
         # Search for lodging
         url = f"{self.base_url}/nearbysearch/json"
         params = {
@@ -172,153 +563,19 @@ class PlacesAPI:
             "key": self.api_key
         }
         
-        print(f"[DEBUG] Searching for hotels with:")
-        print(f"[DEBUG]   URL: {url}")
-        print(f"[DEBUG]   Location: {params['location']}")
-        print(f"[DEBUG]   Radius: {params['radius']}m")
-        print(f"[DEBUG]   Type: {params['type']}")
-        
-        hotels = []
-        next_page_token = None
-        max_results = 20
-        page_num = 1
-        
-        while len(hotels) < max_results:
-            try:
-                if next_page_token:
-                    params['pagetoken'] = next_page_token
-                    print(f"[DEBUG] Fetching page {page_num} with pagetoken...")
-                    time.sleep(2)  # Required delay between page requests
-                else:
-                    print(f"[DEBUG] Fetching initial page {page_num}...")
-                
-                response = requests.get(url, params=params)
-                print(f"[DEBUG] Response status code: {response.status_code}")
-                print(f"[DEBUG] Response URL: {response.url[:200]}...")  # Truncate long URLs
-                
-                if response.status_code == 404:
-                    print(f"[ERROR] 404 Not Found - Check if the API endpoint is correct")
-                    print(f"[ERROR] Full URL: {response.url}")
-                    break
-                
-                response.raise_for_status()
-                data = response.json()
-                
-                print(f"[DEBUG] Response status: {data.get('status')}")
-                
-                if data.get('status') != 'OK':
-                    print(f"[ERROR] API returned non-OK status: {data.get('status')}")
-                    print(f"[ERROR] Error message: {data.get('error_message', 'No error message')}")
-                    print(f"[DEBUG] Full response: {json.dumps(data, indent=2)}")
-                    break
-                
-                results = data.get('results', [])
-                print(f"[DEBUG] Found {len(results)} results on page {page_num}")
-                
-                for idx, place in enumerate(results):
-                    place_name = place.get('name', '')
-                    if place_name not in excluded_hotels and len(hotels) < max_results:
-                        hotel_data = {
-                            'name': place_name,
-                            'placeId': place.get('place_id'),
-                            'address': place.get('vicinity') or place.get('formatted_address', ''),
-                            'location': place.get('geometry', {}).get('location', {}),
-                            'rating': place.get('rating', 0),
-                            'user_ratings_total': place.get('user_ratings_total', 0),
-                            'price_level': place.get('price_level'),
-                            'types': place.get('types', []),
-                            'photos': place.get('photos', [])
-                        }
-                        hotels.append(hotel_data)
-                        print(f"[DEBUG] Added hotel {len(hotels)}: {place_name} (ID: {place.get('place_id')})")
-                
-                next_page_token = data.get('next_page_token')
-                if not next_page_token:
-                    print(f"[DEBUG] No more pages available")
-                    break
-                else:
-                    print(f"[DEBUG] Next page token received")
-                    page_num += 1
-                    
-            except requests.exceptions.HTTPError as e:
-                print(f"[ERROR] HTTP error searching hotels: {e}")
-                print(f"[ERROR] Response status: {response.status_code if 'response' in locals() else 'N/A'}")
-                print(f"[ERROR] Response content: {response.text[:500] if 'response' in locals() else 'N/A'}")
-                break
-            except Exception as e:
-                print(f"[ERROR] Error searching hotels: {e}")
-                import traceback
-                traceback.print_exc()
-                break
-        
-        print(f"[DEBUG] Found {len(hotels)} hotels total, fetching details...")
-        
-        # Get detailed information for each hotel
-        detailed_hotels = []
-        for idx, hotel in enumerate(hotels[:max_results], 1):
-            print(f"[DEBUG] Fetching details for hotel {idx}/{min(len(hotels), max_results)}: {hotel['name']}")
-            details = self._get_place_details(hotel['placeId'])
-            if details:
-                # Get images
-                images = []
-                photos = details.get('photos', [])
-                print(f"[DEBUG]   Found {len(photos)} photos")
-                for photo in photos[:2]:
-                    photo_ref = photo.get('photo_reference')
-                    if photo_ref:
-                        img_url = self._get_photo_url(photo_ref)
-                        images.append(img_url)
-                        print(f"[DEBUG]   Added image URL: {img_url[:100]}...")
-                
-                # Get review snippets
-                review_snippets = []
-                reviews = details.get('reviews', [])
-                print(f"[DEBUG]   Found {len(reviews)} reviews")
-                for review in reviews[:3]:
-                    if 'text' in review:
-                        review_snippets.append(review['text'][:200])  # Limit length
-                
-                hotel.update({
-                    'images': images,
-                    'address': details.get('formatted_address', hotel['address']),
-                    'reviews': {
-                        'rating': details.get('rating', hotel.get('rating', 0)),
-                        'totalReviews': details.get('user_ratings_total', hotel.get('user_ratings_total', 0)),
-                        'snippets': review_snippets
-                    },
-                    'roomPrices': {
-                        'available': False,  # Real pricing would require booking API access
-                        'pricePerNight': None,
-                        'totalPrice': None,
-                        'currency': 'USD'
-                    }
-                })
-                detailed_hotels.append(hotel)
-                print(f"[DEBUG]   Successfully processed hotel: {hotel['name']}")
-            else:
-                print(f"[ERROR]   Failed to get details for hotel: {hotel['name']}")
-            time.sleep(0.1)  # Rate limiting
+        # Matched like the search key (utils.singleflight.request_key), ignoring case and spacing
+        excluded = {normalize_key(name) for name in excluded_hotels}
         
-        print(f"[DEBUG] ========== Hotel search complete ==========")
-        print(f"[DEBUG] Returning {len(detailed_hotels)} detailed hotels")
+        def to_hotels(results):
+            return [
+                Place.from_search_result('hotel', place) if normalize_key(place.get('name', '')) not in excluded else None
+                for place in results
+            ]
         
-        return detailed_hotels
+        return url, params, to_hotels
     
-    def search_restaurants(self, address: str, price_range: str, eating_preferences: str,
-                          food_restrictions: List[str]) -> List[Dict[str, Any]]:
-        """Search for restaurants near an address."""
-        # Get address coordinates
-        coords = self._get_place_coordinates(address)
-        if not coords:
-            return []
-        
-        # Build keywords
-        keywords = ["restaurant", "food"]
-        if eating_preferences:
-            keywords.extend(eating_preferences.lower().split())
-        if food_restrictions:
-            keywords.extend([r.lower() for r in food_restrictions])
-        
+    def _restaurant_search_request(self, coords: Dict[str, float]) -> tuple:
+        """Build the restaurant nearbysearch. Returns (url, params, to_candidates)."""
         # Search for restaurants
         url = f"{self.base_url}/nearbysearch/json"
         params = {
@@ -328,114 +585,17 @@ class PlacesAPI:
             "key": self.api_key
         }
         
-        restaurants = []
-        next_page_token = None
-        max_results = 20
-        
-        ref_lat = coords['lat']
-        ref_lng = coords['lng']
-        
-        while len(restaurants) < max_results:
-            try:
-                if next_page_token:
-                    params['pagetoken'] = next_page_token
-                    time.sleep(2)
-                
-                response = requests.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                if data.get('status') != 'OK':
-                    break
-                
-                for place in data.get('results', []):
-                    if len(restaurants) < max_results:
-                        place_loc = place.get('geometry', {}).get('location', {})
-                        distance_meters = self._calculate_distance(
-                            ref_lat, ref_lng,
-                            place_loc.get('lat', ref_lat),
-                            place_loc.get('lng', ref_lng)
-                        )
-                        
-                        restaurants.append({
-                            'name': place.get('name'),
-                            'placeId': place.get('place_id'),
-                            'address': place.get('vicinity') or place.get('formatted_address', ''),
-                            'location': place_loc,
-                            'rating': place.get('rating', 0),
-                            'user_ratings_total': place.get('user_ratings_total', 0),
-                            'price_level': place.get('price_level'),
-                            'photos': place.get('photos', []),
-                            'distance_meters': distance_meters
-                        })
-                
-                next_page_token = data.get('next_page_token')
-                if not next_page_token:
-                    break
-                    
-            except Exception as e:
-                print(f"Error searching restaurants: {e}")
-                break
+        def to_restaurants(results):
+            # One vectorized pass per page; places without a location count as at the origin
+            distances = distances_from(coords, [location_of(place) or coords for place in results])
+            return [Place.from_search_result('restaurant', place, distance_m=float(distance_m))
+                    for place, distance_m in zip(results, distances)]
         
-        # Get detailed information for each restaurant
-        detailed_restaurants = []
-        for restaurant in restaurants[:max_results]:
-            details = self._get_place_details(restaurant['placeId'])
-            if details:
-                # Get images
-                images = []
-                for photo in details.get('photos', [])[:2]:
-                    photo_ref = photo.get('photo_reference')
-                    if photo_ref:
-                        images.append(self._get_photo_url(photo_ref))
-                
-                # Get review snippets
-                review_snippets = []
-                for review in details.get('reviews', [])[:3]:
-                    if 'text' in review:
-                        review_snippets.append(review['text'][:200])
-                
-                # Format price level
-                price_level_map = {0: '', 1: '$', 2: '$$', 3: '$$$', 4: '$$$$'}
-                price_level = price_level_map.get(details.get('price_level'), '')
-                
-                # Format distance
-                distance_m = restaurant['distance_meters']
-                if distance_m < 1000:
-                    distance_text = f"{int(distance_m)} meters"
-                else:
-                    distance_text = f"{distance_m/1000:.1f} km"
-                
-                restaurant.update({
-                    'images': images,
-                    'priceLevel': price_level,
-                    'address': details.get('formatted_address', restaurant['address']),
-                    'reviews': {
-                        'rating': details.get('rating', restaurant.get('rating', 0)),
-                        'totalReviews': details.get('user_ratings_total', restaurant.get('user_ratings_total', 0)),
-                        'snippets': review_snippets
-                    },
-                    'distance': {
-                        'meters': int(distance_m),
-                        'text': distance_text
-                    }
-                })
-                detailed_restaurants.append(restaurant)
-            time.sleep(0.1)
-        
-        return detailed_restaurants
+        return url, params, to_restaurants
     
-    def search_activities(self, address: str, price_range: str, max_distance: str,
-                         search_prompt: str) -> List[Dict[str, Any]]:
-        """Search for activities and attractions near an address using text search."""
-        # Get address coordinates
-        coords = self._get_place_coordinates(address)
-        if not coords:
-            return []
-        
-        # Use text search for more flexibility - this will be called from app.py after Gemini generates the query
-        # For now, we'll use a combination of nearbysearch with multiple types
-        
+    @staticmethod
+    def activity_radius(max_distance: str) -> int:
+        """Radius in meters that an activity search covers for a maxDistance value."""
         # Convert max_distance to meters
         radius = 10000  # Default 10km
         if max_distance:
@@ -454,6 +614,14 @@ class PlacesAPI:
                     pass
             elif 'walking' in max_distance_lower:
                 radius = 2000  # 2km for walking distance
+        return radius
+    
+    def _activity_search_request(self, coords: Dict[str, float], address: str, max_distance: str,
+                                 search_prompt: str) -> tuple:
+        """Build the activity textsearch. Returns (url, params, to_candidates)."""
+        # Use text search for more flexibility - this will be called from app.py after Gemini generates the query
+        # For now, we'll use a combination of nearbysearch with multiple types
+        radius = self.activity_radius(max_distance)
         
         # Use textsearch for more flexible results that can include movie theatres, entertainment, etc.
         # Text search with location bias - search_prompt should already be a Gemini-generated query
@@ -472,138 +640,358 @@ class PlacesAPI:
             "key": self.api_key
         }
         
-        print(f"[DEBUG] Searching activities with query: {query_text}")
-        print(f"[DEBUG] Location: {coords['lat']},{coords['lng']}, Radius: {radius}m")
+        log.debug("Searching activities", query=query_text, location=params['location'], radius=radius)
+        
+        def to_activities(results):
+            distances = distances_from(coords, [location_of(place) or coords for place in results])
+            return [Place.from_search_result('activity', place, 'formatted_address', float(distance_m))
+                    for place, distance_m in zip(results, distances)]
+        
+        return url, params, to_activities
+    
+    def search_hotels(self, city: str, price_range: str, location_prefs: str, 
+                     excluded_hotels: List[str],
+                     on_place: Optional[Callable[[Place], None]] = None,
+                     coords: Optional[Dict[str, float]] = None) -> List[Place]:
+        """Search for hotels in a city. on_place is called as each hotel's details arrive.
+        
+        Pass coords to skip geocoding when the caller already resolved the city.
+        """
+        # Get city coordinates
+        if coords is None:
+            coords = self._get_place_coordinates(city)
+        if not coords:
+            log.error("Failed to get coordinates for city", city=city)
+            return []
+        
+        url, params, to_hotels = self._hotel_search_request(coords, excluded_hotels)
+        log.debug("Searching hotels", city=city, location=params['location'], radius=params['radius'],
+                  excluded=len(excluded_hotels))
+        
+        # Later pages are fetched in the background while page 1 is detailed
+        hotels, next_page = self._search_first_page(url, params, to_hotels, 'hotels')
+        
+        # Get detailed information for each hotel
+        detailed_hotels = self._detail_candidates(hotels, self._apply_hotel_details, on_place, next_page)
+        log.debug("Hotel search complete", city=city, results=len(detailed_hotels))
+        
+        return detailed_hotels
+    
+    def search_restaurants(self, address: str, price_range: str, eating_preferences: str,
+                          food_restrictions: List[str],
+                          on_place: Optional[Callable[[Place], None]] = None,
+                          coords: Optional[Dict[str, float]] = None) -> List[Place]:
+        """Search for restaurants near an address. on_place is called as each restaurant's details arrive.
+        
+        Pass coords to skip geocoding when the caller already resolved the address.
+        """
+        # Get address coordinates
+        if coords is None:
+            coords = self._get_place_coordinates(address)
+        if not coords:
+            return []
+        
+        url, params, to_restaurants = self._restaurant_search_request(coords)
+        
+        # Later pages are fetched in the background while page 1 is detailed
+        restaurants, next_page = self._search_first_page(url, params, to_restaurants, 'restaurants')
+        
+        # Get detailed information for each restaurant
+        detailed_restaurants = self._detail_candidates(
+            restaurants, self._apply_restaurant_details, on_place, next_page
+        )
+        
+        return detailed_restaurants
+    
+    def search_activities(self, address: str, price_range: str, max_distance: str,
+                         search_prompt: str,
+                         on_place: Optional[Callable[[Place], None]] = None,
+                         coords: Optional[Dict[str, float]] = None) -> List[Place]:
+        """Search for activities and attractions near an address using text search.
+        
+        on_place is called as each activity's details arrive. Pass coords to
+        skip geocoding when the caller already resolved the address.
+        """
+        # Get address coordinates
+        if coords is None:
+            coords = self._get_place_coordinates(address)
+        if not coords:
+            return []
+        
+        url, params, to_activities = self._activity_search_request(coords, address, max_distance, search_prompt)
         
-        activities = []
-        next_page_token = None
-        max_results = 20
+        # Later pages are fetched in the background while page 1 is detailed
+        activities, next_page = self._search_first_page(url, params, to_activities, 'activities')
         
-        ref_lat = coords['lat']
-        ref_lng = coords['lng']
+        # Get detailed information for each activity
+        detailed_activities = self._detail_candidates(
+            activities,
+            lambda activity, details: self._apply_activity_details(activity, details, price_range),
+            on_place,
+            next_page
+        )
+        
+        return detailed_activities
+    
+    # Async variants. These mirror the blocking methods above for the ASGI app,
+    # so a single event loop can hold many searches in flight without a thread
+    # each. Caches, the details store and the details rate limit are shared.
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                limits=httpx.Limits(
+                    max_connections=self.async_pool_size,
+                    max_keepalive_connections=self.async_pool_size
+                )
+            )
+        return self._async_client
+    
+    async def aclose(self) -> None:
+        """Close the async HTTP client, if one was created."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+    
+    async def _get_async(self, url: str, params: Dict[str, Any]) -> httpx.Response:
+        """Async GET with the same retry policy as _get (5xx, connection errors and OVER_QUERY_LIMIT)."""
+        client = self._get_async_client()
+        operation = self._operation(url)
+        status = None
+        with UPSTREAM_SECONDS.time(api='places', operation=operation):
+            for attempt in range(self.max_retries + 1):
+                last_attempt = attempt == self.max_retries
+                delay = self.backoff_factor * (2 ** attempt)
+                try:
+                    response = await client.get(url, params=params)
+                except httpx.TransportError as e:
+                    if last_attempt:
+                        UPSTREAM_ERRORS.inc(api='places', operation=operation, status=type(e).__name__)
+                        raise
+                    UPSTREAM_RETRIES.inc(api='places', reason='connection')
+                    await asyncio.sleep(delay)
+                    continue
+                if response.status_code in self.RETRY_STATUS_CODES and not last_attempt:
+                    UPSTREAM_RETRIES.inc(api='places', reason='status')
+                    await asyncio.sleep(delay)
+                    continue
+                if not response.is_success:
+                    break
+                try:
+                    status = response.json().get('status')
+                except ValueError:
+                    status = None
+                    break
+                if status != self.QUOTA_STATUS or last_attempt:
+                    break
+                log.warning("%s from %s, retrying in %.1fs", self.QUOTA_STATUS, operation, delay)
+                UPSTREAM_RETRIES.inc(api='places', reason='quota')
+                await asyncio.sleep(delay)
+        self._record_outcome(operation, response.status_code, status)
+        return response
+    
+    async def get_coordinates_async(self, location: str) -> Optional[Dict[str, float]]:
+        """Geocode a city or address (cached)."""
+        cache_key = normalize_key(location)
+        cached = self.geocode_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
+        url = f"{self.base_url}/findplacefromtext/json"
+        params = {
+            "input": location,
+            "inputtype": "textquery",
+            "fields": "geometry/location",
+            "key": self.api_key
+        }
         try:
-            # First search
-            response = requests.get(url, params=params)
+            response = await self._get_async(url, params)
+            response.raise_for_status()
+            data = response.json()
+            if data.get("candidates"):
+                location_data = data["candidates"][0]["geometry"]["location"]
+                self.geocode_cache.set(cache_key, location_data)
+                return location_data
+            log.debug("No geocode candidates", location=location)
+        except Exception as e:
+            log.error("Error getting coordinates: %s", e, location=location)
+        return None
+    
+    async def _get_place_details_async(self, place_id: str) -> Optional[Dict[str, Any]]:
+        """Async _get_place_details, with the same fallback to BASIC_DETAILS_FIELDS."""
+        for fields in (self.DETAILS_FIELDS, self.BASIC_DETAILS_FIELDS):
+            details = await self.details_store.get_or_fetch_async(
+                place_id, fields,
+                lambda fields=fields: self._fetch_place_details_async(place_id, fields),
+                lambda fields=fields: self._fetch_place_details(place_id, fields)
+            )
+            if details is not None:
+                return details
+        log.warning("Place details unavailable", place_id=place_id)
+        return None
+    
+    async def _fetch_place_details_async(self, place_id: str, fields: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """Fetch the given fields of a place from the Places API."""
+        await self.details_limiter.acquire_async()
+        url = f"{self.base_url}/details/json"
+        try:
+            response = await self._get_async(url, self._details_params(place_id, fields))
             response.raise_for_status()
             data = response.json()
-            
-            print(f"[DEBUG] Text search status: {data.get('status')}")
-            
             if data.get('status') == 'OK':
-                for place in data.get('results', []):
-                    if len(activities) < max_results:
-                        place_loc = place.get('geometry', {}).get('location', {})
-                        distance_meters = self._calculate_distance(
-                            ref_lat, ref_lng,
-                            place_loc.get('lat', ref_lat),
-                            place_loc.get('lng', ref_lng)
-                        )
-                        
-                        activities.append({
-                            'name': place.get('name'),
-                            'placeId': place.get('place_id'),
-                            'address': place.get('formatted_address', ''),
-                            'location': place_loc,
-                            'rating': place.get('rating', 0),
-                            'user_ratings_total': place.get('user_ratings_total', 0),
-                            'types': place.get('types', []),
-                            'photos': place.get('photos', []),
-                            'distance_meters': distance_meters
-                        })
-                
-                # Try to get more results if we have a next page token
-                next_page_token = data.get('next_page_token')
-                if next_page_token and len(activities) < max_results:
-                    time.sleep(2)  # Required delay for next page token
-                    params['pagetoken'] = next_page_token
-                    response = requests.get(url, params=params)
-                    response.raise_for_status()
-                    data = response.json()
-                    
-                    if data.get('status') == 'OK':
-                        for place in data.get('results', []):
-                            if len(activities) < max_results:
-                                place_loc = place.get('geometry', {}).get('location', {})
-                                dist_meters = self._calculate_distance(
-                                    ref_lat, ref_lng,
-                                    place_loc.get('lat', ref_lat),
-                                    place_loc.get('lng', ref_lng)
-                                )
-                                
-                                activities.append({
-                                    'name': place.get('name'),
-                                    'placeId': place.get('place_id'),
-                                    'address': place.get('formatted_address', ''),
-                                    'location': place_loc,
-                                    'rating': place.get('rating', 0),
-                                    'user_ratings_total': place.get('user_ratings_total', 0),
-                                    'types': place.get('types', []),
-                                    'photos': place.get('photos', []),
-                                    'distance_meters': dist_meters
-                                })
-            else:
-                print(f"[WARNING] Text search failed with status: {data.get('status')}")
-                print(f"[WARNING] Error message: {data.get('error_message', 'Unknown error')}")
+                return data.get('result', {})
+            log.debug("Place details returned status %s", data.get('status'), place_id=place_id)
+        except Exception as e:
+            log.error("Error getting place details: %s", e, place_id=place_id)
+        return None
+    
+    async def _fetch_search_page_async(self, url: str, params: Dict[str, Any], label: str) -> Dict[str, Any]:
+        try:
+            response = await self._get_async(url, params)
+            response.raise_for_status()
+            data = response.json()
         except Exception as e:
-            print(f"Error searching activities: {e}")
-            import traceback
-            traceback.print_exc()
+            log.error("Error searching %s: %s", label, e)
+            return {}
         
-        # Get detailed information for each activity
-        detailed_activities = []
-        for activity in activities[:max_results]:
-            details = self._get_place_details(activity['placeId'])
-            if details:
-                # Get images
-                images = []
-                for photo in details.get('photos', [])[:2]:
-                    photo_ref = photo.get('photo_reference')
-                    if photo_ref:
-                        images.append(self._get_photo_url(photo_ref))
-                
-                # Get review snippets
-                review_snippets = []
-                for review in details.get('reviews', [])[:3]:
-                    if 'text' in review:
-                        review_snippets.append(review['text'][:200])
-                
-                # Determine activity type
-                types_list = details.get('types', activity.get('types', []))
-                activity_type = 'attraction'
-                if 'museum' in ' '.join(types_list).lower():
-                    activity_type = 'museum'
-                elif 'park' in ' '.join(types_list).lower():
-                    activity_type = 'park'
-                elif 'zoo' in ' '.join(types_list).lower():
-                    activity_type = 'zoo'
-                elif 'theater' in ' '.join(types_list).lower() or 'theatre' in ' '.join(types_list).lower():
-                    activity_type = 'theater'
-                
-                # Format distance
-                distance_m = activity['distance_meters']
-                if distance_m < 1000:
-                    distance_text = f"{int(distance_m)} meters"
-                else:
-                    distance_text = f"{distance_m/1000:.1f} km"
+        if data.get('status') not in ('OK', 'ZERO_RESULTS'):
+            log.warning("Search for %s returned status %s", label, data.get('status'),
+                        error=data.get('error_message'))
+        return data
+    
+    async def _fetch_next_page_async(self, url: str, params: Dict[str, Any], next_page_token: str,
+                                     to_candidates: PageConverter,
+                                     remaining: int, quality_found: int, label: str,
+                                     page_num: int) -> Tuple[List[Place], Optional[asyncio.Task]]:
+        await asyncio.sleep(self.PAGE_TOKEN_DELAY)
+        page_params = dict(params, pagetoken=next_page_token)
+        for attempt in range(self.PAGE_TOKEN_ATTEMPTS):
+            data = await self._fetch_search_page_async(url, page_params, label)
+            if data.get('status') != 'INVALID_REQUEST':
+                break
+            await asyncio.sleep(self.PAGE_TOKEN_RETRY_DELAY)
+        
+        candidates = self._page_candidates(data, to_candidates, remaining)
+        remaining -= len(candidates)
+        quality_found += self._count_quality(candidates)
+        following_token = self._next_page_token(data, remaining, quality_found, label, page_num + 1)
+        following_page = None
+        if following_token is not None:
+            following_page = asyncio.ensure_future(self._fetch_next_page_async(
+                url, params, following_token, to_candidates, remaining, quality_found, label, page_num + 1
+            ))
+        return candidates, following_page
+    
+    async def _search_async(self, url: str, params: Dict[str, Any],
+                            to_candidates: PageConverter,
+                            apply_details: Callable[[Place, Dict[str, Any]], Place],
+                            label: str,
+                            on_place: Optional[Callable[[Place], None]] = None) -> List[Place]:
+        """Async counterpart of _search_first_page + _detail_candidates."""
+        first_page = self._local_candidates(params, to_candidates, label)
+        if first_page is not None:
+            data = {}
+        else:
+            data = await self._fetch_search_page_async(url, params, label)
+            first_page = self._page_candidates(data, to_candidates, self.max_results)
+            self._mark_covered(params, data)
+        remaining = self.max_results - len(first_page)
+        quality_found = self._count_quality(first_page)
+        
+        ordered = []
+        tasks = {}
+        seen = set()
+        
+        def add_candidates(new_candidates):
+            for candidate in new_candidates:
+                if candidate.place_id in seen:
+                    continue
+                seen.add(candidate.place_id)
+                tasks[asyncio.ensure_future(self._get_place_details_async(candidate.place_id))] = len(ordered)
+                ordered.append(candidate)
+        
+        add_candidates(first_page)
+        pending = set(tasks)
+        next_page_token = self._next_page_token(data, remaining, quality_found, label, 2)
+        if next_page_token is not None:
+            pending.add(asyncio.ensure_future(self._fetch_next_page_async(
+                url, params, next_page_token, to_candidates, remaining, quality_found, label, 2
+            )))
+        
+        detailed = {}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task not in tasks:
+                    # A follow-up search page arrived
+                    try:
+                        page_candidates, following_page = task.result()
+                    except Exception as e:
+                        log.error("Error fetching next search page: %s", e)
+                        continue
+                    known = set(tasks)
+                    add_candidates(page_candidates)
+                    pending.update(set(tasks) - known)
+                    if following_page is not None:
+                        pending.add(following_page)
+                    continue
                 
-                activity.update({
-                    'images': images,
-                    'priceInfo': price_range if price_range else 'Price varies',
-                    'address': details.get('formatted_address', activity['address']),
-                    'reviews': {
-                        'rating': details.get('rating', activity.get('rating', 0)),
-                        'totalReviews': details.get('user_ratings_total', activity.get('user_ratings_total', 0)),
-                        'snippets': review_snippets
-                    },
-                    'distance': {
-                        'meters': int(distance_m),
-                        'text': distance_text
-                    },
-                    'activityType': activity_type
-                })
-                detailed_activities.append(activity)
-            time.sleep(0.1)
-        
-        return detailed_activities
-
+                idx = tasks[task]
+                candidate = ordered[idx]
+                try:
+                    details = task.result()
+                except Exception as e:
+                    log.error("Error fetching details for %s: %s", candidate.name, e)
+                    continue
+                if not details:
+                    log.error("Failed to get details for %s", candidate.name)
+                    continue
+                detailed[idx] = apply_details(candidate, details)
+                if on_place is not None:
+                    on_place(detailed[idx])
+        
+        return [detailed[idx] for idx in sorted(detailed)]
+    
+    async def search_hotels_async(self, city: str, price_range: str, location_prefs: str,
+                                  excluded_hotels: List[str],
+                                  on_place: Optional[Callable[[Place], None]] = None,
+                                  coords: Optional[Dict[str, float]] = None) -> List[Place]:
+        """Async search_hotels."""
+        if coords is None:
+            coords = await self.get_coordinates_async(city)
+        if not coords:
+            log.error("Failed to get coordinates for city", city=city)
+            return []
+        url, params, to_hotels = self._hotel_search_request(coords, excluded_hotels)
+        return await self._search_async(url, params, to_hotels, self._apply_hotel_details, 'hotels', on_place)
+    
+    async def search_restaurants_async(self, address: str, price_range: str, eating_preferences: str,
+                                       food_restrictions: List[str],
+                                       on_place: Optional[Callable[[Place], None]] = None,
+                                       coords: Optional[Dict[str, float]] = None) -> List[Place]:
+        """Async search_restaurants."""
+        if coords is None:
+            coords = await self.get_coordinates_async(address)
+        if not coords:
+            return []
+        url, params, to_restaurants = self._restaurant_search_request(coords)
+        return await self._search_async(
+            url, params, to_restaurants, self._apply_restaurant_details, 'restaurants', on_place
+        )
+    
+    async def search_activities_async(self, address: str, price_range: str, max_distance: str,
+                                      search_prompt: str,
+                                      on_place: Optional[Callable[[Place], None]] = None,
+                                      coords: Optional[Dict[str, float]] = None) -> List[Place]:
+        """Async search_activities."""
+        if coords is None:
+            coords = await self.get_coordinates_async(address)
+        if not coords:
+            return []
+        url, params, to_activities = self._activity_search_request(coords, address, max_distance, search_prompt)
+        return await self._search_async(
+            url, params, to_activities,
+            lambda activity, details: self._apply_activity_details(activity, details, price_range),
+            'activities', on_place
+        )
@@ -0,0 +1,162 @@
+import math
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .geo import distances_from
+from .models import AIAnalysis, Place
+
+# Keywords in a free-form priceRange mapped to Google price_level values (0-4)
+PRICE_KEYWORDS = {
+    'free': {0},
+    'cheap': {0, 1},
+    'budget': {0, 1},
+    'inexpensive': {0, 1},
+    'affordable': {1, 2},
+    'moderate': {2},
+    'mid': {2},
+    'upscale': {3, 4},
+    'expensive': {3, 4},
+    'fine dining': {3, 4},
+    'luxury': {4},
+}
+
+def target_price_levels(price_range: str) -> Optional[Set[int]]:
+    """Map a free-form priceRange ('$$', '$$-$$$', 'budget', ...) to price levels.
+
+    Returns None when the range cannot be mapped (e.g. '$100-200 per night'),
+    in which case price does not influence the pre-rank.
+    """
+    if not price_range:
+        return None
+    text = price_range.lower()
+    # Runs of dollar signs that are not amounts ('$$', not '$50')
+    signs = [len(run) for run in re.findall(r'\$+(?!\s*\d)', text)]
+    if signs:
+        low, high = min(signs), max(signs)
+        return set(range(min(low, 4), min(high, 4) + 1))
+    levels = set()
+    for keyword, keyword_levels in PRICE_KEYWORDS.items():
+        if keyword in text:
+            levels |= keyword_levels
+    return levels or None
+
+class PreRanker:
+    """Cheap local ranking used to decide which candidates are worth an LLM call.
+
+    Each candidate gets a score in [0, 1] from a weighted mix of rating,
+    review count, distance from the search origin, price-level match and
+    type match. Only the top_k candidates are sent to Gemini; the rest get a
+    heuristic-only aiAnalysis flagged with `heuristic: True`.
+    """
+
+    DEFAULT_WEIGHTS = {
+        'rating': 0.35,
+        'popularity': 0.25,
+        'distance': 0.2,
+        'price': 0.1,
+        'type': 0.1,
+    }
+    # Review count at which the popularity signal saturates
+    POPULARITY_SATURATION = 5000
+
+    def __init__(self, top_k: Optional[int] = 10, max_distance_m: float = 5000,
+                 weights: Optional[Dict[str, float]] = None):
+        self.top_k = top_k
+        self.max_distance_m = max_distance_m
+        self.weights = dict(self.DEFAULT_WEIGHTS, **(weights or {}))
+
+    def _distances_m(self, places: List[Place], origin: Optional[Dict[str, float]]) -> List[Optional[float]]:
+        """Distance of each place from origin: its distance_m, else computed
+        from its location for all such places in one vectorized pass."""
+        distances = [place.distance_m for place in places]
+        missing = [i for i, distance in enumerate(distances) if distance is None and places[i].location]
+        if origin is not None and missing:
+            computed = distances_from(origin, [places[i].location for i in missing])
+            for i, distance in zip(missing, computed):
+                distances[i] = float(distance)
+        return distances
+
+    def score(self, place: Place, origin: Optional[Dict[str, float]] = None,
+              price_levels: Optional[Set[int]] = None, type_keywords: Iterable[str] = (),
+              max_distance_m: Optional[float] = None, distance_m: Optional[float] = None) -> float:
+        """Heuristic score in [0, 1]. Missing signals count as neutral (0.5).
+
+        distance_m is the place's precomputed distance from origin, if known.
+        """
+        max_distance_m = max_distance_m or self.max_distance_m
+        rating = place.rating or 0
+        total_reviews = place.total_reviews or 0
+
+        signals = {
+            'rating': min(rating / 5.0, 1.0),
+            'popularity': min(math.log10(1 + total_reviews) / math.log10(1 + self.POPULARITY_SATURATION), 1.0),
+        }
+
+        distance = distance_m if distance_m is not None else self._distances_m([place], origin)[0]
+        signals['distance'] = 0.5 if distance is None else max(0.0, 1 - distance / max_distance_m)
+
+        price_level = place.price_level
+        if price_levels is None or price_level is None:
+            signals['price'] = 0.5
+        else:
+            signals['price'] = 1 - min(abs(price_level - level) for level in price_levels) / 4
+
+        keywords = [k.lower() for k in type_keywords if k]
+        if keywords:
+            types_text = ' '.join(place.types).lower()
+            signals['type'] = 1.0 if any(k in types_text for k in keywords) else 0.0
+        else:
+            signals['type'] = 0.5
+
+        total_weight = sum(self.weights.values()) or 1.0
+        return sum(self.weights[name] * value for name, value in signals.items()) / total_weight
+
+    def heuristic_analysis(self, place: Place, score: float) -> AIAnalysis:
+        """aiAnalysis for a candidate that was not sent to the LLM."""
+        return AIAnalysis(
+            relevance_score=max(1, min(10, int(round(1 + 9 * score)))),
+            summary=f"Rated {place.rating or 0} from {place.total_reviews or 0} reviews. Ranked on rating, popularity, distance and price; not analyzed by AI.",
+            heuristic=True
+        )
+
+    def fill_missing(self, places: List[Place], origin: Optional[Dict[str, float]] = None,
+                     price_range: str = '', type_keywords: Iterable[str] = (),
+                     max_distance_m: Optional[float] = None) -> List[Place]:
+        """Give places that have no aiAnalysis (e.g. AI scoring ran out of time) the heuristic one.
+
+        Returns the places that were filled in.
+        """
+        price_levels = target_price_levels(price_range)
+        keywords = list(type_keywords)
+        filled = [place for place in places if place.ai_analysis is None]
+        for place, distance in zip(filled, self._distances_m(filled, origin)):
+            score = self.score(place, origin, price_levels, keywords, max_distance_m, distance)
+            place.ai_analysis = self.heuristic_analysis(place, score)
+        return filled
+
+    def split(self, places: List[Place], origin: Optional[Dict[str, float]] = None,
+              price_range: str = '', type_keywords: Iterable[str] = (),
+              max_distance_m: Optional[float] = None) -> Tuple[List[Place], List[Place]]:
+        """Split places into (top_k for LLM scoring, rest with heuristic aiAnalysis).
+
+        max_distance_m overrides the default distance at which the distance
+        signal reaches zero, typically the search radius.
+        """
+        price_levels = target_price_levels(price_range)
+        keywords = list(type_keywords)
+        distances = self._distances_m(places, origin)
+        ranked = sorted(
+            ((self.score(place, origin, price_levels, keywords, max_distance_m, distance), place)
+             for place, distance in zip(places, distances)),
+            key=lambda pair: pair[0],
+            reverse=True
+        )
+        if self.top_k is None or len(ranked) <= self.top_k:
+            return [place for _, place in ranked], []
+
+        top = [place for _, place in ranked[:self.top_k]]
+        rest = []
+        for score, place in ranked[self.top_k:]:
+            place.ai_analysis = self.heuristic_analysis(place, score)
+            rest.append(place)
+        return top, rest
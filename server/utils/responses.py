@@ -0,0 +1,113 @@
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the json module
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional, only gzip is offered without it
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed; the framing overhead outweighs the saving
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider for Flask and Quart that encodes with orjson when installed.
+
+    backend is 'auto' (orjson if importable), 'orjson' or 'json' (the
+    standard library, as Flask does by default). Keys are not sorted.
+    """
+    sort_keys = False
+
+    def __init__(self, app: Any, backend: str = 'auto'):
+        super().__init__(app)
+        if backend == 'orjson' and orjson is None:
+            raise ValueError("JSON backend 'orjson' requested but orjson is not installed")
+        self.use_orjson = orjson is not None and backend in ('auto', 'orjson')
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        if self.use_orjson:
+            return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(obj, default=self.default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if self.use_orjson and not kwargs:
+            return self.dumps_bytes(obj).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any) -> Any:
+        # Encoded straight to bytes, skipping the str round trip of the default provider
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+def etag_for(body: bytes) -> str:
+    """Weak ETag of an uncompressed body, shared by all its content codings."""
+    return 'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against etag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith('W/') else candidate) == opaque:
+            return True
+    return False
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Preferred supported content coding ('br' or 'gzip') for an Accept-Encoding header, or None."""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.strip().partition(';')
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    supported = ['br', 'gzip'] if brotli is not None else ['gzip']
+    ranked = [(weights.get(coding, weights.get('*', 0.0)), -i, coding) for i, coding in enumerate(supported)]
+    weight, _, coding = max(ranked)
+    return coding if weight > 0 else None
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+def encode_body(body: bytes, status: int, headers: Any, method: str = 'GET',
+                min_bytes: int = MIN_COMPRESS_BYTES) -> Tuple[int, bytes, Optional[str], Optional[str]]:
+    """Apply conditional GET and content negotiation to a JSON response body.
+
+    Successful GET and HEAD responses get an ETag; if the request's
+    If-None-Match matches it, the result is a bodyless 304. Other methods
+    are never made conditional. Bodies of at least min_bytes are compressed
+    with the client's preferred coding. Returns
+    (status, body, etag or None, content coding or None).
+    """
+    etag = None
+    if status == 200 and method in ('GET', 'HEAD'):
+        etag = etag_for(body)
+        if etag_matches(headers.get('If-None-Match'), etag):
+            return 304, b'', etag, None
+    encoding = choose_encoding(headers.get('Accept-Encoding')) if len(body) >= min_bytes else None
+    if encoding is not None:
+        body = compress(body, encoding)
+    return status, body, etag, encoding
@@ -0,0 +1,120 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .cache import TTLCache, normalize_key
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return normalize_key(value)
+    if isinstance(value, (list, tuple)):
+        return sorted(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    return value
+
+def request_key(kind: str, params: Dict[str, Any]) -> str:
+    """Key a search by kind and its parameters, ignoring case, spacing and list order."""
+    normalized = json.dumps(_normalize(params), sort_keys=True, separators=(',', ':'))
+    return f"{kind}:{hashlib.sha1(normalized.encode('utf-8')).hexdigest()}"
+
+class SingleFlight:
+    """Share one execution between concurrent calls with the same key.
+
+    The first caller for a key runs the work; callers arriving while it is in
+    flight wait for and receive the same result (or exception). If `cache` is
+    given, results accepted by `cacheable` are also kept there, so repeats
+    shortly after completion are served without running the work again.
+
+    do() and do_async() return (result, source) where source is 'miss' for
+    the caller that ran the work, 'shared' for callers that joined it, and
+    'cached' for results served from the cache.
+    """
+
+    def __init__(self, cache: Optional[TTLCache] = None,
+                 cacheable: Callable[[Any], bool] = lambda result: True):
+        self.cache = cache
+        self.cacheable = cacheable
+        self._calls: Dict[str, concurrent.futures.Future] = {}
+        self._async_calls: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def _cached(self, key: str) -> Any:
+        return self.cache.get(key) if self.cache is not None else None
+
+    def _store(self, key: str, result: Any) -> None:
+        if self.cache is not None and self.cacheable(result):
+            self.cache.set(key, result)
+
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, str]:
+        cached = self._cached(key)
+        if cached is not None:
+            return cached, 'cached'
+
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._calls[key] = future
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result(), 'shared'
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self._store(key, result)
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return result, 'miss'
+
+    async def do_async(self, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, str]:
+        """do() for coroutines. Joins only calls made on the same event loop.
+
+        The work runs as its own task, so it completes (and its result is
+        cached) even if the caller that started it is cancelled.
+        """
+        cached = self._cached(key)
+        if cached is not None:
+            return cached, 'cached'
+
+        task = self._async_calls.get(key)
+        if task is not None:
+            self.shared += 1
+            # Shield so one waiter disconnecting does not cancel the shared work
+            return await asyncio.shield(task), 'shared'
+
+        task = asyncio.ensure_future(self._run_async(key, func))
+        self._async_calls[key] = task
+        task.add_done_callback(lambda done: self._async_done(key, done))
+        return await asyncio.shield(task), 'miss'
+
+    async def _run_async(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        result = await func()
+        self._store(key, result)
+        return result
+
+    def _async_done(self, key: str, task: asyncio.Future) -> None:
+        if self._async_calls.get(key) is task:
+            del self._async_calls[key]
+        if not task.cancelled():
+            # Mark retrieved, so an exception nobody is left waiting for is not reported again
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {'inFlight': len(self._calls) + len(self._async_calls), 'shared': self.shared}
+        if self.cache is not None:
+            counters['cache'] = self.cache.stats()
+        return counters
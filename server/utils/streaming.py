@@ -0,0 +1,56 @@
+import contextvars
+import json
+import queue
+import threading
+from typing import Any, Callable, Iterator, Tuple
+
+Emit = Callable[[str, Any], None]
+
+_DONE = object()
+
+def format_sse(event: str, data: Any) -> str:
+    """Format one Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class EventStream:
+    """Run a producer in a background thread and yield what it emits as SSE messages.
+
+    The producer is called with an emit(event, data) function and may call it
+    from any thread. If it raises, on_error maps the exception to a final
+    (event, data) pair. A comment line is sent every `heartbeat` seconds of
+    silence so proxies do not close the connection during slow upstream calls.
+    """
+
+    def __init__(self, producer: Callable[[Emit], None],
+                 on_error: Callable[[Exception], Tuple[str, Any]], heartbeat: float = 15.0):
+        self.heartbeat = heartbeat
+        self._producer = producer
+        self._on_error = on_error
+        self._events = queue.Queue()
+        # The producer runs in the request's context (request id, log level)
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run, args=(self._run,), name='event-stream', daemon=True
+        )
+        self._thread.start()
+
+    def _emit(self, event: str, data: Any) -> None:
+        self._events.put((event, data))
+
+    def _run(self) -> None:
+        try:
+            self._producer(self._emit)
+        except Exception as e:
+            self._events.put(self._on_error(e))
+        finally:
+            self._events.put(_DONE)
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            try:
+                item = self._events.get(timeout=self.heartbeat)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if item is _DONE:
+                return
+            yield format_sse(*item)